@@ -0,0 +1,59 @@
+"""
+Compares two load_suite.py result files and exits non-zero if any scenario regressed: p95 latency
+up, or throughput down, by more than --tolerance (a fraction), or errors appearing where there
+were none. Meant for CI, with the baseline taken from the target branch:
+
+    python benchmarks/compare.py baseline.json benchmark-results.json --tolerance 0.2
+"""
+import argparse
+import json
+import sys
+
+
+def compare(baseline, current, tolerance):
+    """Returns (lines describing every scenario, list of regressions)."""
+    lines, regressions = [], []
+    for scenario, now in current['scenarios'].items():
+        before = baseline['scenarios'].get(scenario)
+        if before is None:
+            lines.append(f"{scenario}: new scenario, no baseline")
+            continue
+        checks = []
+        if before['p95_ms'] and now['p95_ms'] is not None:
+            change = now['p95_ms'] / before['p95_ms'] - 1
+            checks.append((f"p95 {before['p95_ms']} -> {now['p95_ms']} ms ({change:+.0%})", change > tolerance))
+        if before['throughput_per_second'] and now['throughput_per_second'] is not None:
+            change = now['throughput_per_second'] / before['throughput_per_second'] - 1
+            checks.append((
+                f"throughput {before['throughput_per_second']} -> {now['throughput_per_second']}/s ({change:+.0%})",
+                change < -tolerance,
+            ))
+        checks.append((f"errors {before['errors']} -> {now['errors']}", now['errors'] > 0 and before['errors'] == 0))
+        for description, regressed in checks:
+            lines.append(f"{scenario}: {description}{'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append(f"{scenario}: {description}")
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline', help="Result file from the baseline commit.")
+    parser.add_argument('current', help="Result file from the commit under test.")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative change before failing.")
+    args = parser.parse_args()
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    print(f"Baseline {baseline.get('commit') or '?'} vs current {current.get('commit') or '?'}")
+    lines, regressions = compare(baseline, current, args.tolerance)
+    print('\n'.join(lines))
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%} tolerance.")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
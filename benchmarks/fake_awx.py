@@ -0,0 +1,136 @@
+"""
+A stand-in for the AWX API, for benchmarks and local development. It implements the endpoints the
+portal calls:
+
+    POST /api/v2/job_templates/<id>/launch/   -> {"job": <id>}
+    GET  /api/v2/jobs/?id__in=1,2,3           -> {"results": [{"id", "status"}, ...], "next": null}
+    GET  /api/v2/jobs/<id>/                   -> {"id", "status"}
+
+Every response is delayed by --latency-ms (plus up to --jitter-ms), and --failure-rate of them
+answer HTTP 500. A launched job reports "running" for --job-seconds, then "successful" (or "failed"
+for --job-failure-rate of jobs). Run standalone and point AWX_URL at it:
+
+    python benchmarks/fake_awx.py --port 8052 --latency-ms 200 --failure-rate 0.05
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+LAUNCH_PATH = re.compile(r'^/api/v2/job_templates/(\d+)/launch/$')
+JOB_PATH = re.compile(r'^/api/v2/jobs/(\d+)/$')
+
+
+class FakeAWXServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=0, jitter_ms=0, failure_rate=0.0, job_seconds=5.0, job_failure_rate=0.0):
+        super().__init__(address, FakeAWXHandler)
+        self.latency_ms, self.jitter_ms, self.failure_rate = latency_ms, jitter_ms, failure_rate
+        self.job_seconds, self.job_failure_rate = job_seconds, job_failure_rate
+        self.job_ids = itertools.count(1)
+        self.jobs = {} # job id -> (launched at, final status)
+        self.lock = threading.Lock()
+        self.counts = {'launches': 0, 'status_lookups': 0, 'errors': 0}
+
+    def job_status(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        launched_at, final_status = job
+        return final_status if time.monotonic() - launched_at >= self.job_seconds else 'running'
+
+
+class FakeAWXHandler(BaseHTTPRequestHandler):
+    server: FakeAWXServer
+
+    def log_message(self, format, *args):
+        pass # Keep benchmark output clean
+
+    def _respond(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _simulate(self):
+        """Applies the configured latency; returns False if this call should fail."""
+        server = self.server
+        time.sleep((server.latency_ms + random.uniform(0, server.jitter_ms)) / 1000)
+        if random.random() < server.failure_rate:
+            with server.lock:
+                server.counts['errors'] += 1
+            self._respond(500, {'detail': 'Simulated AWX failure.'})
+            return False
+        return True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if not LAUNCH_PATH.match(urlparse(self.path).path):
+            return self._respond(404, {'detail': 'Not found.'})
+        if not self._simulate():
+            return
+        server = self.server
+        with server.lock:
+            job_id = next(server.job_ids)
+            final_status = 'failed' if random.random() < server.job_failure_rate else 'successful'
+            server.jobs[job_id] = (time.monotonic(), final_status)
+            server.counts['launches'] += 1
+        self._respond(201, {'job': job_id, 'status': 'pending'})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        job_match = JOB_PATH.match(url.path)
+        if url.path != '/api/v2/jobs/' and not job_match:
+            return self._respond(404, {'detail': 'Not found.'})
+        if not self._simulate():
+            return
+        with self.server.lock:
+            self.server.counts['status_lookups'] += 1
+        if job_match:
+            job_id = int(job_match.group(1))
+            status = self.server.job_status(job_id)
+            return self._respond(404 if status is None else 200, {'id': job_id, 'status': status})
+        ids = [int(i) for i in parse_qs(url.query).get('id__in', [''])[0].split(',') if i]
+        results = [{'id': job_id, 'status': self.server.job_status(job_id)} for job_id in ids]
+        self._respond(200, {'count': len(results), 'next': None, 'results': [r for r in results if r['status']]})
+
+
+def start_fake_awx(host='127.0.0.1', port=0, **options):
+    """Starts a FakeAWXServer on a background thread; returns it (its URL is http://host:server.server_port)."""
+    server = FakeAWXServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name='fake-awx', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8052)
+    parser.add_argument('--latency-ms', type=float, default=100)
+    parser.add_argument('--jitter-ms', type=float, default=50)
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Fraction of API calls answered with HTTP 500.")
+    parser.add_argument('--job-seconds', type=float, default=5.0, help="How long launched jobs stay running.")
+    parser.add_argument('--job-failure-rate', type=float, default=0.0, help="Fraction of jobs that end up failed.")
+    args = parser.parse_args()
+    server = FakeAWXServer(
+        (args.host, args.port), latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, failure_rate=args.failure_rate,
+        job_seconds=args.job_seconds, job_failure_rate=args.job_failure_rate,
+    )
+    print(f"Fake AWX listening on http://{args.host}:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""
+End-to-end load suite: runs scripted traffic against a throwaway SQLite database with the fake AWX
+server and SMTP sink from this directory standing in for the real services, and writes throughput
+and p50/p95/p99 latency per scenario to a JSON file that benchmarks/compare.py can check in CI.
+
+Scenarios, in order (each worker process plays a gunicorn worker, driving the Django test client):
+    wizard    both request wizard steps (POSTs; the pages need collectstatic to render)
+    status    polling the JSON status endpoint, half of it conditional (If-None-Match)
+    approve   the async approval endpoint, which launches the job on the fake AWX
+    email     the outbox worker delivering the notifications queued above to the SMTP sink
+
+Limits: requests go through django.test.Client in-process, not over HTTP to gunicorn/uvicorn. The
+numbers cover views, middleware, templates, the database and the outbound AWX/SMTP calls, but not
+the server, the ASGI handler (sync/async switching, streamed responses), sockets or static files.
+Use them to compare commits with each other, not as a capacity figure for a deployment. The result
+file records this under 'transport'.
+
+Run from the project root:
+
+    python benchmarks/load_suite.py --workers 4 --submissions 50 --output benchmark-results.json
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_awx import start_fake_awx # noqa: E402
+from smtp_sink import start_smtp_sink # noqa: E402
+
+SCENARIOS = ('wizard', 'status', 'approve', 'email')
+RESULT_FORMAT_VERSION = 1
+TRANSPORT = 'django.test.Client, in-process (no HTTP server, no ASGI handler)'
+
+
+def _setup_django(env, test_client=True):
+    os.environ.update(env)
+    sys.path.insert(0, str(BASE_DIR))
+    import django
+    django.setup()
+    if test_client:
+        from django.test.utils import setup_test_environment
+        setup_test_environment() # Accepts the test client's host
+
+
+def _timed(operation):
+    """Runs operation(); returns (seconds taken, its result)."""
+    started = time.perf_counter()
+    result = operation()
+    return time.perf_counter() - started, result
+
+
+def _client():
+    from django.test import Client
+    return Client(raise_request_exception=False) # A server error is a failed sample, not the end of the run
+
+
+def _wizard(worker_id, options):
+    client = _client()
+
+    def submit(i):
+        client.post('/', {
+            'fqdn': f"LOAD{worker_id:02d}-{i:05d}.EXAMPLE.COM", 'vlan': random.choice(['1441', '1443']),
+            'location': random.choice(['COS', 'SRS', 'DFW']), 'os_type': 'rhel9', 'cpu_cores': 2, 'memory_gb': 8,
+            'os_disk_gb': 100, 'patching_group': 'automatic',
+        })
+        response = client.post('/step2/', {'primary_contact': 'owner@example.com', 'terms_accepted': 'on'})
+        return response.status_code == 302 and response['Location'].endswith('/success/')
+    return [_timed(lambda: submit(i)) for i in range(options['submissions'])]
+
+
+def _status(worker_id, options):
+    from requests_app.models import ServerRequest
+    client = _client()
+    request_ids = list(ServerRequest.objects.values_list('id', flat=True))
+    etags = {}
+
+    def poll():
+        pk = random.choice(request_ids)
+        headers = {'HTTP_IF_NONE_MATCH': etags[pk]} if pk in etags and random.random() < 0.5 else {}
+        response = client.get(f'/status/{pk}/json/', **headers)
+        if response.status_code == 200:
+            etags[pk] = response['ETag']
+        return response.status_code in (200, 304)
+    return [_timed(poll) for _ in range(options['polls'])]
+
+
+def _approve(worker_id, options):
+    from django.contrib.auth.models import User
+    from requests_app.models import ServerRequest
+    client = _client()
+    client.force_login(User.objects.create_superuser(f'load-admin-{worker_id}', 'admin@example.com', 'load-password'))
+    pending = list(ServerRequest.objects.filter(status='PENDING').order_by('id').values_list('id', flat=True))
+    mine = pending[worker_id::options['workers']][:options['approvals']]
+    return [_timed(lambda pk=pk: client.post(f'/status/{pk}/approve/').status_code == 200) for pk in mine]
+
+
+def _email(worker_id, options):
+    from requests_app.email_outbox import send_queued_emails
+    samples = []
+    for _ in range(options['emails']):
+        elapsed, results = _timed(lambda: send_queued_emails(batch_size=1))
+        if not any(results.values()):
+            break # Outbox empty
+        samples.append((elapsed, bool(results['sent'])))
+    return samples
+
+
+RUNNERS = {'wizard': _wizard, 'status': _status, 'approve': _approve, 'email': _email}
+
+
+def _worker(env, scenario, worker_id, options, start, results):
+    _setup_django(env, test_client=scenario != 'email')
+    random.seed(worker_id)
+    start.wait()
+    results.put(RUNNERS[scenario](worker_id, options))
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)]
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(seconds * 1000 for seconds, _ in samples)
+    ok = sum(1 for _, succeeded in samples if succeeded)
+
+    def ms(value):
+        return round(value, 2) if value is not None else None
+    return {
+        'operations': len(samples), 'errors': len(samples) - ok, 'seconds': round(elapsed, 3),
+        'throughput_per_second': round(len(samples) / elapsed, 2) if elapsed else None,
+        'p50_ms': ms(percentile(latencies, 50)), 'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)), 'max_ms': ms(latencies[-1] if latencies else None),
+    }
+
+
+def run_scenario(scenario, env, options):
+    workers = 1 if scenario == 'email' else options['workers'] # The outbox has one sender
+    context = multiprocessing.get_context('spawn')
+    start, results = context.Event(), context.Queue()
+    processes = [context.Process(target=_worker, args=(env, scenario, n, options, start, results)) for n in range(workers)]
+    for process in processes:
+        process.start()
+    time.sleep(options['warmup_seconds']) # Let every process finish importing Django before the clock starts
+    began = time.perf_counter()
+    start.set()
+    samples = []
+    for _ in processes:
+        samples.extend(results.get())
+    elapsed = time.perf_counter() - began
+    for process in processes:
+        process.join()
+    return summarize(samples, elapsed)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(options):
+    awx = start_fake_awx(
+        latency_ms=options['awx_latency_ms'], jitter_ms=options['awx_jitter_ms'],
+        failure_rate=options['awx_failure_rate'], job_seconds=60,
+    )
+    smtp = start_smtp_sink(latency_ms=options['smtp_latency_ms'])
+    report = {
+        'format_version': RESULT_FORMAT_VERSION, 'commit': _git_commit(), 'transport': TRANSPORT,
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'platform': platform.platform(), 'options': options, 'scenarios': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            'DJANGO_SETTINGS_MODULE': 'provisioning_portal.settings', 'DJANGO_DEBUG': 'False',
+            'DATABASE_URL': f"sqlite:///{Path(tmp) / 'load.sqlite3'}",
+            'AWX_URL': f"http://127.0.0.1:{awx.server_port}", 'AWX_TOKEN': 'load-token', 'AWX_JOB_TEMPLATE_ID': '1',
+            'EMAIL_BACKEND': 'django.core.mail.backends.smtp.EmailBackend',
+            'EMAIL_HOST': '127.0.0.1', 'EMAIL_PORT': str(smtp.server_address[1]),
+            'METRICS_ENABLED': 'False',
+        }
+        subprocess.run(
+            [sys.executable, str(BASE_DIR / 'manage.py'), 'migrate', '--noinput'],
+            env={**os.environ, **env}, check=True, stdout=subprocess.DEVNULL,
+        )
+        for scenario in options['scenarios']:
+            report['scenarios'][scenario] = run_scenario(scenario, env, options)
+            print(f"{scenario:>8}: {json.dumps(report['scenarios'][scenario])}", flush=True)
+    report['fake_awx'] = dict(awx.counts)
+    report['smtp_sink'] = {'messages': smtp.messages}
+    awx.shutdown()
+    smtp.shutdown()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent processes per scenario.")
+    parser.add_argument('--submissions', type=int, default=50, help="Wizard submissions per worker.")
+    parser.add_argument('--polls', type=int, default=200, help="Status polls per worker.")
+    parser.add_argument('--approvals', type=int, default=25, help="Approvals per worker.")
+    parser.add_argument('--emails', type=int, default=200, help="Maximum emails delivered in the email scenario.")
+    parser.add_argument('--awx-latency-ms', type=float, default=100)
+    parser.add_argument('--awx-jitter-ms', type=float, default=50)
+    parser.add_argument('--awx-failure-rate', type=float, default=0.0)
+    parser.add_argument('--smtp-latency-ms', type=float, default=5)
+    parser.add_argument('--warmup-seconds', type=float, default=3)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--output', default='benchmark-results.json', help="Where to write the JSON results.")
+    args = parser.parse_args()
+    options = {key: value for key, value in vars(args).items() if key != 'output'}
+
+    report = run_suite(options)
+    Path(args.output).write_text(json.dumps(report, indent=2) + '\n')
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
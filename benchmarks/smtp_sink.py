@@ -0,0 +1,81 @@
+"""
+A minimal SMTP server that accepts and discards every message, for benchmarks and local development
+(Django's smtp backend needs something to talk to; smtpd left the standard library in 3.12).
+--latency-ms delays each accepted message, to stand in for a slow relay. Run standalone with:
+
+    python benchmarks/smtp_sink.py --port 8025
+
+and set EMAIL_BACKEND=django.core.mail.backends.smtp.EmailBackend EMAIL_HOST=127.0.0.1 EMAIL_PORT=8025.
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class SMTPSinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, latency_ms=0):
+        super().__init__(address, SMTPSinkHandler)
+        self.latency_ms = latency_ms
+        self.lock = threading.Lock()
+        self.messages = 0
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    server: SMTPSinkServer
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply('220 smtp-sink ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith('EHLO'):
+                self.wfile.write(b'250-smtp-sink\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n')
+            elif command.startswith('DATA'):
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                time.sleep(self.server.latency_ms / 1000)
+                with self.server.lock:
+                    self.server.messages += 1
+                self.reply('250 OK: queued')
+            elif command.startswith('QUIT'):
+                self.reply('221 Bye')
+                return
+            elif command.startswith(('HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self.reply('250 OK')
+            else:
+                self.reply('502 Command not implemented')
+
+
+def start_smtp_sink(host='127.0.0.1', port=0, latency_ms=0):
+    """Starts an SMTPSinkServer on a background thread; returns it (port: server.server_address[1])."""
+    server = SMTPSinkServer((host, port), latency_ms=latency_ms)
+    threading.Thread(target=server.serve_forever, name='smtp-sink', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    args = parser.parse_args()
+    server = SMTPSinkServer((args.host, args.port), latency_ms=args.latency_ms)
+    print(f"SMTP sink listening on {args.host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Concurrent request submissions against a throwaway SQLite database, once with SQLite's default
+rollback journal (the old configuration) and once with the WAL pragmas from settings.py.
+
+Each worker process plays a gunicorn worker: it submits requests through both wizard steps with the
+Django test client while reader processes keep querying the request list, as the admin and status
+pages do. Run from the project root:
+
+    python benchmarks/submission_throughput.py --workers 8 --submissions 50 --readers 2
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+MODES = {
+    # SQLite defaults, and the 5 s busy timeout of Python's sqlite3 module
+    'rollback-journal': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_BUSY_TIMEOUT_MS': '5000'},
+    'wal': {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'NORMAL', 'SQLITE_BUSY_TIMEOUT_MS': '20000'},
+}
+
+
+def _setup_django(env):
+    os.environ.update(env)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'provisioning_portal.settings')
+    sys.path.insert(0, str(BASE_DIR))
+    import django
+    django.setup()
+    from django.test.utils import setup_test_environment
+    setup_test_environment() # Accepts the test client's host and keeps emails in memory
+
+
+def _submit(env, worker_id, submissions, start, results):
+    _setup_django(env)
+    from django.test import Client
+    client = Client()
+    ok = failed = 0
+    start.wait()
+    for i in range(submissions):
+        client.post('/', {
+            'fqdn': f"BENCH{worker_id:02d}-{i:04d}.EXAMPLE.COM", 'vlan': '1441', 'location': 'COS', 'os_type': 'rhel9',
+            'cpu_cores': 2, 'memory_gb': 8, 'os_disk_gb': 100, 'patching_group': 'automatic',
+        })
+        response = client.post('/step2/', {'primary_contact': 'owner@example.com', 'terms_accepted': 'on'})
+        if response.status_code == 302 and response['Location'].endswith('/success/'):
+            ok += 1
+        else:
+            failed += 1
+    results.put(('submit', ok, failed))
+
+
+def _read(env, start, stop, results):
+    _setup_django(env)
+    from requests_app.models import ServerRequest
+    reads = 0
+    start.wait()
+    while not stop.is_set():
+        ServerRequest.objects.filter(status='PENDING').count()
+        list(ServerRequest.objects.order_by('-requested_at').values('id', 'fqdn', 'status')[:50])
+        reads += 1
+    results.put(('read', reads, 0))
+
+
+def run_mode(mode, workers, submissions, readers):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            'DATABASE_URL': f"sqlite:///{Path(tmp) / 'bench.sqlite3'}", 'DJANGO_DEBUG': 'True',
+            'DJANGO_SETTINGS_MODULE': 'provisioning_portal.settings', **MODES[mode],
+        }
+        subprocess.run(
+            [sys.executable, str(BASE_DIR / 'manage.py'), 'migrate', '--noinput'],
+            env={**os.environ, **env}, check=True, stdout=subprocess.DEVNULL,
+        )
+        context = multiprocessing.get_context('spawn')
+        start, stop, results = context.Event(), context.Event(), context.Queue()
+        submitters = [context.Process(target=_submit, args=(env, n, submissions, start, results)) for n in range(workers)]
+        reader_procs = [context.Process(target=_read, args=(env, start, stop, results)) for _ in range(readers)]
+        for process in submitters + reader_procs:
+            process.start()
+        time.sleep(3) # Let every process finish importing Django before the clock starts
+        began = time.perf_counter()
+        start.set()
+        for process in submitters:
+            process.join()
+        elapsed = time.perf_counter() - began
+        stop.set()
+        for process in reader_procs:
+            process.join()
+
+        totals = {'submit': [0, 0], 'read': [0, 0]}
+        while not results.empty():
+            kind, count, failed = results.get()
+            totals[kind][0] += count
+            totals[kind][1] += failed
+    return {
+        'mode': mode, 'workers': workers, 'readers': readers, 'seconds': round(elapsed, 2),
+        'submitted': totals['submit'][0], 'failed': totals['submit'][1],
+        'submissions_per_second': round(totals['submit'][0] / elapsed, 1),
+        'reads_per_second': round(totals['read'][0] / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent submitting processes.")
+    parser.add_argument('--submissions', type=int, default=50, help="Submissions per worker.")
+    parser.add_argument('--readers', type=int, default=2, help="Concurrent reading processes.")
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    args = parser.parse_args()
+    for mode in args.modes:
+        print(json.dumps(run_mode(mode, args.workers, args.submissions, args.readers)), flush=True)
+
+
+if __name__ == '__main__':
+    main()
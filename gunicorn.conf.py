@@ -0,0 +1,27 @@
+# gunicorn.conf.py
+# Picked up automatically by gunicorn from the working directory (see Dockerfile).
+import os
+import shutil
+
+
+def on_starting(server):
+    """
+    Starts each deployment with an empty Prometheus multiprocess directory; stale files from old PIDs would be
+    summed in. Warns when several workers would each keep a cache of their own.
+    """
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+    if server.cfg.workers > 1 and not os.environ.get('CACHE_URL'):
+        server.log.warning(
+            f"{server.cfg.workers} workers with the per-process cache: each has its own AWX circuit breaker and "
+            f"`manage.py clear_cache` can't reach them. Set CACHE_URL to a shared cache (see settings.py)."
+        )
+
+
+def child_exit(server, worker):
+    """Tells prometheus_client a worker is gone so its live-process samples are dropped."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
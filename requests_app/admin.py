@@ -1,20 +1,92 @@
 # requests_app/admin.py
 from django.contrib import admin
+from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.contrib import messages
 from django.urls import reverse
 from django.utils.html import format_html
-from .models import ServerRequest, AuditLog
-from .awx_utils import trigger_awx_job
+from .models import ServerRequest, AuditLog, AWXLaunch, QueuedEmail, CapacitySummary, LocationQuota, VlanSubnet
+from .awx_queue import enqueue_awx_launch
+from .capacity import CAPACITY_FIELDS, adjust_capacity
+from .quotas import QuotaExceeded, apply_quota, recount_quota_usage
+from .forms import ServerRequestAdminForm
+from .ipam import RELEASING_STATUSES, AddressPoolExhausted, allocate_addresses, build_bitmap, release_addresses, release_request_addresses
+from .approvals import approve_requests, deny_requests
+from .paginators import EstimatedCountPaginator
+from .search import search_terms, text_matches
+from .exports import SERVER_REQUEST_EXPORT_FIELDS, AUDIT_LOG_EXPORT_FIELDS, EXPORT_FORMATS, streaming_export_response
+from django.db import transaction
+from django.db.models import Q
+from django.urls import path
+from django.core.exceptions import PermissionDenied
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.http import HttpResponseBadRequest, HttpResponseRedirect
+
+
+class StreamingExportMixin:
+    """
+    Adds "Export selected" CSV/NDJSON actions and an export/ URL that streams everything matching
+    the changelist's current filters, search and date drill-down (e.g. .../export/?format=csv&status__exact=PENDING).
+    """
+    export_fields = ()
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('export/', self.admin_site.admin_view(self.export_view), name='%s_%s_export' % info),
+        ] + super().get_urls()
+
+    def export_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        params = request.GET.copy()
+        export_format = params.pop('format', ['csv'])[-1]
+        if export_format not in EXPORT_FORMATS:
+            return HttpResponseBadRequest(f"Unknown export format '{export_format}'. Use one of: {', '.join(EXPORT_FORMATS)}.")
+        request.GET = params # The changelist rejects parameters it doesn't know
+        try:
+            queryset = self.get_changelist_instance(request).get_queryset(request)
+        except IncorrectLookupParameters:
+            return HttpResponseBadRequest("Invalid filter parameters.")
+        return streaming_export_response(request, queryset, self.export_fields, export_format, self.model._meta.model_name)
+
+    def export_as_csv(self, request, queryset):
+        return streaming_export_response(request, queryset, self.export_fields, 'csv', self.model._meta.model_name)
+    export_as_csv.short_description = 'Export selected as CSV'
+
+    def export_as_ndjson(self, request, queryset):
+        return streaming_export_response(request, queryset, self.export_fields, 'ndjson', self.model._meta.model_name)
+    export_as_ndjson.short_description = 'Export selected as NDJSON'
+
+
+class FullTextSearchMixin:
+    """
+    Answers the admin search box from the full-text index (requests_app.search) rather than a
+    LIKE '%term%' over every search_fields column. As with the stock search, every term must match
+    somewhere. search_fields still has to be set, for the search box to show.
+    """
+    def search_filter(self, term, using):
+        return text_matches(self.model, term, using=using)
+
+    def get_search_results(self, request, queryset, search_term):
+        for term in search_terms(search_term):
+            queryset = queryset.filter(self.search_filter(term, queryset.db))
+        return queryset, False # Subqueries, no joins: no duplicate rows
+
 
 @admin.register(ServerRequest)
-class ServerRequestAdmin(admin.ModelAdmin):
+class ServerRequestAdmin(FullTextSearchMixin, StreamingExportMixin, admin.ModelAdmin):
     list_display = ('fqdn', 'status', 'os_type', 'location', 'patching_group', 'hypervisor_type', 'primary_contact', 'ticket_number', 'requested_at')
-    list_filter = ('status', 'location', 'os_type', 'patching_group', 'hypervisor_type', 'cpu_cores', 'memory_gb', 'backup_required', 'monitoring_required', 'requested_at', 'approved_denied_by')
+    list_filter = ('status', 'location', 'os_type', 'patching_group', 'hypervisor_type', 'cpu_cores', 'memory_gb', 'backup_required', 'monitoring_required', 'requested_at', ('approved_denied_by', admin.RelatedOnlyFieldListFilter))
     search_fields = ('fqdn', 'primary_contact', 'ticket_number', 'vlan', 'admin_notes', 'os_type', 'user_ids', 'hypervisor_type')
     ordering = ('-requested_at',)
-    readonly_fields = ('requested_at', 'updated_at', 'approved_denied_at', 'approved_denied_by', 'awx_job_id', 'terms_accepted')
+    readonly_fields = ('requested_at', 'updated_at', 'approved_denied_at', 'approved_denied_by', 'awx_job_id', 'ip_address', 'terms_accepted')
     date_hierarchy = 'requested_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False # Skips a second COUNT(*) over the whole table on filtered pages
+    actions = ['approve_selected', 'deny_selected', 'export_as_csv', 'export_as_ndjson']
+    export_fields = SERVER_REQUEST_EXPORT_FIELDS
+    form = ServerRequestAdminForm # Rejects approvals that exceed a location quota
 
     fieldsets = (
         ('Request Details (Submitted by User)', {
@@ -32,13 +104,22 @@ class ServerRequestAdmin(admin.ModelAdmin):
         }),
         ('Approval Status & Tracking', {
             'fields': (
-                'status', 'admin_notes', 'approved_denied_by', 'approved_denied_at', 'awx_job_id',
+                'status', 'admin_notes', 'approved_denied_by', 'approved_denied_at', 'awx_job_id', 'ip_address',
                 'requested_at', 'updated_at', 'terms_accepted'
             )
         }),
     )
 
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except (QuotaExceeded, AddressPoolExhausted) as e:
+            # Raised by save_model inside the admin's transaction, so nothing was saved or logged
+            messages.error(request, f"The request was not saved: {e}")
+            return HttpResponseRedirect(request.get_full_path())
+
     def save_model(self, request, obj: ServerRequest, form, change):
+        original_obj = None
         original_status = None
         action_performed = False
 
@@ -51,6 +132,16 @@ class ServerRequestAdmin(admin.ModelAdmin):
 
         new_status = form.cleaned_data.get('status')
 
+        # The form already checked headroom; this is the authoritative reservation, and can only fail
+        # if another approval took the remaining quota (or the last address) in the meantime. It raises
+        # then, so changeform_view rolls the whole save back.
+        apply_quota(released=[original_obj] if original_obj else [], reserved=[obj])
+        if new_status == 'APPROVED' and original_status != 'APPROVED' and not obj.ip_address:
+            obj.ip_address = next(iter(allocate_addresses(obj.vlan)), None)
+        elif new_status in RELEASING_STATUSES and original_obj and original_obj.ip_address:
+            release_addresses(original_obj.vlan, [original_obj.ip_address])
+            obj.ip_address = None
+
         if new_status == 'APPROVED' and original_status != 'APPROVED':
             obj.approved_denied_by = request.user
             obj.approved_denied_at = timezone.now()
@@ -61,24 +152,10 @@ class ServerRequestAdmin(admin.ModelAdmin):
                 message=f"Request ID {obj.id} ({obj.fqdn}) approved.",
                 user=request.user, related_request=obj
             )
-            awx_job_id = trigger_awx_job(obj)
-            if awx_job_id:
-                obj.awx_job_id = awx_job_id
-                obj.status = 'PROVISIONING'
-                messages.success(request, f"Request approved. AWX Job {awx_job_id} launched successfully.")
-                AuditLog.objects.create(
-                    level='SUCCESS', action='AWX Job Triggered',
-                    message=f"Launched AWX Job {awx_job_id} for request {obj.id} ({obj.fqdn}).",
-                    user=request.user, related_request=obj, related_awx_job_id=awx_job_id
-                )
-            else:
-                obj.status = 'APPROVED'
-                messages.error(request, "Request approved, but FAILED to launch AWX job.")
-                AuditLog.objects.create(
-                    level='ERROR', action='AWX Trigger Failed',
-                    message=f"Failed to launch AWX job for approved request {obj.id} ({obj.fqdn}).",
-                    user=request.user, related_request=obj
-                )
+            # Launch happens in the `process_awx_queue` worker; it moves the request to PROVISIONING
+            # and records the job ID once AWX answers.
+            enqueue_awx_launch(obj, request.user)
+            messages.success(request, "Request approved. AWX job launch has been queued.")
         elif new_status == 'DENIED' and original_status != 'DENIED':
             obj.approved_denied_by = request.user
             obj.approved_denied_at = timezone.now()
@@ -98,16 +175,66 @@ class ServerRequestAdmin(admin.ModelAdmin):
              obj.save()
         elif not obj.pk:
              super().save_model(request, obj, form, change) # Handle initial object creation
+        else:
+             return
+        adjust_capacity(removed=[original_obj] if original_obj else [], added=[obj])
+
+    def delete_model(self, request, obj):
+        adjust_capacity(removed=[obj])
+        apply_quota(released=[obj])
+        release_addresses(obj.vlan, [obj.ip_address])
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            rows = list(queryset.values('id', 'ip_address', *CAPACITY_FIELDS))
+            adjust_capacity(removed=rows)
+            apply_quota(released=rows)
+            release_request_addresses(rows)
+            super().delete_queryset(request, queryset)
+
+    def _report_skipped(self, request, skipped, rejected, verb):
+        for row in skipped:
+            messages.warning(request, f"Request {row['id']} ({row['fqdn']}) not {verb}: status is {row['status']}.")
+        for row, reason in rejected:
+            messages.error(request, f"Request {row['id']} ({row['fqdn']}) not {verb}: {reason}")
+
+    def approve_selected(self, request, queryset):
+        approved, skipped, rejected = approve_requests(request.user, queryset)
+        for row in approved:
+            messages.success(request, f"Request {row['id']} ({row['fqdn']}) approved. AWX job launch has been queued.")
+        self._report_skipped(request, skipped, rejected, 'approved')
+    approve_selected.short_description = 'Approve selected requests'
+
+    def deny_selected(self, request, queryset):
+        denied, skipped, rejected = deny_requests(request.user, queryset)
+        for row in denied:
+            messages.info(request, f"Request {row['id']} ({row['fqdn']}) has been denied.")
+        self._report_skipped(request, skipped, rejected, 'denied')
+    deny_selected.short_description = 'Deny selected requests'
 
 
 @admin.register(AuditLog)
-class AuditLogAdmin(admin.ModelAdmin):
+class AuditLogAdmin(FullTextSearchMixin, StreamingExportMixin, admin.ModelAdmin):
     list_display = ('timestamp', 'level', 'action', 'user_link', 'request_link', 'related_awx_job_id', 'message_short')
-    list_filter = ('level', 'action', 'timestamp', 'user')
+    list_filter = ('level', 'action', 'timestamp', ('user', admin.RelatedOnlyFieldListFilter))
     search_fields = ('action', 'message', 'user__username', 'related_request__fqdn', 'related_awx_job_id')
     readonly_fields = ('timestamp', 'level', 'action', 'message', 'user', 'related_request', 'related_awx_job_id')
     date_hierarchy = 'timestamp'
     list_per_page = 50
+    list_select_related = ('user', 'related_request')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['export_as_csv', 'export_as_ndjson']
+    export_fields = AUDIT_LOG_EXPORT_FIELDS
+
+    def search_filter(self, term, using):
+        # The request's FQDN and the username via indexed subqueries, so the search never joins
+        return (
+            text_matches(AuditLog, term, using=using)
+            | Q(related_request__in=ServerRequest.objects.using(using).filter(text_matches(ServerRequest, term, ['fqdn'], using)))
+            | Q(user__in=get_user_model().objects.using(using).filter(username__icontains=term))
+        )
 
     def message_short(self, obj):
         return (obj.message[:75] + '...') if len(obj.message) > 75 else obj.message
@@ -115,7 +242,7 @@ class AuditLogAdmin(admin.ModelAdmin):
 
     def user_link(self, obj):
         if obj.user:
-            link = reverse("admin:auth_user_change", args=[obj.user.id])
+            link = reverse("admin:auth_user_change", args=[obj.user_id])
             return format_html('<a href="{}">{}</a>', link, obj.user.username)
         return "-"
     user_link.short_description = 'User'
@@ -123,8 +250,8 @@ class AuditLogAdmin(admin.ModelAdmin):
 
     def request_link(self, obj):
         if obj.related_request:
-            link = reverse("admin:requests_app_serverrequest_change", args=[obj.related_request.id])
-            return format_html('<a href="{}">{} ({})</a>', link, obj.related_request.id, obj.related_request.fqdn)
+            link = reverse("admin:requests_app_serverrequest_change", args=[obj.related_request_id])
+            return format_html('<a href="{}">{} ({})</a>', link, obj.related_request_id, obj.related_request.fqdn)
         return "-"
     request_link.short_description = 'Related Request'
     request_link.admin_order_field = 'related_request'
@@ -135,3 +262,81 @@ class AuditLogAdmin(admin.ModelAdmin):
         return False
     def has_delete_permission(self, request, obj=None):
         return False
+
+
+@admin.register(AWXLaunch)
+class AWXLaunchAdmin(admin.ModelAdmin):
+    list_display = ('server_request', 'state', 'attempts', 'next_attempt_at', 'awx_job_id', 'queued_by', 'updated_at')
+    list_filter = ('state',)
+    list_select_related = ('server_request', 'queued_by')
+    readonly_fields = ('server_request', 'queued_by', 'state', 'attempts', 'next_attempt_at', 'claimed_at', 'last_error', 'awx_job_id', 'created_at', 'updated_at')
+
+    def has_add_permission(self, request):
+        return False
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(QueuedEmail)
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'state', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('state',)
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('subject', 'body', 'html_body', 'from_email', 'recipients', 'related_request', 'state', 'attempts', 'next_attempt_at', 'claimed_at', 'last_error', 'created_at', 'sent_at')
+
+    def has_add_permission(self, request):
+        return False
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CapacitySummary)
+class CapacitySummaryAdmin(admin.ModelAdmin):
+    list_display = ('month', 'location', 'vlan', 'os_type', 'status', 'request_count', 'cpu_cores', 'memory_gb', 'os_disk_gb', 'data_disk_gb')
+    list_filter = ('location', 'os_type', 'status', 'month')
+    readonly_fields = ('location', 'vlan', 'os_type', 'status', 'month', 'request_count', 'cpu_cores', 'memory_gb', 'os_disk_gb', 'data_disk_gb')
+
+    def has_add_permission(self, request):
+        return False
+    def has_change_permission(self, request, obj=None):
+        return False
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LocationQuota)
+class LocationQuotaAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'cpu_cores_used', 'cpu_cores_limit', 'memory_gb_used', 'memory_gb_limit', 'disk_gb_used', 'disk_gb_limit', 'updated_at')
+    list_filter = ('location',)
+    readonly_fields = ('cpu_cores_used', 'memory_gb_used', 'disk_gb_used', 'updated_at')
+    actions = ['recount_usage']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            # Start from what is already committed at this location/VLAN.
+            recount_quota_usage()
+
+    def recount_usage(self, request, queryset):
+        count = recount_quota_usage()
+        messages.success(request, f"Recounted usage for {count} quota(s).")
+    recount_usage.short_description = 'Recount usage from current requests'
+
+
+@admin.register(VlanSubnet)
+class VlanSubnetAdmin(admin.ModelAdmin):
+    list_display = ('vlan', 'network', 'free_count', 'updated_at')
+    readonly_fields = ('free_count', 'next_index', 'updated_at')
+    actions = ['rebuild_bitmaps']
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change or {'network', 'reserved_addresses'} & set(form.changed_data):
+            build_bitmap(obj)
+            messages.info(request, f"Address pool for VLAN {obj.vlan} rebuilt: {obj.free_count} free.")
+
+    def rebuild_bitmaps(self, request, queryset):
+        for subnet in queryset:
+            build_bitmap(subnet)
+        messages.success(request, f"Rebuilt {len(queryset)} address pool(s) from current requests.")
+    rebuild_bitmaps.short_description = 'Rebuild address pools from current requests'
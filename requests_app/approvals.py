@@ -0,0 +1,96 @@
+# requests_app/approvals.py
+import logging
+from django.db import transaction
+from django.utils import timezone
+from .models import ServerRequest, AuditLog, AWXLaunch
+from .capacity import CAPACITY_FIELDS, adjust_capacity, with_status
+from .quotas import QuotaExceeded, apply_quota
+from .ipam import RELEASING_STATUSES, AddressPoolExhausted, assign_addresses, release_request_addresses
+from .db import lock_for_write
+
+logger = logging.getLogger(__name__)
+
+
+def _move_resources(rows, new_status):
+    apply_quota(released=rows, reserved=[with_status(row, new_status) for row in rows])
+    if new_status == 'APPROVED':
+        assign_addresses(rows)
+    elif new_status in RELEASING_STATUSES:
+        release_request_addresses(rows)
+
+
+def _reserve_resources(rows, new_status):
+    """
+    Applies the quota and address changes for moving `rows` to new_status. Tries the whole selection
+    in one pass; if that overflows a quota or address pool, falls back to row by row so everything
+    that still fits goes through. Returns (rows that fit, [(row, reason)] for the rest).
+    """
+    try:
+        with transaction.atomic():
+            _move_resources(rows, new_status)
+        return rows, []
+    except (QuotaExceeded, AddressPoolExhausted):
+        pass
+    fitting, rejected = [], []
+    for row in rows:
+        try:
+            with transaction.atomic():
+                _move_resources([row], new_status)
+            fitting.append(row)
+        except (QuotaExceeded, AddressPoolExhausted) as e:
+            rejected.append((row, str(e)))
+    return fitting, rejected
+
+
+def transition_requests(user, queryset, from_statuses, new_status, audit_action, via='bulk action'):
+    """
+    Moves the requests in `queryset` that are in from_statuses to new_status with one conditional
+    UPDATE, keeping quotas, addresses and the capacity summary in step, and bulk-creates their
+    AuditLog rows. Returns (transitioned, skipped, rejected) as values() dicts; skipped rows were in
+    another status, rejected ones are (row, reason) pairs that would exceed a quota or address pool.
+    """
+    now = timezone.now()
+    fields = ('id', 'fqdn', 'ip_address', *CAPACITY_FIELDS)
+    with transaction.atomic():
+        lock_for_write()
+        # Row locks elsewhere (SQLite has lock_for_write): a concurrent transition of the same rows waits for
+        # this one to commit, then reads their new status
+        selected = list(ServerRequest.objects.select_for_update().filter(pk__in=queryset.values('pk')).order_by('pk').values(*fields))
+        eligible, rejected = _reserve_resources([row for row in selected if row['status'] in from_statuses], new_status)
+        updated = ServerRequest.objects.filter(pk__in=[row['id'] for row in eligible], status__in=from_statuses).update(
+            status=new_status, approved_denied_by=user, approved_denied_at=now, updated_at=now
+        )
+        if updated != len(eligible):
+            # Some row left from_statuses since it was read: undo the quota and address changes made for it
+            transaction.set_rollback(True)
+            logger.error(f"Expected to move {len(eligible)} request(s) to {new_status} but updated {updated}; rolled back")
+            eligible = None
+        else:
+            adjust_capacity(removed=eligible, added=[with_status(row, new_status) for row in eligible])
+            AuditLog.objects.bulk_create([
+                AuditLog(
+                    level='INFO', action=audit_action,
+                    message=f"Request ID {row['id']} ({row['fqdn']}) {new_status.lower()} via {via}.",
+                    user=user, related_request_id=row['id']
+                )
+                for row in eligible
+            ])
+    if eligible is None:
+        # Nothing was applied; report every row as skipped, with the status it has now
+        return [], list(ServerRequest.objects.filter(pk__in=[row['id'] for row in selected]).order_by('pk').values(*fields)), []
+    skipped = [row for row in selected if row['status'] not in from_statuses]
+    return eligible, skipped, rejected
+
+
+def approve_requests(user, queryset, via='bulk action'):
+    """Approves the PENDING requests in `queryset` and queues their AWX launches. Returns transition_requests' result."""
+    with transaction.atomic():
+        lock_for_write()
+        approved, skipped, rejected = transition_requests(user, queryset, ['PENDING'], 'APPROVED', 'Request Approved', via)
+        AWXLaunch.objects.bulk_create([AWXLaunch(server_request_id=row['id'], queued_by=user) for row in approved])
+    return approved, skipped, rejected
+
+
+def deny_requests(user, queryset, via='bulk action'):
+    """Denies the PENDING or APPROVED requests in `queryset`; a queued AWX launch is dropped by the worker."""
+    return transition_requests(user, queryset, ['PENDING', 'APPROVED'], 'DENIED', 'Request Denied', via)
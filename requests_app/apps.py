@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 class RequestsAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'requests_app'
+
+    def ready(self):
+        from .db import configure_sqlite, install_query_stats
+        from .search import install_search_indexes_after_migrate
+        connection_created.connect(configure_sqlite, dispatch_uid='requests_app.configure_sqlite')
+        connection_created.connect(install_query_stats, dispatch_uid='requests_app.install_query_stats')
+        post_migrate.connect(install_search_indexes_after_migrate, sender=self, dispatch_uid='requests_app.install_search_indexes')
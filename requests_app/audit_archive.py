@@ -0,0 +1,151 @@
+# requests_app/audit_archive.py
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import AuditLog, AuditLogArchiveSummary
+from .paginators import refresh_table_estimate
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FIELDS = (
+    'id', 'timestamp', 'level', 'action', 'message', 'user_id', 'user__username',
+    'related_request_id', 'related_awx_job_id',
+)
+# What the public status page read-back returns: the same columns the live history shows, no staff identities
+PUBLIC_ARCHIVE_FIELDS = ('id', 'timestamp', 'level', 'action', 'message')
+
+
+def archive_path(month):
+    """Path of the gzip'd NDJSON archive holding the entries for `month` ('YYYY-MM')."""
+    return Path(settings.AUDIT_LOG_ARCHIVE_DIR) / f"auditlog-{month}.ndjson.gz"
+
+
+def _append_to_archive(month, records):
+    """
+    Appends records to the month's archive as a new gzip member and fsyncs before returning, so rows
+    are only deleted from the hot table once they are durably on disk. gzip readers treat the
+    concatenated members as one stream.
+    """
+    path = archive_path(month)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as gz:
+            for record in records:
+                gz.write(json.dumps(record, default=str).encode() + b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def _update_summaries(rows):
+    """Folds one archived batch into the per-request summaries (one read, one bulk insert, one bulk update)."""
+    per_request = {}
+    for row in rows:
+        request_id = row['related_request_id']
+        if request_id is None:
+            continue
+        summary = per_request.setdefault(request_id, {'count': 0, 'first': row, 'last': row})
+        summary['count'] += 1
+        if row['timestamp'] < summary['first']['timestamp']:
+            summary['first'] = row
+        if row['timestamp'] >= summary['last']['timestamp']:
+            summary['last'] = row
+
+    existing = AuditLogArchiveSummary.objects.in_bulk(list(per_request), field_name='related_request_id')
+    to_create, to_update = [], []
+    for request_id, batch in per_request.items():
+        summary = existing.get(request_id)
+        if summary is None:
+            summary = AuditLogArchiveSummary(related_request_id=request_id, first_timestamp=batch['first']['timestamp'], last_timestamp=batch['last']['timestamp'])
+            to_create.append(summary)
+        else:
+            to_update.append(summary)
+        summary.archived_count += batch['count']
+        summary.first_timestamp = min(summary.first_timestamp, batch['first']['timestamp'])
+        if batch['last']['timestamp'] >= summary.last_timestamp:
+            summary.last_timestamp = batch['last']['timestamp']
+            summary.last_level = batch['last']['level']
+            summary.last_action = batch['last']['action']
+        summary.updated_at = timezone.now()
+    AuditLogArchiveSummary.objects.bulk_create(to_create)
+    AuditLogArchiveSummary.objects.bulk_update(
+        to_update, ['archived_count', 'first_timestamp', 'last_timestamp', 'last_level', 'last_action', 'updated_at']
+    )
+
+
+def archive_audit_logs(older_than_days=None, batch_size=None):
+    """
+    Moves AuditLog entries older than `older_than_days` into monthly archive files, batch by batch,
+    keeping a per-request summary. Each batch is written and fsynced before it is deleted, so a crash
+    can at worst archive a batch twice (per-request reads de-duplicate on the entry id), never lose it.
+    Returns the number of entries archived.
+    """
+    older_than_days = settings.AUDIT_LOG_RETENTION_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or settings.AUDIT_LOG_ARCHIVE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    archived = 0
+
+    while True:
+        rows = list(
+            AuditLog.objects.filter(timestamp__lt=cutoff).order_by('id').values(*ARCHIVE_FIELDS)[:batch_size]
+        )
+        if not rows:
+            break
+
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(f"{row['timestamp']:%Y-%m}", []).append(row)
+        for month, records in by_month.items():
+            _append_to_archive(month, records)
+
+        with transaction.atomic():
+            _update_summaries(rows)
+            AuditLog.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        archived += len(rows)
+        logger.info(f"Archived {len(rows)} audit log entries ({', '.join(sorted(by_month))}); {archived} so far")
+    if archived:
+        refresh_table_estimate(AuditLog) # So the admin changelist's estimated total drops with the table
+    return archived
+
+
+def _months_between(first, last):
+    month = datetime(first.year, first.month, 1)
+    while (month.year, month.month) <= (last.year, last.month):
+        yield f"{month:%Y-%m}"
+        month = datetime(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+
+def iter_archived_logs(months, related_request_id=None):
+    """
+    Streams archived entries (dicts, oldest first) from the given months' files, optionally only
+    those for one request. Reads one line at a time, so memory use is independent of archive size.
+    Per-request reads also drop duplicates left by an interrupted archive run.
+    """
+    seen_ids = set()
+    for month in months:
+        path = archive_path(month)
+        if not path.exists():
+            continue
+        with gzip.open(path, 'rt') as archive:
+            for line in archive:
+                record = json.loads(line)
+                if related_request_id is not None and record['related_request_id'] != related_request_id:
+                    continue
+                if related_request_id is not None:
+                    if record['id'] in seen_ids:
+                        continue
+                    seen_ids.add(record['id'])
+                record['timestamp'] = parse_datetime(record['timestamp'])
+                yield record
+
+
+def iter_archived_logs_for_request(summary: AuditLogArchiveSummary):
+    """Streams one request's archived entries, opening only the months its summary spans."""
+    months = _months_between(summary.first_timestamp, summary.last_timestamp)
+    return iter_archived_logs(months, related_request_id=summary.related_request_id)
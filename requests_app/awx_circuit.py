@@ -0,0 +1,84 @@
+# requests_app/awx_circuit.py
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# State lives in the Django cache, so every process sharing the cache backend shares the circuit. With the
+# default locmem cache (no CACHE_URL) each gunicorn worker has its own circuit and trips it separately.
+FAILURES_KEY = 'awx-circuit:failures'
+OPEN_UNTIL_KEY = 'awx-circuit:open-until'
+PROBE_KEY = 'awx-circuit:probe'
+
+
+class AWXCircuitOpen(Exception):
+    """Raised instead of calling AWX while the circuit is open (AWX recently failed or was too slow)."""
+
+
+def awx_timeout():
+    """(connect, read) timeout for AWX calls: a dead host fails in seconds, a slow launch still gets time to answer."""
+    return (settings.AWX_CONNECT_TIMEOUT_SECONDS, settings.AWX_READ_TIMEOUT_SECONDS)
+
+
+def circuit_state():
+    """'closed' (calls go through), 'open' (fail fast) or 'half-open' (the reset period is over; one probe may go)."""
+    open_until = cache.get(OPEN_UNTIL_KEY)
+    if open_until is None:
+        return 'closed'
+    return 'open' if time.time() < open_until else 'half-open'
+
+
+def acquire():
+    """
+    True if an AWX call may go ahead now. While half-open only one caller across all processes wins
+    the probe slot (an atomic cache.add); it expires after one call's worth of timeout in case that
+    caller dies without reporting back.
+    """
+    state = circuit_state()
+    if state == 'closed':
+        return True
+    if state == 'open':
+        return False
+    return cache.add(PROBE_KEY, True, sum(awx_timeout()))
+
+
+def record_failure(reason):
+    """
+    Counts a failed (or too slow) AWX call. Opens the circuit for AWX_CIRCUIT_RESET_SECONDS once
+    AWX_CIRCUIT_FAILURE_THRESHOLD failures land within AWX_CIRCUIT_WINDOW_SECONDS, or at once if
+    the failing call was the half-open probe. Logged once per opening, not per call.
+    """
+    probing = circuit_state() != 'closed'
+    cache.add(FAILURES_KEY, 0, settings.AWX_CIRCUIT_WINDOW_SECONDS)
+    try:
+        failures = cache.incr(FAILURES_KEY)
+    except ValueError: # Expired between add and incr
+        failures = 1
+        cache.set(FAILURES_KEY, failures, settings.AWX_CIRCUIT_WINDOW_SECONDS)
+    if probing or failures >= settings.AWX_CIRCUIT_FAILURE_THRESHOLD:
+        cache.set(OPEN_UNTIL_KEY, time.time() + settings.AWX_CIRCUIT_RESET_SECONDS, None)
+        cache.delete_many([PROBE_KEY, FAILURES_KEY])
+        logger.error(
+            f"AWX circuit opened after {'a failed probe' if probing else f'{failures} failure(s)'} ({reason}); "
+            f"failing fast for {settings.AWX_CIRCUIT_RESET_SECONDS}s"
+        )
+
+
+def record_success(elapsed):
+    """Counts a completed AWX call. Calls slower than AWX_CIRCUIT_SLOW_CALL_SECONDS count as failures."""
+    if elapsed >= settings.AWX_CIRCUIT_SLOW_CALL_SECONDS:
+        record_failure(f"slow response, {elapsed:.1f}s")
+        return
+    if cache.get(OPEN_UNTIL_KEY) is not None:
+        logger.info("AWX circuit closed; probe call succeeded")
+    cache.delete_many([OPEN_UNTIL_KEY, PROBE_KEY, FAILURES_KEY])
+
+
+def record_response(status_code, elapsed):
+    """Records an HTTP answer from AWX: 5xx means AWX is unhealthy, anything else means it's reachable."""
+    if status_code >= 500:
+        record_failure(f"HTTP {status_code}")
+    else:
+        record_success(elapsed)
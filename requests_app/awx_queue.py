@@ -0,0 +1,219 @@
+# requests_app/awx_queue.py
+import logging
+import requests
+from asgiref.sync import sync_to_async
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import ServerRequest, AuditLog, AWXLaunch
+from .awx_utils import trigger_awx_job, atrigger_awx_job
+from .awx_circuit import AWXCircuitOpen, circuit_state
+from .capacity import CAPACITY_FIELDS, adjust_capacity, with_status
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_awx_launch(server_request: ServerRequest, user=None):
+    """
+    Records an AWX launch in the outbox. The caller's transaction decides whether it sticks,
+    so an approval that fails to save never leaves a launch behind.
+    """
+    launch = AWXLaunch.objects.create(server_request=server_request, queued_by=user)
+    logger.info(f"Queued AWX launch {launch.id} for request {server_request.id} ({server_request.fqdn})")
+    return launch
+
+
+def _retry_delay(attempts):
+    base = settings.AWX_QUEUE_RETRY_BASE_SECONDS
+    return timedelta(seconds=min(base * (2 ** max(attempts - 1, 0)), settings.AWX_QUEUE_RETRY_MAX_SECONDS))
+
+
+def claim_due_launches(limit):
+    """
+    Claims up to `limit` launches that are due, plus any RUNNING ones whose worker died mid-launch.
+    Each claim is a conditional UPDATE so two workers never pick up the same entry.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.AWX_QUEUE_CLAIM_TIMEOUT_SECONDS)
+    claimable = Q(state='QUEUED', next_attempt_at__lte=now) | Q(state='RUNNING', claimed_at__lt=stale_before)
+
+    candidate_ids = list(
+        AWXLaunch.objects.filter(claimable).order_by('next_attempt_at').values_list('pk', flat=True)[:limit]
+    )
+    claimed_ids = [
+        pk for pk in candidate_ids
+        if AWXLaunch.objects.filter(claimable, pk=pk).update(state='RUNNING', claimed_at=now, attempts=F('attempts') + 1)
+    ]
+    return list(AWXLaunch.objects.filter(pk__in=claimed_ids).select_related('server_request', 'queued_by'))
+
+
+def claim_request_launch(server_request_id):
+    """Claims the QUEUED launch for one request, the same way the worker would, or returns None if there isn't one."""
+    launch_id = (
+        AWXLaunch.objects.filter(server_request_id=server_request_id, state='QUEUED')
+        .order_by('-pk').values_list('pk', flat=True).first()
+    )
+    if launch_id is None or not AWXLaunch.objects.filter(pk=launch_id, state='QUEUED').update(
+        state='RUNNING', claimed_at=timezone.now(), attempts=F('attempts') + 1
+    ):
+        return None
+    return AWXLaunch.objects.select_related('server_request', 'queued_by').get(pk=launch_id)
+
+
+async def alaunch_now(server_request_id):
+    """
+    Launches a just-approved request's queued AWX job from an async view instead of waiting for the
+    worker. A failed launch goes back on the queue with the usual backoff. Returns the job ID or None.
+    """
+    launch = await sync_to_async(claim_request_launch)(server_request_id)
+    if launch is None:
+        return None
+    try:
+        job_id = await atrigger_awx_job(launch.server_request)
+    except AWXCircuitOpen:
+        await sync_to_async(_defer_launch)(launch)
+        return None
+    except Exception as e:
+        logger.error(f"Unexpected error launching AWX job for queue entry {launch.id}: {e}", exc_info=True)
+        job_id, error = None, str(e)
+    else:
+        error = "AWX launch returned no job ID (see application log for details)."
+
+    if not job_id:
+        await sync_to_async(_record_failure)(launch, error)
+        return None
+    return job_id if await sync_to_async(_record_success)(launch, job_id) else None
+
+
+def _record_success(launch: AWXLaunch, job_id):
+    """
+    Stores the launched job and moves the request to PROVISIONING, unless it stopped being APPROVED
+    while AWX was being called (e.g. denied, which has already released its address and quota).
+    That job is then an orphan: it's logged as an ERROR for someone to cancel in AWX. Returns True
+    if the request moved to PROVISIONING.
+    """
+    server_request = launch.server_request
+    with transaction.atomic():
+        AWXLaunch.objects.filter(pk=launch.pk).update(
+            state='SUCCEEDED', awx_job_id=job_id, last_error='', updated_at=timezone.now()
+        )
+        updated = ServerRequest.objects.filter(pk=server_request.pk, status='APPROVED').update(
+            awx_job_id=job_id, status='PROVISIONING', updated_at=timezone.now()
+        )
+        if not updated:
+            status = ServerRequest.objects.filter(pk=server_request.pk).values_list('status', flat=True).first()
+            AuditLog.objects.create(
+                level='ERROR', action='AWX Job Orphaned',
+                message=f"AWX Job {job_id} was launched for request {server_request.id} ({server_request.fqdn}), but the request is now {status or 'deleted'}. Cancel the job in AWX.",
+                user=launch.queued_by, related_request_id=server_request.id if status else None, related_awx_job_id=job_id
+            )
+        else:
+            current = ServerRequest.objects.filter(pk=server_request.pk).values(*CAPACITY_FIELDS).get()
+            adjust_capacity(removed=[with_status(current, 'APPROVED')], added=[current])
+            AuditLog.objects.create(
+                level='SUCCESS', action='AWX Job Triggered',
+                message=f"Launched AWX Job {job_id} for request {server_request.id} ({server_request.fqdn}).",
+                user=launch.queued_by, related_request=server_request, related_awx_job_id=job_id
+            )
+    if not updated:
+        logger.error(f"AWX launch {launch.id} started job {job_id}, but request {server_request.id} is no longer APPROVED; job orphaned")
+        return False
+    logger.info(f"AWX launch {launch.id} succeeded with job {job_id} (attempt {launch.attempts})")
+    return True
+
+
+def _defer_launch(launch: AWXLaunch):
+    """Puts a claimed launch back untouched (the attempt doesn't count) because the AWX circuit is open."""
+    AWXLaunch.objects.filter(pk=launch.pk).update(
+        state='QUEUED', attempts=F('attempts') - 1, next_attempt_at=timezone.now(), updated_at=timezone.now()
+    )
+    logger.info(f"AWX launch {launch.id} deferred; AWX circuit is open")
+
+
+def _record_failure(launch: AWXLaunch, error, retry=True):
+    server_request = launch.server_request
+    if retry and launch.attempts < settings.AWX_QUEUE_MAX_ATTEMPTS:
+        next_attempt_at = timezone.now() + _retry_delay(launch.attempts)
+        AWXLaunch.objects.filter(pk=launch.pk).update(
+            state='QUEUED', next_attempt_at=next_attempt_at, last_error=error, updated_at=timezone.now()
+        )
+        logger.warning(f"AWX launch {launch.id} failed (attempt {launch.attempts}), retrying at {next_attempt_at:%Y-%m-%d %H:%M:%S}: {error}")
+        return
+
+    with transaction.atomic():
+        AWXLaunch.objects.filter(pk=launch.pk).update(state='FAILED', last_error=error, updated_at=timezone.now())
+        AuditLog.objects.create(
+            level='ERROR', action='AWX Trigger Failed',
+            message=f"Failed to launch AWX job for approved request {server_request.id} ({server_request.fqdn}) after {launch.attempts} attempt(s): {error}",
+            user=launch.queued_by, related_request=server_request
+        )
+    logger.error(f"AWX launch {launch.id} for request {server_request.id} gave up after {launch.attempts} attempt(s): {error}")
+
+
+def process_awx_queue(concurrency=None, batch_size=None):
+    """
+    Claims one batch of due launches and runs them through a bounded thread pool.
+    Worker threads only talk to AWX, sharing one pooled requests.Session; all database writes
+    happen on the calling thread. While the AWX circuit is open nothing is claimed; once it is
+    half-open a single launch goes through as the probe.
+    Returns a dict with the number of launches that succeeded, were retried, failed or were deferred.
+    """
+    concurrency = concurrency or settings.AWX_QUEUE_CONCURRENCY
+    batch_size = batch_size or concurrency * 4
+    results = {'succeeded': 0, 'retried': 0, 'failed': 0, 'deferred': 0}
+
+    state = circuit_state()
+    if state == 'open':
+        return results
+    if state == 'half-open':
+        concurrency = batch_size = 1
+
+    launches = claim_due_launches(batch_size)
+    if not launches:
+        return results
+
+    runnable = []
+    for launch in launches:
+        if launch.server_request.status != 'APPROVED':
+            # Denied or edited by hand while it sat in the queue; launching now would be wrong.
+            _record_failure(launch, f"Request is no longer APPROVED (status {launch.server_request.status}).", retry=False)
+            results['failed'] += 1
+        else:
+            runnable.append(launch)
+
+    if not runnable:
+        return results
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    with session, ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='awx-launch') as pool:
+        futures = {pool.submit(trigger_awx_job, launch.server_request, session): launch for launch in runnable}
+        for future in as_completed(futures):
+            launch = futures[future]
+            try:
+                job_id = future.result()
+            except AWXCircuitOpen:
+                # Opened by an earlier failure in this batch (or another process); try again later.
+                _defer_launch(launch)
+                results['deferred'] += 1
+                continue
+            except Exception as e:
+                logger.error(f"Unexpected error launching AWX job for queue entry {launch.id}: {e}", exc_info=True)
+                job_id, error = None, str(e)
+            else:
+                error = "AWX launch returned no job ID (see application log for details)."
+
+            if job_id:
+                results['succeeded' if _record_success(launch, job_id) else 'failed'] += 1
+            else:
+                _record_failure(launch, error)
+                if launch.attempts < settings.AWX_QUEUE_MAX_ATTEMPTS:
+                    results['retried'] += 1
+                else:
+                    results['failed'] += 1
+    return results
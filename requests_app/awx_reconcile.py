@@ -0,0 +1,141 @@
+# requests_app/awx_reconcile.py
+import logging
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import ServerRequest, AuditLog
+from .awx_utils import fetch_awx_job_statuses, AWX_SUCCESS_STATES, AWX_FAILURE_STATES
+from .capacity import CAPACITY_FIELDS, adjust_capacity, with_status
+from .quotas import apply_quota
+from .ipam import release_request_addresses
+from .db import lock_for_write
+
+logger = logging.getLogger(__name__)
+
+
+def _final_status_for(awx_status):
+    """Maps an AWX job status to (ServerRequest status, AuditLog level, AuditLog action), or None if still running."""
+    if awx_status in AWX_SUCCESS_STATES:
+        return 'COMPLETED', 'SUCCESS', 'Provisioning Completed'
+    if awx_status in AWX_FAILURE_STATES:
+        return 'FAILED', 'ERROR', 'Provisioning Failed'
+    return None
+
+
+def _apply_final_status(rows, new_status, awx_states):
+    """
+    Moves the given PROVISIONING requests to new_status with one UPDATE and one bulk INSERT of AuditLog rows.
+    `rows` is a list of (request_id, awx_job_id, fqdn) tuples.
+    """
+    if not rows:
+        return 0
+    with transaction.atomic():
+        lock_for_write()
+        # Only rows still PROVISIONING are touched, so a concurrent deny or manual edit wins. The rows are
+        # locked until commit (FOR UPDATE; the write lock on SQLite), so none can change between this
+        # read and the UPDATE below, which re-checks the status anyway.
+        still_provisioning = {
+            row['id']: row for row in
+            ServerRequest.objects.select_for_update().filter(pk__in=[r[0] for r in rows], status='PROVISIONING')
+            .values('id', 'ip_address', *CAPACITY_FIELDS)
+        }
+        if not still_provisioning:
+            return 0
+        updated = ServerRequest.objects.filter(pk__in=still_provisioning, status='PROVISIONING').update(
+            status=new_status, updated_at=timezone.now()
+        )
+        if updated != len(still_provisioning):
+            # Can't happen while the rows are locked, but counters must only move with the rows: undo, retry next pass.
+            transaction.set_rollback(True)
+            logger.error(f"Reconcile expected to finish {len(still_provisioning)} request(s) but updated {updated}; rolled back")
+            return 0
+        finished = [with_status(row, new_status) for row in still_provisioning.values()]
+        adjust_capacity(removed=still_provisioning.values(), added=finished)
+        apply_quota(released=still_provisioning.values(), reserved=finished) # FAILED hands its resources back
+        if new_status == 'FAILED':
+            release_request_addresses(still_provisioning.values())
+
+        level, action = ('SUCCESS', 'Provisioning Completed') if new_status == 'COMPLETED' else ('ERROR', 'Provisioning Failed')
+        AuditLog.objects.bulk_create([
+            AuditLog(
+                level=level, action=action,
+                message=f"AWX Job {job_id} finished with status '{awx_states[job_id]}' for request {request_id} ({fqdn}).",
+                related_request_id=request_id, related_awx_job_id=job_id,
+            )
+            for request_id, job_id, fqdn in rows if request_id in still_provisioning
+        ])
+    return len(still_provisioning)
+
+
+def reconcile_awx_jobs(batch_size=None, session=None):
+    """
+    Polls AWX for every PROVISIONING request with a job ID and records the ones that finished.
+    Jobs are looked up `batch_size` at a time over a single pooled HTTP session.
+    Returns a dict with the number of requests checked, completed and failed.
+    """
+    batch_size = batch_size or settings.AWX_RECONCILE_BATCH_SIZE
+    results = {'checked': 0, 'completed': 0, 'failed': 0}
+
+    in_flight = list(
+        ServerRequest.objects.filter(status='PROVISIONING', awx_job_id__isnull=False)
+        .order_by('awx_job_id').values_list('id', 'awx_job_id', 'fqdn')
+    )
+    if not in_flight:
+        return results
+
+    own_session = session is None
+    session = session or requests.Session()
+    try:
+        for start in range(0, len(in_flight), batch_size):
+            batch = in_flight[start:start + batch_size]
+            awx_states = fetch_awx_job_statuses([job_id for _, job_id, _ in batch], session=session)
+            if awx_states is None:
+                logger.warning(f"Skipping reconcile batch of {len(batch)} job(s); AWX lookup failed.")
+                continue
+            results['checked'] += len(batch)
+
+            completed = [row for row in batch if awx_states.get(row[1]) in AWX_SUCCESS_STATES]
+            failed = [row for row in batch if awx_states.get(row[1]) in AWX_FAILURE_STATES]
+            results['completed'] += _apply_final_status(completed, 'COMPLETED', awx_states)
+            results['failed'] += _apply_final_status(failed, 'FAILED', awx_states)
+    finally:
+        if own_session:
+            session.close()
+
+    if results['completed'] or results['failed']:
+        logger.info(f"AWX reconcile: checked {results['checked']}, completed {results['completed']}, failed {results['failed']}")
+    return results
+
+
+def apply_awx_job_status(job_id, awx_status):
+    """
+    Applies a single pushed AWX job status (e.g. from the notification webhook).
+    The status change is one conditional UPDATE on the indexed awx_job_id, so duplicate or
+    out-of-order notifications are no-ops. Returns True if the request changed state.
+    A notification that arrives before the launch worker has stored the job ID matches nothing;
+    the periodic reconciler picks those up.
+    """
+    final = _final_status_for(awx_status)
+    if final is None:
+        return False
+    new_status, level, action = final
+    with transaction.atomic():
+        updated = ServerRequest.objects.filter(awx_job_id=job_id, status='PROVISIONING').update(
+            status=new_status, updated_at=timezone.now()
+        )
+        if not updated:
+            return False
+        row = ServerRequest.objects.filter(awx_job_id=job_id).values('id', 'fqdn', 'ip_address', *CAPACITY_FIELDS).first()
+        request_id, fqdn = row['id'], row['fqdn']
+        adjust_capacity(removed=[with_status(row, 'PROVISIONING')], added=[row])
+        apply_quota(released=[with_status(row, 'PROVISIONING')], reserved=[row])
+        if new_status == 'FAILED':
+            release_request_addresses([row])
+        AuditLog.objects.create(
+            level=level, action=action,
+            message=f"AWX Job {job_id} finished with status '{awx_status}' for request {request_id} ({fqdn}).",
+            related_request_id=request_id, related_awx_job_id=job_id,
+        )
+    logger.info(f"AWX Job {job_id} reported '{awx_status}'; request {request_id} marked {new_status}")
+    return True
@@ -1,22 +1,60 @@
 # requests_app/awx_utils.py
+import asyncio
 import requests
+import httpx
 import json
 import logging
+import time
+import weakref
 from django.conf import settings
 from .models import ServerRequest
+from . import awx_circuit
+from .awx_circuit import AWXCircuitOpen, awx_timeout
+from .metrics import observe_awx_call
 
 logger = logging.getLogger(__name__)
 
-def trigger_awx_job(server_request: ServerRequest):
+# One pooled httpx.AsyncClient per event loop (a client can't be shared across loops)
+_async_clients = weakref.WeakKeyDictionary()
+
+# AWX job states (https://docs.ansible.com/automation-controller/latest/html/controllerapi/)
+AWX_SUCCESS_STATES = {'successful'}
+AWX_FAILURE_STATES = {'failed', 'error', 'canceled'}
+
+
+def _get_awx_connection():
     """
-    Triggers the specified AWX Job Template with server_request details.
-    Returns: The AWX Job ID if successfully launched, otherwise None.
+    Returns (base_url, headers) for the configured AWX instance, or (None, None) if unconfigured.
     """
     awx_url = settings.AWX_URL
     awx_token = settings.AWX_TOKEN
-    template_id = settings.AWX_JOB_TEMPLATE_ID
 
-    if not all([awx_url, awx_token, template_id]):
+    if not all([awx_url, awx_token]):
+        logger.error("AWX settings (URL, Token) are not fully configured.")
+        return None, None
+
+    if not awx_url.startswith(('http://', 'https://')):
+        awx_url = 'https://' + awx_url
+    awx_url = awx_url.rstrip('/')
+
+    headers = {
+        'Authorization': f'Bearer {awx_token}',
+        'Content-Type': 'application/json',
+    }
+    return awx_url, headers
+
+
+def _build_launch_request(server_request: ServerRequest):
+    """
+    Returns (launch_url, headers, payload) for launching the job template for server_request,
+    or None if AWX is not configured. Shared by the sync and async clients.
+    """
+    awx_url, headers = _get_awx_connection()
+    if not awx_url:
+        return None
+
+    template_id = settings.AWX_JOB_TEMPLATE_ID
+    if not template_id:
         logger.error("AWX settings (URL, Token, Template ID) are not fully configured.")
         return None
 
@@ -26,20 +64,13 @@ def trigger_awx_job(server_request: ServerRequest):
          logger.error(f"Invalid AWX_JOB_TEMPLATE_ID: {template_id}. Must be an integer.")
          return None
 
-    if not awx_url.startswith(('http://', 'https://')):
-        awx_url = 'https://' + awx_url
-    awx_url = awx_url.rstrip('/')
-
     launch_url = f"{awx_url}/api/v2/job_templates/{template_id}/launch/"
-    headers = {
-        'Authorization': f'Bearer {awx_token}',
-        'Content-Type': 'application/json',
-    }
 
     extra_vars = {
         "target_fqdn": server_request.fqdn,
         "target_vlan": server_request.vlan,
         "target_location": server_request.location,
+        "target_ip_address": server_request.ip_address, # None when the VLAN has no pool configured
         "req_primary_contact": server_request.primary_contact,
         "req_secondary_contact": server_request.secondary_contact,
         "req_group_contact": server_request.group_contact,
@@ -66,11 +97,30 @@ def trigger_awx_job(server_request: ServerRequest):
          "extra_vars": json.dumps(extra_vars) # Send original dict for now
     }
 
-    verify_ssl = awx_url.startswith('https://')
+    return launch_url, headers, payload
+
+
+@observe_awx_call('launch')
+def trigger_awx_job(server_request: ServerRequest, session=None):
+    """
+    Triggers the specified AWX Job Template with server_request details.
+    Pass a `requests.Session` to reuse pooled keep-alive connections across launches.
+    Returns: The AWX Job ID if successfully launched, otherwise None.
+    Raises AWXCircuitOpen without contacting AWX while the circuit breaker is open.
+    """
+    launch = _build_launch_request(server_request)
+    if launch is None:
+        return None
+    launch_url, headers, payload = launch
+    verify_ssl = launch_url.startswith('https://')
+    if not awx_circuit.acquire():
+        raise AWXCircuitOpen(f"AWX circuit is open; not launching for request {server_request.id}.")
 
     try:
-        logger.info(f"Attempting to launch AWX Job Template {template_id} via {launch_url} for request {server_request.id} ({server_request.fqdn})")
-        response = requests.post(launch_url, headers=headers, json=payload, verify=verify_ssl, timeout=30)
+        logger.info(f"Attempting to launch AWX Job Template via {launch_url} for request {server_request.id} ({server_request.fqdn})")
+        started = time.monotonic()
+        response = (session or requests).post(launch_url, headers=headers, json=payload, verify=verify_ssl, timeout=awx_timeout())
+        awx_circuit.record_response(response.status_code, time.monotonic() - started)
         response.raise_for_status()
 
         job_data = response.json()
@@ -83,9 +133,11 @@ def trigger_awx_job(server_request: ServerRequest):
             logger.error(f"AWX job launch response did not contain a job ID. Response Status: {response.status_code}, Body: {response.text}")
             return None
     except requests.exceptions.Timeout:
+         awx_circuit.record_failure('timeout')
          logger.error(f"Timeout connecting to AWX ({launch_url}) for request {server_request.id}")
          return None
     except requests.exceptions.ConnectionError as e:
+        awx_circuit.record_failure('connection error')
         logger.error(f"Connection Error connecting to AWX ({launch_url}) for request {server_request.id}: {e}")
         return None
     except requests.exceptions.RequestException as e:
@@ -97,3 +149,128 @@ def trigger_awx_job(server_request: ServerRequest):
     except Exception as e:
         logger.error(f"An unexpected error occurred during AWX job launch for request {server_request.id}: {e}", exc_info=True)
         return None
+
+
+@observe_awx_call('job_status')
+def fetch_awx_job_statuses(job_ids, session=None):
+    """
+    Looks up the status of many AWX jobs at once via the jobs list endpoint (`id__in` filter).
+    Pass a `requests.Session` to reuse one keep-alive connection across calls.
+    Returns: dict of {job_id: awx_status} for the jobs AWX reported, or None if the lookup failed
+    or was skipped because the circuit breaker is open.
+    """
+    job_ids = sorted(set(job_ids))
+    if not job_ids:
+        return {}
+
+    awx_url, headers = _get_awx_connection()
+    if not awx_url:
+        return None
+
+    http = session or requests
+    jobs_url = f"{awx_url}/api/v2/jobs/"
+    params = {
+        'id__in': ','.join(str(job_id) for job_id in job_ids),
+        'page_size': len(job_ids),
+    }
+    verify_ssl = awx_url.startswith('https://')
+    if not awx_circuit.acquire():
+        logger.debug(f"AWX circuit is open; skipping status lookup for {len(job_ids)} job(s)")
+        return None
+
+    statuses = {}
+    try:
+        while jobs_url:
+            started = time.monotonic()
+            response = http.get(jobs_url, headers=headers, params=params, verify=verify_ssl, timeout=awx_timeout())
+            awx_circuit.record_response(response.status_code, time.monotonic() - started)
+            response.raise_for_status()
+            data = response.json()
+            for job in data.get('results', []):
+                statuses[job['id']] = job.get('status')
+            # AWX returns the next page as a path relative to the host, with the query string included
+            next_page = data.get('next')
+            jobs_url = f"{awx_url}{next_page}" if next_page and next_page.startswith('/') else next_page
+            params = None
+    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+        awx_circuit.record_failure('timeout' if isinstance(e, requests.exceptions.Timeout) else 'connection error')
+        logger.error(f"Error fetching AWX job statuses for {len(job_ids)} job(s): {e}")
+        return None
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error fetching AWX job statuses for {len(job_ids)} job(s): {e}")
+        return None
+    except (ValueError, KeyError) as e:
+        logger.error(f"Unexpected AWX jobs list response while fetching job statuses: {e}")
+        return None
+    return statuses
+
+
+def get_async_client():
+    """
+    Returns the shared httpx.AsyncClient for the running event loop, creating it on first use.
+    Its keep-alive pool is reused by every async AWX call in the process, so concurrent launches
+    skip the TCP/TLS handshake instead of paying it per request.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        connect_timeout, read_timeout = awx_timeout()
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=settings.AWX_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.AWX_ASYNC_MAX_CONNECTIONS,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+@observe_awx_call('launch')
+async def atrigger_awx_job(server_request: ServerRequest, client=None):
+    """
+    Async version of trigger_awx_job() for ASGI views: the coroutine yields while AWX responds, so
+    one process can have many launches in flight. Uses the shared pooled client unless one is passed.
+    Returns: The AWX Job ID if successfully launched, otherwise None.
+    Raises AWXCircuitOpen without contacting AWX while the circuit breaker is open.
+    """
+    launch = _build_launch_request(server_request)
+    if launch is None:
+        return None
+    launch_url, headers, payload = launch
+    client = client or get_async_client()
+    if not awx_circuit.acquire():
+        raise AWXCircuitOpen(f"AWX circuit is open; not launching for request {server_request.id}.")
+
+    try:
+        logger.info(f"Attempting to launch AWX Job Template via {launch_url} for request {server_request.id} ({server_request.fqdn})")
+        started = time.monotonic()
+        response = await client.post(launch_url, headers=headers, json=payload)
+        awx_circuit.record_response(response.status_code, time.monotonic() - started)
+        response.raise_for_status()
+
+        job_id = response.json().get('job')
+        if job_id:
+            logger.info(f"Successfully launched AWX Job {job_id} for request {server_request.id}")
+            return job_id
+        logger.error(f"AWX job launch response did not contain a job ID. Response Status: {response.status_code}, Body: {response.text}")
+        return None
+    except httpx.TimeoutException:
+        awx_circuit.record_failure('timeout')
+        logger.error(f"Timeout connecting to AWX ({launch_url}) for request {server_request.id}")
+        return None
+    except httpx.HTTPStatusError as e:
+        logger.error(f"Error launching AWX job for request {server_request.id}: {e}")
+        logger.error(f"AWX Response Status Code: {e.response.status_code}")
+        logger.error(f"AWX Response Body: {e.response.text}")
+        return None
+    except httpx.TransportError as e:
+        awx_circuit.record_failure('connection error')
+        logger.error(f"Connection Error connecting to AWX ({launch_url}) for request {server_request.id}: {e}")
+        return None
+    except httpx.HTTPError as e:
+        logger.error(f"Error launching AWX job for request {server_request.id}: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during AWX job launch for request {server_request.id}: {e}", exc_info=True)
+        return None
@@ -0,0 +1,115 @@
+# requests_app/bulk_import.py
+import csv
+import io
+import json
+import logging
+from django.conf import settings
+from .forms import BulkServerRequestStep1Form, ServerRequestStep2Form
+from .fqdn_check import resolving_fqdns
+from .models import ServerRequest, LocationQuota
+
+logger = logging.getLogger(__name__)
+
+BOOLEAN_FIELDS = ('backup_required', 'monitoring_required')
+FALSE_VALUES = {'', '0', 'false', 'no', 'n', 'off'}
+
+
+class ImportFileError(Exception):
+    """Raised when an uploaded import file cannot be read as rows."""
+
+
+def parse_import_file(import_file):
+    """
+    Reads an uploaded CSV (header row) or JSON (list of objects) file into a list of row dicts.
+    Raises ImportFileError if the file is unreadable or has too many rows.
+    """
+    try:
+        text = import_file.read().decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise ImportFileError("File must be UTF-8 encoded.")
+
+    if import_file.name.lower().endswith('.json'):
+        try:
+            rows = json.loads(text)
+        except ValueError as e:
+            raise ImportFileError(f"Invalid JSON: {e}")
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ImportFileError("JSON file must contain a list of objects.")
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+
+    if not rows:
+        raise ImportFileError("File does not contain any requests.")
+    if len(rows) > settings.BULK_IMPORT_MAX_ROWS:
+        raise ImportFileError(f"File contains {len(rows)} requests; the limit is {settings.BULK_IMPORT_MAX_ROWS}.")
+    return [_normalize_row(row) for row in rows]
+
+
+def _normalize_row(row):
+    data = {}
+    for key, value in row.items():
+        if key is None:
+            continue # Extra CSV cells without a header
+        key = key.strip()
+        if isinstance(value, str):
+            value = value.strip()
+        if key in BOOLEAN_FIELDS:
+            # Checkbox widgets treat any non-empty string as checked, so drop falsy spellings.
+            if value is None or value is False or str(value).lower() in FALSE_VALUES:
+                continue
+            value = 'on'
+        data[key] = value
+    return data
+
+
+def _form_errors(form):
+    return [
+        f"{field if field != '__all__' else 'row'}: {' '.join(messages)}"
+        for field, messages in form.errors.items()
+    ]
+
+
+def validate_import_rows(rows):
+    """
+    Validates every row with the Step 1 and Step 2 form rules. FQDN uniqueness (within the file
+    and against existing requests) is checked with a single `fqdn__in` query; with FQDN_CHECK_DNS
+    the remaining names are then looked up in DNS in parallel.
+    Returns (unsaved ServerRequest instances, list of (row number, [error messages])).
+    """
+    instances, errors = [], {}
+    row_for_fqdn = {}
+    quotas = list(LocationQuota.objects.all()) # One query for every row's quota check
+
+    for row_number, row in enumerate(rows, start=1):
+        step1_form = BulkServerRequestStep1Form(row, quotas=quotas)
+        step2_form = ServerRequestStep2Form({**row, 'terms_accepted': 'on'}) # Accepted once for the whole upload
+        step1_valid, step2_valid = step1_form.is_valid(), step2_form.is_valid()
+        row_errors = _form_errors(step1_form) + _form_errors(step2_form)
+
+        fqdn = step1_form.cleaned_data.get('fqdn')
+        if fqdn:
+            if fqdn in row_for_fqdn:
+                row_errors.append(f"fqdn: {fqdn} is already used by row {row_for_fqdn[fqdn]}.")
+            else:
+                row_for_fqdn[fqdn] = row_number
+
+        if row_errors:
+            errors[row_number] = row_errors
+        elif step1_valid and step2_valid:
+            instances.append(ServerRequest(**step1_form.cleaned_data, **step2_form.cleaned_data))
+
+    existing = set(ServerRequest.objects.filter(fqdn__in=list(row_for_fqdn)).values_list('fqdn', flat=True))
+    for fqdn in existing:
+        errors.setdefault(row_for_fqdn[fqdn], []).append(f"fqdn: A request for {fqdn} already exists.")
+    if settings.FQDN_CHECK_DNS:
+        for fqdn in resolving_fqdns(fqdn for fqdn in row_for_fqdn if fqdn not in existing):
+            errors.setdefault(row_for_fqdn[fqdn], []).append(f"fqdn: {fqdn} already resolves in DNS.")
+
+    return instances, sorted(errors.items())
+
+
+def create_imported_requests(instances):
+    """Inserts validated requests with bulk_create. Must be called inside a transaction."""
+    created = ServerRequest.objects.bulk_create(instances, batch_size=settings.BULK_IMPORT_BATCH_SIZE)
+    logger.info(f"Bulk import created {len(created)} server request(s): {', '.join(r.fqdn for r in created)}")
+    return created
@@ -0,0 +1,86 @@
+# requests_app/capacity.py
+import logging
+from collections import defaultdict
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from .models import ServerRequest, CapacitySummary
+
+logger = logging.getLogger(__name__)
+
+# Fields a row (model instance or values() dict) needs for capacity accounting
+CAPACITY_FIELDS = ('status', 'location', 'vlan', 'os_type', 'requested_at', 'cpu_cores', 'memory_gb', 'os_disk_gb', 'data_disk_gb')
+SUMMED_FIELDS = ('cpu_cores', 'memory_gb', 'os_disk_gb', 'data_disk_gb')
+# Statuses that hold (or will hold) hypervisor resources
+COMMITTED_STATUSES = ('APPROVED', 'PROVISIONING', 'COMPLETED')
+
+
+def _get(row, field):
+    return row[field] if isinstance(row, dict) else getattr(row, field)
+
+
+def _summary_key(row):
+    requested_at = _get(row, 'requested_at')
+    return (
+        _get(row, 'location'), _get(row, 'vlan'), _get(row, 'os_type'), _get(row, 'status'),
+        requested_at.date().replace(day=1),
+    )
+
+
+def with_status(row, status):
+    """Copy of a capacity row with a different status, for describing a transition."""
+    data = {field: _get(row, field) for field in CAPACITY_FIELDS}
+    data['status'] = status
+    return data
+
+
+def adjust_capacity(added=(), removed=()):
+    """
+    Applies the rows in `added` (+1) and `removed` (-1) to CapacitySummary. Deltas are merged per
+    summary key first, so the cost is one UPDATE per distinct key touched, never a re-aggregation.
+    A status transition is `removed=[old row], added=[row with new status]`.
+    Call inside the transaction that changes the ServerRequest rows.
+    """
+    deltas = defaultdict(lambda: dict.fromkeys(('request_count',) + SUMMED_FIELDS, 0))
+    for sign, rows in ((1, added), (-1, removed)):
+        for row in rows:
+            delta = deltas[_summary_key(row)]
+            delta['request_count'] += sign
+            for field in SUMMED_FIELDS:
+                delta[field] += sign * (_get(row, field) or 0)
+
+    for (location, vlan, os_type, status, month), delta in deltas.items():
+        if not any(delta.values()):
+            continue
+        key = {'location': location, 'vlan': vlan, 'os_type': os_type, 'status': status, 'month': month}
+        increments = {field: F(field) + value for field, value in delta.items()}
+        if CapacitySummary.objects.filter(**key).update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                CapacitySummary.objects.create(**key, **delta)
+        except IntegrityError:
+            # Another writer created the row first; apply on top of theirs.
+            CapacitySummary.objects.filter(**key).update(**increments)
+
+
+def rebuild_capacity_summary():
+    """Recomputes CapacitySummary from ServerRequest in one aggregate query. Returns the number of rows written."""
+    totals = (
+        ServerRequest.objects.annotate(month=TruncMonth('requested_at'))
+        .values('location', 'vlan', 'os_type', 'status', 'month')
+        .annotate(
+            request_count=Count('id'),
+            **{field: Coalesce(Sum(field), 0) for field in SUMMED_FIELDS},
+        )
+        .order_by()
+    )
+    summaries = [
+        CapacitySummary(**{**row, 'month': row['month'].date() if hasattr(row['month'], 'date') else row['month']})
+        for row in totals
+    ]
+    with transaction.atomic():
+        CapacitySummary.objects.all().delete()
+        CapacitySummary.objects.bulk_create(summaries, batch_size=500)
+    logger.info(f"Rebuilt capacity summary: {len(summaries)} rows")
+    return len(summaries)
@@ -0,0 +1,79 @@
+# requests_app/db.py
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """connection_created handler: applies the SQLITE_* pragmas to each new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+
+
+def lock_for_write(using=DEFAULT_DB_ALIAS):
+    """
+    Call first thing inside an atomic block that reads and then writes. On SQLite it takes the write
+    lock up front, as BEGIN IMMEDIATE would (Django 4.2 can't be told to issue that): a transaction
+    that has already read can't wait for the lock when it later writes, and fails at once with
+    "database is locked" if another connection committed meanwhile. Waiting here uses busy_timeout.
+    No-op on other databases.
+    """
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and connection.in_atomic_block:
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE django_migrations SET id = id WHERE 0') # A write that touches nothing
+
+
+class QueryStats:
+    """Running count and time of the database queries made while one request is handled."""
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# A ContextVar rather than a thread-local: sync_to_async copies the context into its worker thread,
+# so queries an async view runs there are still counted against the request.
+_current_query_stats = ContextVar('requests_app_query_stats', default=None)
+
+
+def start_query_stats():
+    """
+    Starts counting queries for the current request. Returns (stats, token for stop_query_stats).
+    If an outer middleware is already counting, its stats are shared and the token is None.
+    """
+    stats = _current_query_stats.get()
+    if stats is not None:
+        return stats, None
+    stats = QueryStats()
+    return stats, _current_query_stats.set(stats)
+
+
+def stop_query_stats(token):
+    if token is not None:
+        _current_query_stats.reset(token)
+
+
+def record_query_stats(execute, sql, params, many, context):
+    """Execute wrapper adding each query to the current request's QueryStats (if one is being tracked)."""
+    stats = _current_query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - started
+
+
+def install_query_stats(sender, connection, **kwargs):
+    """connection_created handler: routes every query on the new connection through record_query_stats."""
+    if record_query_stats not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query_stats)
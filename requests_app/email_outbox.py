@@ -0,0 +1,107 @@
+# requests_app/email_outbox.py
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import QueuedEmail
+from .metrics import EMAIL_SEND_LATENCY
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(subject, text_content, recipients, html_content='', related_request=None, from_email=None):
+    """
+    Stores a rendered email in the outbox; the send_queued_emails worker delivers it.
+    Returns the QueuedEmail, or None if there are no recipients.
+    """
+    recipients = [r.strip() for r in recipients if r and r.strip()]
+    if not recipients:
+        logger.warning(f"Not queueing email '{subject}': no recipients.")
+        return None
+    return QueuedEmail.objects.create(
+        subject=subject, body=text_content, html_body=html_content,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=','.join(recipients), related_request=related_request,
+    )
+
+
+def _retry_delay(attempts):
+    base = settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS
+    return timedelta(seconds=min(base * (2 ** max(attempts - 1, 0)), settings.EMAIL_OUTBOX_RETRY_MAX_SECONDS))
+
+
+def _claim_due_emails(limit):
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS)
+    claimable = Q(state='QUEUED', next_attempt_at__lte=now) | Q(state='SENDING', claimed_at__lt=stale_before)
+
+    candidate_ids = list(
+        QueuedEmail.objects.filter(claimable).order_by('next_attempt_at').values_list('pk', flat=True)[:limit]
+    )
+    claimed_ids = [
+        pk for pk in candidate_ids
+        if QueuedEmail.objects.filter(claimable, pk=pk).update(state='SENDING', claimed_at=now, attempts=F('attempts') + 1)
+    ]
+    return list(QueuedEmail.objects.filter(pk__in=claimed_ids))
+
+
+def _build_message(queued: QueuedEmail, connection):
+    msg = EmailMultiAlternatives(
+        queued.subject, queued.body, queued.from_email, queued.recipients.split(','), connection=connection
+    )
+    if queued.html_body:
+        msg.attach_alternative(queued.html_body, "text/html")
+    return msg
+
+
+def send_queued_emails(batch_size=None):
+    """
+    Delivers one batch of due emails over a single SMTP connection.
+    Failed messages are retried with exponential backoff up to EMAIL_OUTBOX_MAX_ATTEMPTS.
+    Returns a dict with the number of emails sent, retried and failed.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    results = {'sent': 0, 'retried': 0, 'failed': 0}
+
+    emails = _claim_due_emails(batch_size)
+    if not emails:
+        return results
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        # Relay unreachable: nothing in this batch can go out, so push all of it back.
+        logger.error(f"Could not open email connection for {len(emails)} queued email(s): {e}")
+        connection = None
+
+    try:
+        for queued in emails:
+            started = time.perf_counter()
+            try:
+                if connection is None:
+                    raise ConnectionError("Email connection unavailable.")
+                connection.send_messages([_build_message(queued, connection)])
+            except Exception as e:
+                EMAIL_SEND_LATENCY.labels('failure').observe(time.perf_counter() - started)
+                if queued.attempts < settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                    next_attempt_at = timezone.now() + _retry_delay(queued.attempts)
+                    QueuedEmail.objects.filter(pk=queued.pk).update(state='QUEUED', next_attempt_at=next_attempt_at, last_error=str(e))
+                    logger.warning(f"Email {queued.id} ('{queued.subject}') failed (attempt {queued.attempts}), retrying at {next_attempt_at:%Y-%m-%d %H:%M:%S}: {e}")
+                    results['retried'] += 1
+                else:
+                    QueuedEmail.objects.filter(pk=queued.pk).update(state='FAILED', last_error=str(e))
+                    logger.error(f"Email {queued.id} ('{queued.subject}') gave up after {queued.attempts} attempt(s): {e}")
+                    results['failed'] += 1
+            else:
+                EMAIL_SEND_LATENCY.labels('sent').observe(time.perf_counter() - started)
+                QueuedEmail.objects.filter(pk=queued.pk).update(state='SENT', sent_at=timezone.now(), last_error='')
+                logger.info(f"Email {queued.id} ('{queued.subject}') sent to {queued.recipients}")
+                results['sent'] += 1
+    finally:
+        if connection is not None:
+            connection.close()
+    return results
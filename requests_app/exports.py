@@ -0,0 +1,68 @@
+# requests_app/exports.py
+import csv
+import json
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .streaming import streaming_content
+
+SERVER_REQUEST_EXPORT_FIELDS = (
+    'id', 'fqdn', 'status', 'location', 'vlan', 'os_type', 'cpu_cores', 'memory_gb', 'os_disk_gb', 'data_disk_gb',
+    'patching_group', 'hypervisor_type', 'backup_required', 'monitoring_required', 'primary_contact',
+    'secondary_contact', 'group_contact', 'ticket_number', 'user_ids', 'requested_at', 'updated_at',
+    'approved_denied_at', 'approved_denied_by__username', 'awx_job_id', 'ip_address',
+)
+AUDIT_LOG_EXPORT_FIELDS = (
+    'id', 'timestamp', 'level', 'action', 'message', 'user__username',
+    'related_request_id', 'related_request__fqdn', 'related_awx_job_id',
+)
+
+
+class _Echo:
+    """File-like object whose write() hands the line back, so csv.writer can feed a generator."""
+    def write(self, value):
+        return value
+
+
+def _column_names(fields):
+    return [field.replace('__', '_') for field in fields]
+
+
+def _rows(queryset, fields):
+    # values_list() tuples over a chunked iterator: no model instances, and at most one chunk in memory.
+    return queryset.values_list(*fields).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+def iter_csv(queryset, fields):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(_column_names(fields))
+    for row in _rows(queryset, fields):
+        yield writer.writerow([value.isoformat() if hasattr(value, 'isoformat') else value for value in row])
+
+
+def iter_ndjson(queryset, fields):
+    names = _column_names(fields)
+    for row in _rows(queryset, fields):
+        yield json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+}
+
+
+def streaming_export_response(request, queryset, fields, export_format, basename):
+    """
+    Returns a StreamingHttpResponse that starts sending rows immediately and keeps memory flat
+    regardless of how many rows the queryset matches. Under ASGI the rows are read one chunk
+    at a time in a thread, so the event loop isn't blocked and the export isn't buffered whole.
+    """
+    iterator, content_type = EXPORT_FORMATS[export_format]
+    content = streaming_content(request, iterator(queryset, fields), settings.EXPORT_CHUNK_SIZE)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    filename = f"{basename}-{timezone.now():%Y%m%d-%H%M%S}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
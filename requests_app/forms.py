@@ -3,6 +3,11 @@ from django import forms
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
 from .models import ServerRequest
+from .capacity import COMMITTED_STATUSES
+from .quotas import QuotaExceeded, check_quota, request_demand
+from .ipam import AddressPoolExhausted, check_address_available
+from .fqdn_check import check_fqdn_availability
+from django.conf import settings
 import re
 
 EMPTY_LABEL = "--------- Select ---------"
@@ -38,8 +43,9 @@ class ServerRequestStep1Form(forms.ModelForm):
              'data_disk_gb': 'Optional. Enter size in GB (100-750). Leave blank if no data disk needed.',
         }
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, quotas=None, **kwargs):
         super().__init__(*args, **kwargs)
+        self.quotas = quotas # Preloaded LocationQuota rows (bulk import); looked up per form otherwise
         # Add empty labels
         self.fields['vlan'].empty_label = EMPTY_LABEL
         self.fields['location'].empty_label = EMPTY_LABEL
@@ -64,6 +70,11 @@ class ServerRequestStep1Form(forms.ModelForm):
 
     def clean_fqdn(self):
         fqdn = self.cleaned_data.get('fqdn')
+        if fqdn and settings.FQDN_CHECK_DNS:
+            # Same cached check as the live one on the page; the unique constraint is still checked below.
+            result = check_fqdn_availability(fqdn)
+            if not result['available']:
+                raise ValidationError(result['reason'], code='fqdn_unavailable')
         if fqdn: return fqdn.upper()
         return fqdn
 
@@ -78,6 +89,26 @@ class ServerRequestStep1Form(forms.ModelForm):
              raise ValidationError("If specified, Data Disk size must be between 100 and 750 GB.", code='invalid_data_disk_range')
         return data_disk
 
+    def clean(self):
+        cleaned_data = super().clean()
+        location, vlan = cleaned_data.get('location'), cleaned_data.get('vlan')
+        if location and vlan and cleaned_data.get('cpu_cores') and cleaned_data.get('memory_gb'):
+            try:
+                check_quota(location, vlan, request_demand(cleaned_data), quotas=self.quotas)
+            except QuotaExceeded as e:
+                raise ValidationError(f"This request cannot be accommodated at {location}: {e}", code='quota_exceeded')
+        return cleaned_data
+
+
+class BulkServerRequestStep1Form(ServerRequestStep1Form):
+    """Step 1 rules for one bulk-import row. FQDN uniqueness and DNS are checked once for the whole batch."""
+    def clean_fqdn(self):
+        fqdn = self.cleaned_data.get('fqdn')
+        return fqdn.upper() if fqdn else fqdn
+
+    def validate_unique(self):
+        pass
+
 
 # --- Form for Step 2: Contacts, Notes, Ticket, Users, Terms ---
 class ServerRequestStep2Form(forms.ModelForm):
@@ -140,3 +171,50 @@ class ServerRequestStep2Form(forms.ModelForm):
 
         # Removed disk range checks here as they belong to Step 1 form or model validators
         return cleaned_data
+
+
+# --- Admin change form ---
+class ServerRequestAdminForm(forms.ModelForm):
+    """Admin form that rejects approvals or resource edits that would exceed a location quota or address pool."""
+    class Meta:
+        model = ServerRequest
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('status') not in COMMITTED_STATUSES or not cleaned_data.get('location') or not cleaned_data.get('vlan'):
+            return cleaned_data
+        demand = request_demand(cleaned_data)
+        original = self.initial # The instance's stored values
+        if self.instance.pk and original.get('status') in COMMITTED_STATUSES and (original['location'], original['vlan']) == (cleaned_data['location'], cleaned_data['vlan']):
+            # Already holding resources here; only the increase needs headroom.
+            held = request_demand(original)
+            demand = {resource: amount - held[resource] for resource, amount in demand.items()}
+        try:
+            check_quota(cleaned_data['location'], cleaned_data['vlan'], demand)
+        except QuotaExceeded as e:
+            raise ValidationError(str(e), code='quota_exceeded')
+        if cleaned_data['status'] == 'APPROVED' and original.get('status') != 'APPROVED' and not self.instance.ip_address:
+            # save_model allocates an address for the approval
+            try:
+                check_address_available(cleaned_data['vlan'])
+            except AddressPoolExhausted as e:
+                raise ValidationError(str(e), code='address_pool_exhausted')
+        return cleaned_data
+
+
+# --- Bulk Import Upload Form ---
+class BulkImportForm(forms.Form):
+    """Upload form for importing many server requests from a CSV or JSON file."""
+    import_file = forms.FileField(
+        label="Request File",
+        help_text="CSV with a header row, or a JSON list of objects. Columns use the request field names (e.g. fqdn, vlan, location, os_type, cpu_cores, memory_gb, primary_contact)."
+    )
+    terms_accepted = forms.BooleanField(required=True, label="Terms and Conditions")
+
+    def clean_import_file(self):
+        import_file = self.cleaned_data.get('import_file')
+        name = (import_file.name or '').lower()
+        if not name.endswith(('.csv', '.json')):
+            raise ValidationError("Upload a .csv or .json file.", code='invalid_import_type')
+        return import_file
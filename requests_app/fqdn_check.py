@@ -0,0 +1,64 @@
+# requests_app/fqdn_check.py
+import logging
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from .models import ServerRequest
+
+logger = logging.getLogger(__name__)
+
+DNS_LOOKUP_THREADS = 16 # Parallel lookups for a batch of names (bulk import)
+
+
+def _cache_key(fqdn):
+    return f"fqdn-check:{fqdn}"
+
+
+def _resolves(fqdn):
+    try:
+        socket.getaddrinfo(fqdn, None)
+    except (socket.gaierror, UnicodeError):
+        return False
+    return True
+
+
+def resolving_fqdns(fqdns):
+    """Returns the names in fqdns that resolve in DNS, looking them up in parallel."""
+    fqdns = list(fqdns)
+    if not fqdns:
+        return set()
+    with ThreadPoolExecutor(max_workers=min(DNS_LOOKUP_THREADS, len(fqdns)), thread_name_prefix='fqdn-dns') as pool:
+        return {fqdn for fqdn, resolves in zip(fqdns, pool.map(_resolves, fqdns)) if resolves}
+
+
+def check_fqdn_availability(fqdn):
+    """
+    Returns {'fqdn', 'available', 'reason'} for a requested name. Existing requests are found via the
+    unique index on ServerRequest.fqdn; with FQDN_CHECK_DNS the name must not resolve either.
+    Results are cached: "taken" for FQDN_CHECK_CACHE_SECONDS, and "not found" (negative) results for
+    the shorter FQDN_CHECK_NEGATIVE_CACHE_SECONDS, since those go stale the moment someone requests it.
+    """
+    fqdn = (fqdn or '').strip().upper()
+    max_length = ServerRequest._meta.get_field('fqdn').max_length
+    if not fqdn or len(fqdn) > max_length:
+        return {'fqdn': fqdn, 'available': False, 'reason': f"Enter an FQDN of at most {max_length} characters."}
+
+    result = cache.get(_cache_key(fqdn))
+    if result is not None:
+        return result
+
+    reason = ''
+    if ServerRequest.objects.filter(fqdn=fqdn).exists():
+        reason = 'A request for this FQDN already exists.'
+    elif settings.FQDN_CHECK_DNS and _resolves(fqdn):
+        reason = 'This FQDN already resolves in DNS.'
+    result = {'fqdn': fqdn, 'available': not reason, 'reason': reason}
+    timeout = settings.FQDN_CHECK_NEGATIVE_CACHE_SECONDS if result['available'] else settings.FQDN_CHECK_CACHE_SECONDS
+    cache.set(_cache_key(fqdn), result, timeout)
+    return result
+
+
+def forget_fqdns(fqdns):
+    """Drops cached results for names that have just been requested, so they stop showing as available."""
+    cache.delete_many([_cache_key(fqdn.upper()) for fqdn in fqdns])
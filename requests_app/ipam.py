@@ -0,0 +1,159 @@
+# requests_app/ipam.py
+import ipaddress
+import logging
+import re
+from django.db import transaction
+from .models import ServerRequest, VlanSubnet
+
+logger = logging.getLogger(__name__)
+
+# Statuses whose reserved address is handed back to the pool
+RELEASING_STATUSES = ('DENIED', 'FAILED')
+_NOT_FULL_BYTE = re.compile(rb'[^\xff]')
+
+
+class AddressPoolExhausted(Exception):
+    """Raised when a VLAN's subnet has no free address left."""
+
+
+def _set(bitmap, index):
+    bitmap[index >> 3] |= 1 << (index & 7)
+
+
+def _clear(bitmap, index):
+    bitmap[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+
+def _is_set(bitmap, index):
+    return bool(bitmap[index >> 3] & (1 << (index & 7)))
+
+
+def _find_free(bitmap, start):
+    """
+    Index of a free bit at or after `start` (wrapping around), or None. Next-fit: the caller moves
+    `start` past each allocation, so whole used bytes are skipped by a C-level regex search and the
+    average cost per allocation stays constant however large the pool is.
+    """
+    for search_from in (start >> 3, 0):
+        match = _NOT_FULL_BYTE.search(bitmap, search_from)
+        if match:
+            byte_index = match.start()
+            byte = bitmap[byte_index]
+            return byte_index * 8 + ((~byte & (byte + 1)).bit_length() - 1) # Lowest clear bit
+    return None
+
+
+def build_bitmap(subnet: VlanSubnet):
+    """
+    (Re)initializes `subnet`'s bitmap: network, broadcast and reserved addresses, plus every address
+    already held by a request on this VLAN, are marked used. Saves the subnet.
+    """
+    network = ipaddress.IPv4Network(subnet.network)
+    size = network.num_addresses
+    bitmap = bytearray((size + 7) // 8)
+    for index in range(size, len(bitmap) * 8):
+        _set(bitmap, index) # Padding past the end of the subnet
+    taken = {network.network_address, network.broadcast_address} if network.prefixlen < 31 else set()
+    taken.update(ipaddress.IPv4Address(a.strip()) for a in subnet.reserved_addresses.split(',') if a.strip())
+    taken.update(
+        ipaddress.IPv4Address(ip) for ip in
+        ServerRequest.objects.filter(vlan=subnet.vlan, ip_address__isnull=False)
+        .exclude(status__in=RELEASING_STATUSES).values_list('ip_address', flat=True)
+    )
+    for address in taken:
+        if address in network:
+            _set(bitmap, int(address) - int(network.network_address))
+    subnet.bitmap = bytes(bitmap)
+    subnet.free_count = size - sum(1 for address in taken if address in network)
+    subnet.next_index = 0
+    subnet.save()
+
+
+def allocate_addresses(vlan, count=1):
+    """
+    Reserves `count` addresses on `vlan` and returns them as strings, or an empty list if the VLAN has
+    no subnet configured (addressing is then left to the playbook). The subnet row is locked for the
+    duration, so concurrent approvals never get the same address. Raises AddressPoolExhausted.
+    Call inside a transaction.
+    """
+    subnet = VlanSubnet.objects.select_for_update().filter(vlan=vlan).first()
+    if subnet is None or count <= 0:
+        return []
+    if subnet.free_count < count:
+        raise AddressPoolExhausted(f"VLAN {vlan} ({subnet.network}) has {subnet.free_count} free address(es), {count} needed.")
+
+    network = ipaddress.IPv4Network(subnet.network)
+    bitmap = bytearray(subnet.bitmap)
+    addresses, index = [], subnet.next_index
+    for _ in range(count):
+        index = _find_free(bitmap, index)
+        if index is None: # free_count out of step with the bitmap
+            raise AddressPoolExhausted(f"VLAN {vlan} ({subnet.network}) has no free addresses.")
+        _set(bitmap, index)
+        addresses.append(str(network.network_address + index))
+        index += 1
+    subnet.bitmap = bytes(bitmap)
+    subnet.free_count -= count
+    subnet.next_index = index % network.num_addresses
+    subnet.save(update_fields=['bitmap', 'free_count', 'next_index', 'updated_at'])
+    logger.info(f"Allocated {', '.join(addresses)} on VLAN {vlan}")
+    return addresses
+
+
+def check_address_available(vlan):
+    """
+    Raises AddressPoolExhausted if `vlan` has a subnet with no free address left. A read-only check
+    for forms; allocate_addresses stays authoritative.
+    """
+    subnet = VlanSubnet.objects.filter(vlan=vlan).only('network', 'free_count').first()
+    if subnet is not None and subnet.free_count < 1:
+        raise AddressPoolExhausted(f"VLAN {vlan} ({subnet.network}) has no free addresses.")
+
+
+def release_addresses(vlan, addresses):
+    """Returns addresses to `vlan`'s pool. Unknown or already-free addresses are ignored. Call inside a transaction."""
+    addresses = [ipaddress.IPv4Address(a) for a in addresses if a]
+    subnet = VlanSubnet.objects.select_for_update().filter(vlan=vlan).first() if addresses else None
+    if subnet is None:
+        return
+    network = ipaddress.IPv4Network(subnet.network)
+    bitmap = bytearray(subnet.bitmap)
+    released = 0
+    for address in addresses:
+        index = int(address) - int(network.network_address)
+        if address in network and _is_set(bitmap, index):
+            _clear(bitmap, index)
+            released += 1
+    if released:
+        subnet.bitmap = bytes(bitmap)
+        subnet.free_count += released
+        subnet.save(update_fields=['bitmap', 'free_count', 'updated_at'])
+        logger.info(f"Released {released} address(es) on VLAN {vlan}")
+
+
+def assign_addresses(rows):
+    """
+    Allocates an address for each approved request in `rows` (dicts with id and vlan) that does not
+    have one yet, stores it on the request, and returns {request id: address}. One subnet lock per VLAN.
+    """
+    by_vlan = {}
+    for row in rows:
+        if not row.get('ip_address'):
+            by_vlan.setdefault(row['vlan'], []).append(row['id'])
+    assigned = {}
+    for vlan, request_ids in by_vlan.items():
+        for request_id, address in zip(request_ids, allocate_addresses(vlan, len(request_ids))):
+            ServerRequest.objects.filter(pk=request_id).update(ip_address=address)
+            assigned[request_id] = address
+    return assigned
+
+
+def release_request_addresses(rows):
+    """Frees the addresses held by `rows` (dicts with id, vlan and ip_address) and clears them on the requests."""
+    by_vlan = {}
+    for row in rows:
+        if row.get('ip_address'):
+            by_vlan.setdefault(row['vlan'], []).append(row)
+    for vlan, vlan_rows in by_vlan.items():
+        release_addresses(vlan, [row['ip_address'] for row in vlan_rows])
+        ServerRequest.objects.filter(pk__in=[row['id'] for row in vlan_rows]).update(ip_address=None)
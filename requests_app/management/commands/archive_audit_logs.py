@@ -0,0 +1,16 @@
+# requests_app/management/commands/archive_audit_logs.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from requests_app.audit_archive import archive_audit_logs
+
+
+class Command(BaseCommand):
+    help = "Moves old AuditLog entries into gzip'd monthly NDJSON archives, keeping a per-request summary."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=settings.AUDIT_LOG_RETENTION_DAYS, help="Archive entries older than this many days.")
+        parser.add_argument('--batch-size', type=int, default=settings.AUDIT_LOG_ARCHIVE_BATCH_SIZE, help="Entries moved per transaction.")
+
+    def handle(self, *args, **options):
+        archived = archive_audit_logs(older_than_days=options['older_than_days'], batch_size=options['batch_size'])
+        self.stdout.write(f"Archived {archived} audit log entries to {settings.AUDIT_LOG_ARCHIVE_DIR}")
@@ -0,0 +1,16 @@
+# requests_app/management/commands/clear_cache.py
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Empties every configured cache. Run on deploy so no page or fragment rendered by the old code is served."
+
+    def handle(self, *args, **options):
+        cleared = caches.all()
+        for cache in cleared:
+            cache.clear()
+        self.stdout.write(f"Cleared {len(cleared)} cache(s)")
+        if any(isinstance(cache, LocMemCache) for cache in cleared):
+            self.stderr.write("A per-process (locmem) cache was cleared in this process only; running servers keep theirs.")
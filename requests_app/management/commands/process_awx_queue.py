@@ -0,0 +1,35 @@
+# requests_app/management/commands/process_awx_queue.py
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from requests_app.awx_queue import process_awx_queue
+
+
+class Command(BaseCommand):
+    help = "Drains the AWX launch outbox, launching queued jobs with bounded concurrency and retrying failures."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Process the currently due launches and exit.")
+        parser.add_argument('--concurrency', type=int, default=settings.AWX_QUEUE_CONCURRENCY, help="Maximum parallel AWX launches.")
+        parser.add_argument('--batch-size', type=int, default=None, help="Launches claimed per cycle (default: 4x concurrency).")
+        parser.add_argument('--poll-interval', type=float, default=settings.AWX_QUEUE_POLL_SECONDS, help="Seconds to sleep when the queue is empty.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Processing AWX launch queue (concurrency={options['concurrency']})")
+        try:
+            while True:
+                results = process_awx_queue(concurrency=options['concurrency'], batch_size=options['batch_size'])
+                if any(results.values()):
+                    self.stdout.write(
+                        f"Succeeded: {results['succeeded']}, retried: {results['retried']}, failed: {results['failed']}, "
+                        f"deferred: {results['deferred']}"
+                    )
+                if options['once']:
+                    # Keep going while there is a backlog so --once drains everything that is due.
+                    if not any(results.values()):
+                        break
+                    continue
+                if not any(results.values()):
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping AWX queue worker.")
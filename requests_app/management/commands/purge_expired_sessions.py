@@ -0,0 +1,29 @@
+# requests_app/management/commands/purge_expired_sessions.py
+from importlib import import_module
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Deletes expired sessions in small batches, so a large backlog never locks the session table for long."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.SESSION_CLEANUP_BATCH_SIZE, help="Sessions deleted per statement.")
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE not in ('django.contrib.sessions.backends.db', 'django.contrib.sessions.backends.cached_db'):
+            # Cache, file and cookie sessions expire on their own or have their own cleanup.
+            import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
+            self.stdout.write(f"Cleared expired sessions for {settings.SESSION_ENGINE}")
+            return
+
+        now = timezone.now()
+        deleted = 0
+        while True:
+            keys = list(Session.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)[:options['batch_size']])
+            if not keys:
+                break
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+        self.stdout.write(f"Deleted {deleted} expired session(s)")
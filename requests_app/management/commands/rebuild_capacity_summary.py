@@ -0,0 +1,11 @@
+# requests_app/management/commands/rebuild_capacity_summary.py
+from django.core.management.base import BaseCommand
+from requests_app.capacity import rebuild_capacity_summary
+
+
+class Command(BaseCommand):
+    help = "Recomputes the CapacitySummary table from all ServerRequest rows (after bulk edits or to repair drift)."
+
+    def handle(self, *args, **options):
+        rows = rebuild_capacity_summary()
+        self.stdout.write(f"Rebuilt capacity summary: {rows} row(s)")
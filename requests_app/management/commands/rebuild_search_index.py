@@ -0,0 +1,14 @@
+# requests_app/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+from requests_app.search import install_search_indexes
+
+
+class Command(BaseCommand):
+    help = "Recreates the admin full-text search index from the ServerRequest and AuditLog tables (SQLite FTS5; PostgreSQL indexes need no rebuild)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help="Database alias.")
+
+    def handle(self, *args, **options):
+        built = install_search_indexes(options['database'], rebuild=True)
+        self.stdout.write(f"Rebuilt search index for {len(built)} table(s)")
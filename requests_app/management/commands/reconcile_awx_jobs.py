@@ -0,0 +1,27 @@
+# requests_app/management/commands/reconcile_awx_jobs.py
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from requests_app.awx_reconcile import reconcile_awx_jobs
+
+
+class Command(BaseCommand):
+    help = "Polls AWX for in-flight jobs and moves PROVISIONING requests to COMPLETED or FAILED."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run a single reconcile cycle and exit.")
+        parser.add_argument('--batch-size', type=int, default=settings.AWX_RECONCILE_BATCH_SIZE, help="Job IDs per AWX jobs list call.")
+        parser.add_argument('--interval', type=float, default=settings.AWX_RECONCILE_INTERVAL_SECONDS, help="Seconds between cycles.")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                results = reconcile_awx_jobs(batch_size=options['batch_size'])
+                self.stdout.write(
+                    f"Checked: {results['checked']}, completed: {results['completed']}, failed: {results['failed']}"
+                )
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping AWX reconciler.")
@@ -0,0 +1,11 @@
+# requests_app/management/commands/recount_quota_usage.py
+from django.core.management.base import BaseCommand
+from requests_app.quotas import recount_quota_usage
+
+
+class Command(BaseCommand):
+    help = "Resets LocationQuota usage counters from the capacity summary (run after rebuild_capacity_summary)."
+
+    def handle(self, *args, **options):
+        count = recount_quota_usage()
+        self.stdout.write(f"Recounted usage for {count} location quota(s)")
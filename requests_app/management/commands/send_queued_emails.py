@@ -0,0 +1,27 @@
+# requests_app/management/commands/send_queued_emails.py
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from requests_app.email_outbox import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = "Delivers queued notification emails over a reused SMTP connection, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Send everything currently due and exit.")
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_OUTBOX_BATCH_SIZE, help="Emails sent per connection.")
+        parser.add_argument('--poll-interval', type=float, default=settings.EMAIL_OUTBOX_POLL_SECONDS, help="Seconds to sleep when the outbox is empty.")
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                results = send_queued_emails(batch_size=options['batch_size'])
+                if any(results.values()):
+                    self.stdout.write(f"Sent: {results['sent']}, retried: {results['retried']}, failed: {results['failed']}")
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping email sender.")
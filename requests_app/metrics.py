@@ -0,0 +1,103 @@
+# requests_app/metrics.py
+import functools
+import inspect
+import os
+import time
+from django.db.models import Sum
+from prometheus_client import REGISTRY, CollectorRegistry, Histogram, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from .awx_circuit import AWXCircuitOpen
+from .models import ServerRequest, CapacitySummary
+
+# Under gunicorn, set PROMETHEUS_MULTIPROC_DIR (see gunicorn.conf.py): each worker then writes its
+# samples to mmap'd files there and a scrape of any one worker sums them across the whole pool.
+REQUEST_LATENCY = Histogram(
+    'asap_http_request_duration_seconds', 'Time to produce a response, by view.',
+    ['view', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUEST_QUERIES = Histogram(
+    'asap_http_request_db_queries', 'Database queries made while handling a request, by view.',
+    ['view'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250),
+)
+AWX_CALL_LATENCY = Histogram(
+    'asap_awx_call_duration_seconds', 'AWX API call time, by operation and outcome.',
+    ['operation', 'outcome'],
+    buckets=(0.001, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+EMAIL_SEND_LATENCY = Histogram(
+    'asap_email_send_duration_seconds', 'Time to hand one queued email to the mail server, by outcome.',
+    ['outcome'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+
+def _outcome(result=None, error=None):
+    if error is not None:
+        return 'circuit_open' if isinstance(error, AWXCircuitOpen) else 'error'
+    return 'failure' if result is None else 'success'
+
+
+def observe_awx_call(operation):
+    """
+    Decorator for the AWX client functions (sync or async): records their duration in AWX_CALL_LATENCY,
+    with outcome 'success', 'failure' (returned None), 'circuit_open' or 'error' (raised).
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    AWX_CALL_LATENCY.labels(operation, _outcome(error=e)).observe(time.perf_counter() - started)
+                    raise
+                AWX_CALL_LATENCY.labels(operation, _outcome(result)).observe(time.perf_counter() - started)
+                return result
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    AWX_CALL_LATENCY.labels(operation, _outcome(error=e)).observe(time.perf_counter() - started)
+                    raise
+                AWX_CALL_LATENCY.labels(operation, _outcome(result)).observe(time.perf_counter() - started)
+                return result
+        return wrapper
+    return decorator
+
+
+class RequestStatusCollector:
+    """
+    Server request counts by status, read from CapacitySummary at scrape time. Computed by whichever
+    process serves the scrape, so it needs no cross-process aggregation and is always exact.
+    """
+    def describe(self):
+        return [GaugeMetricFamily('asap_server_requests', 'Server requests by status.', labels=['status'])]
+
+    def collect(self):
+        family = GaugeMetricFamily('asap_server_requests', 'Server requests by status.', labels=['status'])
+        totals = dict(
+            CapacitySummary.objects.values_list('status').annotate(total=Sum('request_count')).order_by()
+        )
+        for status, _ in ServerRequest.STATUS_CHOICES:
+            family.add_metric([status], totals.get(status) or 0)
+        yield family
+
+
+_status_registry = CollectorRegistry(auto_describe=False)
+_status_registry.register(RequestStatusCollector())
+
+
+def render_metrics():
+    """Current metrics in the Prometheus text format, aggregated across worker processes in multiprocess mode."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(_status_registry)
@@ -0,0 +1,151 @@
+# requests_app/middleware.py
+import cProfile
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware
+from .db import start_query_stats, stop_query_stats
+from .metrics import REQUEST_LATENCY, REQUEST_QUERIES
+from . import profiling
+
+
+class MetricsMiddleware:
+    """
+    Records each request's latency and query count in the Prometheus histograms, labelled by URL
+    name. Works under WSGI and ASGI without an extra thread hop. Disabled by METRICS_ENABLED=False.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        stats, token = start_query_stats()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_query_stats(token)
+        self._observe(request, response, started, stats)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        stats, token = start_query_stats()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_query_stats(token)
+        self._observe(request, response, started, stats)
+        return response
+
+    def _observe(self, request, response, started, stats):
+        # URL names keep label cardinality bounded; unmatched paths (404s, static files) share one label.
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unresolved'
+        REQUEST_LATENCY.labels(view, request.method, str(response.status_code)).observe(time.perf_counter() - started)
+        REQUEST_QUERIES.labels(view).observe(stats.count)
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, made async-capable. WhiteNoiseMiddleware is sync-only, so under ASGI Django would adapt
+    the whole chain below it and run the async views through async_to_sync. Here static hits are looked
+    up, opened and read in a thread instead; everything else is passed straight on.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is None:
+            return await self.get_response(request)
+        response = await sync_to_async(self.serve)(static_file, request)
+        # An async body, or Django 4.2 reads the whole file into a list before sending any of it
+        response.streaming_content = _aiter_file(response.file_to_stream, response)
+        return response
+
+
+async def _aiter_file(filelike, response):
+    # block_size is read per block: the ASGI handler raises it once the response is returned
+    while filelike is not None and (block := await sync_to_async(filelike.read)(response.block_size)):
+        yield block
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in per-request profiling: SQL count and time, template render time and outbound HTTP/SMTP
+    time for sampled requests (PROFILING_SAMPLE_RATE) or ones sending the X-ASAP-Profile header.
+    Profiled responses get a Server-Timing header; slow ones go to the slow-request log, with a
+    cProfile dump for sync views when PROFILING_DUMP_DIR is set. Not loaded at all when neither
+    sampling nor the header is configured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not profiling.profiling_enabled():
+            raise MiddlewareNotUsed
+        profiling.instrument()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not profiling.should_profile(request):
+            return self.get_response(request)
+        cprofile = cProfile.Profile() if settings.PROFILING_DUMP_DIR else None
+        started = time.perf_counter()
+        query_stats, query_token = start_query_stats()
+        profile, profile_token = profiling.start_profile()
+        try:
+            if cprofile is not None:
+                cprofile.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if cprofile is not None:
+                    cprofile.disable()
+        finally:
+            profiling.stop_profile(profile_token)
+            stop_query_stats(query_token)
+        profiling.report(request, response, time.perf_counter() - started, query_stats, profile, cprofile)
+        return response
+
+    async def __acall__(self, request):
+        if not profiling.should_profile(request):
+            return await self.get_response(request)
+        # No cProfile here: it profiles a thread, and the event loop thread is shared with other requests.
+        started = time.perf_counter()
+        query_stats, query_token = start_query_stats()
+        profile, profile_token = profiling.start_profile()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiling.stop_profile(profile_token)
+            stop_query_stats(query_token)
+        profiling.report(request, response, time.perf_counter() - started, query_stats, profile)
+        return response
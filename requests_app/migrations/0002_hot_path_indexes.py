@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['related_request', 'timestamp'], name='auditlog_request_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serverrequest',
+            index=models.Index(fields=['status', '-requested_at'], name='srvreq_status_requested_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serverrequest',
+            index=models.Index(fields=['location', '-requested_at'], name='srvreq_location_requested_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serverrequest',
+            index=models.Index(fields=['os_type', '-requested_at'], name='srvreq_os_requested_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serverrequest',
+            index=models.Index(fields=['-requested_at'], name='srvreq_requested_idx'),
+        ),
+    ]
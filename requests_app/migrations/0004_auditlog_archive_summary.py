@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests_app', '0003_auditlog_action_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditLogArchiveSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archived_count', models.PositiveIntegerField(default=0)),
+                ('first_timestamp', models.DateTimeField(help_text='Timestamp of the oldest archived entry.')),
+                ('last_timestamp', models.DateTimeField(help_text='Timestamp of the newest archived entry.')),
+                ('last_level', models.CharField(choices=[('INFO', 'Info'), ('WARNING', 'Warning'), ('ERROR', 'Error'), ('SUCCESS', 'Success')], max_length=10)),
+                ('last_action', models.CharField(max_length=255)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('related_request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='audit_archive_summary', to='requests_app.serverrequest')),
+            ],
+            options={
+                'verbose_name': 'Audit Log Archive Summary',
+                'verbose_name_plural': 'Audit Log Archive Summaries',
+            },
+        ),
+    ]
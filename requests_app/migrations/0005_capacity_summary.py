@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests_app', '0004_auditlog_archive_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CapacitySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(choices=[('COS', 'COS'), ('SRS', 'SRS'), ('DFW', 'DFW')], max_length=10)),
+                ('vlan', models.CharField(choices=[('1441', '1441'), ('1443', '1443')], max_length=10)),
+                ('os_type', models.CharField(choices=[('rhel8', 'RHEL 8'), ('rhel9', 'RHEL 9'), ('win2022', 'Windows Server 2022 Standard'), ('win2025', 'Windows Server 2025 Standard')], max_length=20)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending Approval'), ('APPROVED', 'Approved - Queued for Provisioning'), ('DENIED', 'Denied'), ('PROVISIONING', 'Provisioning in Progress'), ('COMPLETED', 'Provisioning Completed'), ('FAILED', 'Provisioning Failed')], max_length=20)),
+                ('month', models.DateField(help_text='First day of the month the requests were submitted in.')),
+                ('request_count', models.IntegerField(default=0)),
+                ('cpu_cores', models.IntegerField(default=0)),
+                ('memory_gb', models.IntegerField(default=0)),
+                ('os_disk_gb', models.IntegerField(default=0)),
+                ('data_disk_gb', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Capacity Summary',
+                'verbose_name_plural': 'Capacity Summaries',
+                'ordering': ['-month', 'location', 'vlan', 'os_type', 'status'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='capacitysummary',
+            constraint=models.UniqueConstraint(fields=('location', 'vlan', 'os_type', 'status', 'month'), name='capacity_summary_unique_key'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests_app', '0005_capacity_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationQuota',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(choices=[('COS', 'COS'), ('SRS', 'SRS'), ('DFW', 'DFW')], max_length=10)),
+                ('vlan', models.CharField(blank=True, choices=[('1441', '1441'), ('1443', '1443')], help_text='Leave blank for a limit on the whole location.', max_length=10)),
+                ('cpu_cores_limit', models.PositiveIntegerField(blank=True, null=True)),
+                ('memory_gb_limit', models.PositiveIntegerField(blank=True, null=True)),
+                ('disk_gb_limit', models.PositiveIntegerField(blank=True, help_text='OS plus data disk.', null=True)),
+                ('cpu_cores_used', models.IntegerField(default=0)),
+                ('memory_gb_used', models.IntegerField(default=0)),
+                ('disk_gb_used', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Location Quota',
+                'verbose_name_plural': 'Location Quotas',
+                'ordering': ['location', 'vlan'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='locationquota',
+            constraint=models.UniqueConstraint(fields=('location', 'vlan'), name='location_quota_unique_scope'),
+        ),
+    ]
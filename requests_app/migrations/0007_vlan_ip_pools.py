@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:21
+
+from django.db import migrations, models
+import requests_app.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests_app', '0006_location_quota'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VlanSubnet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vlan', models.CharField(choices=[('1441', '1441'), ('1443', '1443')], max_length=10, unique=True)),
+                ('network', models.CharField(help_text='IPv4 subnet in CIDR form, /16 or smaller (e.g. 10.14.41.0/24).', max_length=18, validators=[requests_app.models.validate_ipv4_pool])),
+                ('reserved_addresses', models.TextField(blank=True, help_text='Comma-separated addresses never handed out (gateway, appliances). Network and broadcast addresses are always reserved.')),
+                ('bitmap', models.BinaryField(default=bytes)),
+                ('free_count', models.PositiveIntegerField(default=0, editable=False)),
+                ('next_index', models.PositiveIntegerField(default=0, editable=False, help_text='Where the next free-address search starts.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'VLAN Subnet',
+                'verbose_name_plural': 'VLAN Subnets',
+                'ordering': ['vlan'],
+            },
+        ),
+        migrations.AddField(
+            model_name='serverrequest',
+            name='ip_address',
+            field=models.GenericIPAddressField(blank=True, help_text="Address reserved from the VLAN's pool at approval", null=True, protocol='IPv4'),
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.core.exceptions import ValidationError
+import ipaddress
 
 class ServerRequest(models.Model):
     """Model to store server provisioning requests."""
@@ -56,13 +58,21 @@ class ServerRequest(models.Model):
     approved_denied_at = models.DateTimeField(null=True, blank=True)
     approved_denied_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_requests')
     admin_notes = models.TextField(blank=True, help_text="Internal notes for IT Admins")
-    awx_job_id = models.IntegerField(null=True, blank=True, help_text="ID of the launched AWX Job")
+    awx_job_id = models.IntegerField(null=True, blank=True, db_index=True, help_text="ID of the launched AWX Job")
+    ip_address = models.GenericIPAddressField(protocol='IPv4', null=True, blank=True, help_text="Address reserved from the VLAN's pool at approval")
 
     def __str__(self):
         return f"Request for {self.fqdn} ({self.status})"
 
     class Meta:
         ordering = ['-requested_at']
+        # Match the admin changelist (filter by status/location/OS, newest first) and the default ordering.
+        indexes = [
+            models.Index(fields=['status', '-requested_at'], name='srvreq_status_requested_idx'),
+            models.Index(fields=['location', '-requested_at'], name='srvreq_location_requested_idx'),
+            models.Index(fields=['os_type', '-requested_at'], name='srvreq_os_requested_idx'),
+            models.Index(fields=['-requested_at'], name='srvreq_requested_idx'),
+        ]
         verbose_name = "Server Request"
         verbose_name_plural = "Server Requests"
 
@@ -80,11 +90,182 @@ class AuditLog(models.Model):
     related_awx_job_id = models.IntegerField(null=True, blank=True, help_text="AWX Job ID related to this log entry (if applicable).")
 
     def __str__(self):
-        user_str = f" by {self.user.username}" if self.user else ""
-        req_str = f" (Req: {self.related_request.id})" if self.related_request else ""
+        # Never queries: the username only if the user was already loaded (select_related), else the id
+        if self.user_id is None:
+            user_str = ""
+        elif AuditLog.user.is_cached(self):
+            user_str = f" by {self.user.username}"
+        else:
+            user_str = f" by user #{self.user_id}"
+        req_str = f" (Req: {self.related_request_id})" if self.related_request_id else ""
         return f"{self.timestamp:%Y-%m-%d %H:%M:%S} [{self.level}] {self.action}{user_str}{req_str}"
 
     class Meta:
         ordering = ['-timestamp']
+        # The status page reads a request's history in timestamp order.
+        indexes = [
+            models.Index(fields=['related_request', 'timestamp'], name='auditlog_request_ts_idx'),
+            models.Index(fields=['action'], name='auditlog_action_idx'), # Admin "action" filter lists DISTINCT values
+        ]
         verbose_name = "Audit Log Entry"
         verbose_name_plural = "Audit Log Entries"
+
+
+class AWXLaunch(models.Model):
+    """Outbox entry for an AWX job launch, drained by the process_awx_queue command."""
+    STATE_CHOICES = [
+        ('QUEUED', 'Queued'), ('RUNNING', 'Running'),
+        ('SUCCEEDED', 'Succeeded'), ('FAILED', 'Failed'),
+    ]
+    server_request = models.ForeignKey(ServerRequest, on_delete=models.CASCADE, related_name='awx_launches')
+    queued_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='awx_launches', help_text="User who approved the request.")
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='QUEUED')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now, help_text="Earliest time the worker may (re)try this launch.")
+    claimed_at = models.DateTimeField(null=True, blank=True, help_text="When a worker picked this entry up.")
+    last_error = models.TextField(blank=True)
+    awx_job_id = models.IntegerField(null=True, blank=True, help_text="ID of the launched AWX Job")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"AWX launch for request {self.server_request_id} ({self.state})"
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [models.Index(fields=['state', 'next_attempt_at'])]
+        verbose_name = "AWX Launch"
+        verbose_name_plural = "AWX Launch Queue"
+
+
+class QueuedEmail(models.Model):
+    """Outbox entry for a notification email, delivered by the send_queued_emails command."""
+    STATE_CHOICES = [('QUEUED', 'Queued'), ('SENDING', 'Sending'), ('SENT', 'Sent'), ('FAILED', 'Failed')]
+    subject = models.CharField(max_length=255)
+    body = models.TextField(help_text="Plain-text body.")
+    html_body = models.TextField(blank=True, help_text="Optional HTML alternative.")
+    from_email = models.CharField(max_length=255)
+    recipients = models.TextField(help_text="Comma-separated recipient addresses.")
+    related_request = models.ForeignKey(ServerRequest, on_delete=models.SET_NULL, null=True, blank=True, related_name='queued_emails')
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='QUEUED')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} -> {self.recipients} ({self.state})"
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [models.Index(fields=['state', 'next_attempt_at'])]
+        verbose_name = "Queued Email"
+        verbose_name_plural = "Email Outbox"
+
+
+class AuditLogArchiveSummary(models.Model):
+    """Per-request summary of AuditLog entries moved to the cold archive by archive_audit_logs."""
+    related_request = models.OneToOneField(ServerRequest, on_delete=models.CASCADE, related_name='audit_archive_summary')
+    archived_count = models.PositiveIntegerField(default=0)
+    first_timestamp = models.DateTimeField(help_text="Timestamp of the oldest archived entry.")
+    last_timestamp = models.DateTimeField(help_text="Timestamp of the newest archived entry.")
+    last_level = models.CharField(max_length=10, choices=AuditLog.LEVEL_CHOICES)
+    last_action = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.archived_count} archived log entries for request {self.related_request_id}"
+
+    class Meta:
+        verbose_name = "Audit Log Archive Summary"
+        verbose_name_plural = "Audit Log Archive Summaries"
+
+
+class CapacitySummary(models.Model):
+    """
+    Running totals of requested resources per location/VLAN/OS/status and request month.
+    Maintained incrementally by requests_app.capacity on every create, status change and delete;
+    `manage.py rebuild_capacity_summary` recomputes it from scratch.
+    """
+    location = models.CharField(max_length=10, choices=ServerRequest.LOCATION_CHOICES)
+    vlan = models.CharField(max_length=10, choices=ServerRequest.VLAN_CHOICES)
+    os_type = models.CharField(max_length=20, choices=ServerRequest.OS_TYPES)
+    status = models.CharField(max_length=20, choices=ServerRequest.STATUS_CHOICES)
+    month = models.DateField(help_text="First day of the month the requests were submitted in.")
+    request_count = models.IntegerField(default=0)
+    cpu_cores = models.IntegerField(default=0)
+    memory_gb = models.IntegerField(default=0)
+    os_disk_gb = models.IntegerField(default=0)
+    data_disk_gb = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.location}/{self.vlan}/{self.os_type} {self.status} {self.month:%Y-%m}: {self.request_count} requests"
+
+    class Meta:
+        ordering = ['-month', 'location', 'vlan', 'os_type', 'status']
+        constraints = [
+            models.UniqueConstraint(fields=['location', 'vlan', 'os_type', 'status', 'month'], name='capacity_summary_unique_key'),
+        ]
+        verbose_name = "Capacity Summary"
+        verbose_name_plural = "Capacity Summaries"
+
+
+class LocationQuota(models.Model):
+    """
+    Resource limits for a site, or for one VLAN at a site, with O(1) running usage counters.
+    Usage counts requests that hold resources (APPROVED, PROVISIONING, COMPLETED) and is maintained
+    by requests_app.quotas with conditional UPDATEs. An empty limit means unlimited.
+    """
+    location = models.CharField(max_length=10, choices=ServerRequest.LOCATION_CHOICES)
+    vlan = models.CharField(max_length=10, choices=ServerRequest.VLAN_CHOICES, blank=True, help_text="Leave blank for a limit on the whole location.")
+    cpu_cores_limit = models.PositiveIntegerField(null=True, blank=True)
+    memory_gb_limit = models.PositiveIntegerField(null=True, blank=True)
+    disk_gb_limit = models.PositiveIntegerField(null=True, blank=True, help_text="OS plus data disk.")
+    cpu_cores_used = models.IntegerField(default=0)
+    memory_gb_used = models.IntegerField(default=0)
+    disk_gb_used = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.location}/{self.vlan}" if self.vlan else f"{self.location} (all VLANs)"
+
+    class Meta:
+        ordering = ['location', 'vlan']
+        constraints = [
+            models.UniqueConstraint(fields=['location', 'vlan'], name='location_quota_unique_scope'),
+        ]
+        verbose_name = "Location Quota"
+        verbose_name_plural = "Location Quotas"
+
+
+def validate_ipv4_pool(value):
+    try:
+        network = ipaddress.IPv4Network(value)
+    except ValueError as e:
+        raise ValidationError(f"Not a valid IPv4 subnet: {e}")
+    if network.prefixlen < 16:
+        raise ValidationError("Subnets larger than /16 are not supported.")
+
+
+class VlanSubnet(models.Model):
+    """
+    Address pool for a VLAN. `bitmap` holds one bit per address in `network` (1 = in use), so even a
+    /16 is 8 KB; requests_app.ipam allocates from it at approval and frees addresses on DENIED/FAILED.
+    """
+    vlan = models.CharField(max_length=10, choices=ServerRequest.VLAN_CHOICES, unique=True)
+    network = models.CharField(max_length=18, validators=[validate_ipv4_pool], help_text="IPv4 subnet in CIDR form, /16 or smaller (e.g. 10.14.41.0/24).")
+    reserved_addresses = models.TextField(blank=True, help_text="Comma-separated addresses never handed out (gateway, appliances). Network and broadcast addresses are always reserved.")
+    bitmap = models.BinaryField(editable=False, default=bytes)
+    free_count = models.PositiveIntegerField(default=0, editable=False)
+    next_index = models.PositiveIntegerField(default=0, editable=False, help_text="Where the next free-address search starts.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"VLAN {self.vlan}: {self.network} ({self.free_count} free)"
+
+    class Meta:
+        ordering = ['vlan']
+        verbose_name = "VLAN Subnet"
+        verbose_name_plural = "VLAN Subnets"
@@ -0,0 +1,67 @@
+# requests_app/paginators.py
+import logging
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import OperationalError, connections
+from django.utils.functional import cached_property
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_table_rows(model, using='default'):
+    """
+    Returns a cheap row-count estimate for model's table, or None if the backend has no fast estimate.
+    PostgreSQL reads planner statistics; SQLite reads those ANALYZE stores in sqlite_stat1 (see
+    refresh_table_estimate), and has no estimate before the table is first analyzed.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            elif connection.vendor == 'sqlite':
+                # Not MAX(rowid): that is a high-water mark, which archiving or deleting rows never lowers
+                try:
+                    cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+                except OperationalError:
+                    return None # No sqlite_stat1 until the first ANALYZE
+                row = cursor.fetchone()
+                return int(row[0].split()[0]) if row else None # "<rows> <rows per index key>..."
+            elif connection.vendor == 'mysql':
+                cursor.execute("SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s", [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except Exception as e:
+        logger.warning(f"Could not estimate row count for {table}: {e}")
+        return None
+    # reltuples is -1 on PostgreSQL until the table has been analyzed
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+def refresh_table_estimate(model, using='default'):
+    """
+    Re-collects the SQLite statistics estimate_table_rows reads; call after deleting many rows.
+    No-op elsewhere: PostgreSQL's autovacuum and MySQL keep their own estimates current.
+    """
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for very large admin changelists. Unfiltered listings use a table-size estimate instead
+    of COUNT(*) once the table is bigger than ADMIN_ESTIMATED_COUNT_THRESHOLD; filtered ones count exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.where:
+            estimate = estimate_table_rows(queryset.model, using=queryset.db)
+            if estimate is not None and estimate > settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
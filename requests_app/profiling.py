@@ -0,0 +1,140 @@
+# requests_app/profiling.py
+import functools
+import hmac
+import json
+import logging
+import os
+import random
+import time
+from contextvars import ContextVar
+from django.conf import settings
+
+# One JSON object per slow request; route it with LOGGING (by default WARNING goes to stderr)
+slow_logger = logging.getLogger('requests_app.slow_requests')
+
+PROFILE_HEADER = 'HTTP_X_ASAP_PROFILE' # Sent as "X-ASAP-Profile: <PROFILING_HEADER_TOKEN>"
+CATEGORIES = ('template', 'http', 'smtp')
+
+_current_profile = ContextVar('requests_app_request_profile', default=None)
+_instrumented = False
+
+
+class RequestProfile:
+    """Time spent rendering templates and in outbound HTTP/SMTP calls while one request is handled."""
+    __slots__ = CATEGORIES
+
+    def __init__(self):
+        for category in CATEGORIES:
+            setattr(self, category, 0.0)
+
+
+def profiling_enabled():
+    return settings.PROFILING_SAMPLE_RATE > 0 or bool(settings.PROFILING_HEADER_TOKEN)
+
+
+def should_profile(request):
+    """True if this request is sampled, or carries the profiling header with the right token."""
+    token = settings.PROFILING_HEADER_TOKEN
+    header = request.META.get(PROFILE_HEADER)
+    if token and header and hmac.compare_digest(header.encode(), token.encode()):
+        return True
+    rate = settings.PROFILING_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def start_profile():
+    profile = RequestProfile()
+    return profile, _current_profile.set(profile)
+
+
+def stop_profile(token):
+    _current_profile.reset(token)
+
+
+def _timed(category, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            setattr(profile, category, getattr(profile, category) + time.perf_counter() - started)
+    return wrapper
+
+
+def _atimed(category, func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return await func(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            setattr(profile, category, getattr(profile, category) + time.perf_counter() - started)
+    return wrapper
+
+
+def instrument():
+    """
+    Wraps the choke points the portal's time goes through: top-level template rendering (nested
+    includes are part of it), requests/httpx sends (AWX) and SMTP sends. Installed once, and only
+    when profiling is configured, so an unprofiled deployment runs the stock code paths.
+    """
+    global _instrumented
+    if _instrumented:
+        return
+    import httpx
+    import requests
+    from django.core.mail.backends.smtp import EmailBackend
+    from django.template.backends.django import Template
+
+    Template.render = _timed('template', Template.render)
+    requests.Session.send = _timed('http', requests.Session.send)
+    httpx.Client.send = _timed('http', httpx.Client.send)
+    httpx.AsyncClient.send = _atimed('http', httpx.AsyncClient.send)
+    EmailBackend.open = _timed('smtp', EmailBackend.open)
+    EmailBackend.send_messages = _timed('smtp', EmailBackend.send_messages)
+    _instrumented = True
+
+
+def report(request, response, elapsed, query_stats, profile, cprofile=None):
+    """
+    Adds a Server-Timing header to the profiled response and, if it took at least
+    SLOW_REQUEST_THRESHOLD_MS, writes it to the slow log (with a cProfile dump when one was taken
+    and PROFILING_DUMP_DIR is set). Returns the slow-log record, or None if it wasn't slow.
+    """
+    timings = {
+        'total': elapsed * 1000, 'db': query_stats.seconds * 1000,
+        **{category: getattr(profile, category) * 1000 for category in CATEGORIES},
+    }
+    response['Server-Timing'] = ', '.join(f"{name};dur={ms:.1f}" for name, ms in timings.items())
+    if timings['total'] < settings.SLOW_REQUEST_THRESHOLD_MS:
+        return None
+
+    match = getattr(request, 'resolver_match', None)
+    record = {
+        'method': request.method,
+        'path': request.path,
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        'total_ms': round(timings['total'], 1),
+        'sql_count': query_stats.count,
+        'sql_ms': round(timings['db'], 1),
+        'template_ms': round(timings['template'], 1),
+        'http_ms': round(timings['http'], 1),
+        'smtp_ms': round(timings['smtp'], 1),
+        'profile': None,
+    }
+    if cprofile is not None and settings.PROFILING_DUMP_DIR:
+        os.makedirs(settings.PROFILING_DUMP_DIR, exist_ok=True)
+        record['profile'] = os.path.join(
+            settings.PROFILING_DUMP_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{(record['view'] or 'unresolved').replace(':', '-')}.prof"
+        )
+        cprofile.dump_stats(record['profile'])
+    slow_logger.warning(json.dumps(record))
+    return record
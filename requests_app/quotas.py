@@ -0,0 +1,114 @@
+# requests_app/quotas.py
+import logging
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from .capacity import COMMITTED_STATUSES, _get
+from .models import CapacitySummary, LocationQuota
+
+logger = logging.getLogger(__name__)
+
+RESOURCES = (('cpu_cores', 'CPU cores'), ('memory_gb', 'GB memory'), ('disk_gb', 'GB disk'))
+
+
+class QuotaExceeded(Exception):
+    """Raised when a request does not fit in a location's remaining quota."""
+
+
+def request_demand(row):
+    """Resources a request (model instance or values() dict) holds once approved."""
+    return {
+        'cpu_cores': _get(row, 'cpu_cores') or 0,
+        'memory_gb': _get(row, 'memory_gb') or 0,
+        'disk_gb': (_get(row, 'os_disk_gb') or 0) + (_get(row, 'data_disk_gb') or 0),
+    }
+
+
+def _applies(quota, location, vlan):
+    return quota.location == location and quota.vlan in ('', vlan)
+
+
+def _shortfall(quota, demand):
+    """Human-readable description of which limits `demand` would exceed, or '' if it fits."""
+    problems = []
+    for resource, label in RESOURCES:
+        limit = getattr(quota, f'{resource}_limit')
+        if limit is None or demand[resource] <= 0:
+            continue
+        free = limit - getattr(quota, f'{resource}_used')
+        if demand[resource] > free:
+            problems.append(f"{demand[resource]} {label} requested, {max(free, 0)} of {limit} free")
+    return f"{quota} quota exceeded: {'; '.join(problems)}." if problems else ''
+
+
+def check_quota(location, vlan, demand, quotas=None):
+    """
+    Raises QuotaExceeded if `demand` does not fit in the current headroom for location/VLAN.
+    A read-only check for form validation; the authoritative reservation is apply_quota().
+    Pass preloaded `quotas` to validate many rows without a query each.
+    """
+    if quotas is None:
+        quotas = LocationQuota.objects.filter(location=location, vlan__in=['', vlan])
+    for quota in quotas:
+        if _applies(quota, location, vlan):
+            message = _shortfall(quota, demand)
+            if message:
+                raise QuotaExceeded(message)
+
+
+def apply_quota(released=(), reserved=()):
+    """
+    Moves quota usage for a set of status changes: `released` rows stop holding resources and
+    `reserved` rows start to (rows outside COMMITTED_STATUSES are ignored on either side, so callers
+    can pass the before/after row of any transition). Deltas are netted per quota and applied with one
+    conditional UPDATE each, which only matches if the increase still fits. Raises QuotaExceeded
+    otherwise; call inside a transaction so earlier updates roll back with it.
+    """
+    released = [row for row in released if _get(row, 'status') in COMMITTED_STATUSES]
+    reserved = [row for row in reserved if _get(row, 'status') in COMMITTED_STATUSES]
+    if not released and not reserved:
+        return
+    locations = {_get(row, 'location') for row in released + reserved}
+    for quota in LocationQuota.objects.filter(location__in=locations):
+        delta = defaultdict(int)
+        for sign, rows in ((1, reserved), (-1, released)):
+            for row in rows:
+                if _applies(quota, _get(row, 'location'), _get(row, 'vlan')):
+                    for resource, amount in request_demand(row).items():
+                        delta[resource] += sign * amount
+        if not any(delta.values()):
+            continue
+
+        fits = Q(pk=quota.pk)
+        for resource, amount in delta.items():
+            if amount > 0:
+                fits &= Q(**{f'{resource}_limit__isnull': True}) | Q(**{f'{resource}_used__lte': F(f'{resource}_limit') - amount})
+        if not LocationQuota.objects.filter(fits).update(
+            **{f'{resource}_used': F(f'{resource}_used') + amount for resource, amount in delta.items()}
+        ):
+            quota.refresh_from_db()
+            raise QuotaExceeded(_shortfall(quota, delta) or f"{quota} quota exceeded.")
+
+
+def recount_quota_usage():
+    """Resets every quota's usage counters from CapacitySummary (e.g. after creating a quota). Returns the number of quotas updated."""
+    totals = defaultdict(lambda: dict.fromkeys(('cpu_cores', 'memory_gb', 'disk_gb'), 0))
+    committed = (
+        CapacitySummary.objects.filter(status__in=COMMITTED_STATUSES).values('location', 'vlan')
+        .annotate(cpu=Sum('cpu_cores'), memory=Sum('memory_gb'), disk=Sum(F('os_disk_gb') + F('data_disk_gb')))
+        .order_by()
+    )
+    for row in committed:
+        for scope in ((row['location'], ''), (row['location'], row['vlan'])):
+            totals[scope]['cpu_cores'] += row['cpu'] or 0
+            totals[scope]['memory_gb'] += row['memory'] or 0
+            totals[scope]['disk_gb'] += row['disk'] or 0
+
+    quotas = list(LocationQuota.objects.all())
+    for quota in quotas:
+        usage = totals[(quota.location, quota.vlan)]
+        quota.cpu_cores_used, quota.memory_gb_used, quota.disk_gb_used = usage['cpu_cores'], usage['memory_gb'], usage['disk_gb']
+    with transaction.atomic():
+        LocationQuota.objects.bulk_update(quotas, ['cpu_cores_used', 'memory_gb_used', 'disk_gb_used'])
+    logger.info(f"Recounted usage for {len(quotas)} location quota(s)")
+    return len(quotas)
@@ -0,0 +1,132 @@
+# requests_app/search.py
+import logging
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.text import smart_split, unescape_string_literal
+
+logger = logging.getLogger(__name__)
+
+# Text indexed per table; the admin search boxes look in these columns
+SEARCH_COLUMNS = {
+    'requests_app_serverrequest': ('fqdn', 'primary_contact', 'ticket_number', 'vlan', 'admin_notes', 'os_type', 'user_ids', 'hypervisor_type'),
+    'requests_app_auditlog': ('action', 'message', 'related_awx_job_id'),
+}
+# FTS5's trigram tokenizer finds any substring of 3+ characters (case-insensitively), like icontains does
+MIN_INDEXED_TERM_LENGTH = 3
+
+_fts_tables = {} # Database alias -> FTS5 tables present in it
+
+
+def fts_table(table):
+    return f"{table}_fts"
+
+
+def _sqlite_statements(table):
+    columns = SEARCH_COLUMNS[table]
+    index = fts_table(table)
+    names = ', '.join(columns)
+    new_values = ', '.join(f"new.{column}" for column in columns)
+    old_values = ', '.join(f"old.{column}" for column in columns)
+    delete_old = f"INSERT INTO {index}({index}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+    insert_new = f"INSERT INTO {index}(rowid, {names}) VALUES (new.id, {new_values});"
+    return [
+        # External content: the index stores no copy of the text, only the trigrams pointing at rowids
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5({names}, content='{table}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_insert AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {index}_delete AFTER DELETE ON {table} BEGIN {delete_old} END",
+        # Only when an indexed column is written: status-only UPDATEs (approvals, AWX sync) skip the index
+        f"CREATE TRIGGER IF NOT EXISTS {index}_update AFTER UPDATE OF {names} ON {table} BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def _postgresql_statements(table):
+    # Trigram GIN indexes on the same UPPER(column::text) that icontains compares with
+    return ["CREATE EXTENSION IF NOT EXISTS pg_trgm"] + [
+        f"CREATE INDEX IF NOT EXISTS {table}_{column}_trgm ON {table} USING gin (UPPER({column}::text) gin_trgm_ops)"
+        for column in SEARCH_COLUMNS[table]
+    ]
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5'), sqlite_version()")
+        enabled, version = cursor.fetchone()
+    return bool(enabled) and tuple(int(part) for part in version.split('.')) >= (3, 34, 0) # Trigram tokenizer
+
+
+def install_search_indexes(using=DEFAULT_DB_ALIAS, rebuild=False):
+    """
+    Creates the search indexes for this backend if they are missing: FTS5 tables kept in sync by
+    triggers on SQLite, pg_trgm indexes on PostgreSQL. Idempotent. On SQLite a newly created index,
+    or any index when rebuild is set, is filled from its table. Returns the tables (re)built.
+    Other backends, and SQLite builds without FTS5, keep the plain icontains search.
+    """
+    connection = connections[using]
+    _fts_tables.pop(using, None)
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for table in SEARCH_COLUMNS:
+                for statement in _postgresql_statements(table):
+                    cursor.execute(statement)
+        return []
+    if connection.vendor != 'sqlite' or not sqlite_has_fts5(connection):
+        return []
+    existing = set(connection.introspection.table_names())
+    built = []
+    with connection.cursor() as cursor:
+        for table in SEARCH_COLUMNS:
+            if table not in existing:
+                continue # Not migrated yet
+            # Triggers are recreated as well: SQLite drops them whenever a migration remakes the table
+            for statement in _sqlite_statements(table):
+                cursor.execute(statement)
+            if rebuild or fts_table(table) not in existing:
+                cursor.execute(f"INSERT INTO {fts_table(table)}({fts_table(table)}) VALUES ('rebuild')")
+                built.append(table)
+    if built:
+        logger.info(f"Full-text search index built for {', '.join(built)}")
+    return built
+
+
+def install_search_indexes_after_migrate(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """post_migrate handler."""
+    install_search_indexes(using)
+
+
+def has_fts_index(table, using=DEFAULT_DB_ALIAS):
+    if using not in _fts_tables:
+        connection = connections[using]
+        _fts_tables[using] = set(connection.introspection.table_names()) if connection.vendor == 'sqlite' else set()
+    return fts_table(table) in _fts_tables[using]
+
+
+def search_terms(search_term):
+    """Splits an admin search box entry the way ModelAdmin.get_search_results does ("quoted phrases" stay whole)."""
+    terms = []
+    for bit in smart_split(search_term):
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)
+        if bit:
+            terms.append(bit)
+    return terms
+
+
+def text_matches(model, term, columns=None, using=DEFAULT_DB_ALIAS):
+    """
+    Q for model rows whose search columns (or just `columns`) contain term, ignoring case. Uses the
+    FTS5 index on SQLite; elsewhere, or for terms too short for trigrams, it's an icontains per column
+    (indexed by pg_trgm on PostgreSQL).
+    """
+    table = model._meta.db_table
+    columns = columns or SEARCH_COLUMNS[table]
+    if len(term) >= MIN_INDEXED_TERM_LENGTH and has_fts_index(table, using):
+        index = fts_table(table)
+        phrase = '"' + term.replace('"', '""') + '"'
+        if columns != SEARCH_COLUMNS[table]:
+            phrase = f"{{{' '.join(columns)}}} : {phrase}"
+        return Q(pk__in=RawSQL(f"SELECT rowid FROM {index} WHERE {index} MATCH %s", [phrase]))
+    query = Q()
+    for column in columns:
+        query |= Q(**{f"{column}__icontains": term})
+    return query
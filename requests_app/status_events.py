@@ -0,0 +1,156 @@
+# requests_app/status_events.py
+import asyncio
+import contextvars
+import json
+import logging
+from collections import defaultdict
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from .models import ServerRequest, AuditLog
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {'COMPLETED', 'FAILED', 'DENIED'}
+
+
+def format_sse(event, data):
+    """Formats one Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _status_payload(server_request):
+    return {
+        'status': server_request.status,
+        'status_display': server_request.get_status_display(),
+        'awx_job_id': server_request.awx_job_id,
+    }
+
+
+def _log_payload(log):
+    return {
+        'id': log.id, 'timestamp': log.timestamp, 'level': log.level,
+        'action': log.action, 'message': log.message,
+    }
+
+
+class _Subscription:
+    """What one stream has been sent so far: its request's (status, awx_job_id) and newest AuditLog id."""
+    __slots__ = ('status_key', 'last_log_id')
+
+    def __init__(self, status_key, last_log_id):
+        self.status_key = status_key
+        self.last_log_id = last_log_id
+
+
+class StatusBroadcaster:
+    """
+    Fans status changes and new AuditLog rows out to every open SSE stream in this process.
+    One poller coroutine checks all watched requests with two queries per tick, so the database
+    cost does not grow with the number of browsers watching. Each stream keeps its own cursor, so
+    one that subscribed with an older snapshot than the others still gets what it hasn't seen.
+    """
+
+    def __init__(self):
+        self._queues = defaultdict(dict) # request id -> {asyncio.Queue: _Subscription}
+        self._task = None
+
+    def subscribe(self, request_id, status_key, last_log_id):
+        queue = asyncio.Queue()
+        self._queues[request_id][queue] = _Subscription(status_key, last_log_id)
+        if self._task is None or self._task.done():
+            # In an empty context, not the first subscriber's: that would tie the poller's sync_to_async
+            # calls to the request's thread-sensitive executor, which is gone once the request ends.
+            self._task = contextvars.Context().run(asyncio.get_running_loop().create_task, self._run())
+        return queue
+
+    def unsubscribe(self, request_id, queue):
+        watchers = self._queues.get(request_id)
+        if watchers is None:
+            return
+        watchers.pop(queue, None)
+        if not watchers:
+            del self._queues[request_id]
+
+    async def _run(self):
+        while self._queues:
+            await asyncio.sleep(settings.STATUS_STREAM_POLL_SECONDS)
+            try:
+                await self._poll()
+            except Exception as e:
+                logger.error(f"Status stream poll failed: {e}", exc_info=True)
+
+    async def _poll(self):
+        request_ids = list(self._queues)
+        if not request_ids:
+            return
+        min_log_id = min(
+            subscription.last_log_id for watchers in self._queues.values() for subscription in watchers.values()
+        )
+        server_requests, new_logs = await sync_to_async(_fetch_changes)(request_ids, min_log_id)
+
+        for server_request in server_requests:
+            key = (server_request.status, server_request.awx_job_id)
+            for queue, subscription in self._queues.get(server_request.id, {}).items():
+                if subscription.status_key != key:
+                    subscription.status_key = key
+                    queue.put_nowait(('status', _status_payload(server_request)))
+
+        for log in new_logs:
+            for queue, subscription in self._queues.get(log.related_request_id, {}).items():
+                if log.id > subscription.last_log_id:
+                    subscription.last_log_id = log.id
+                    queue.put_nowait(('log', _log_payload(log)))
+
+
+def _fetch_changes(request_ids, min_log_id):
+    """The watched requests and their AuditLog rows newer than min_log_id (oldest first), in one thread hop."""
+    try:
+        server_requests = list(ServerRequest.objects.filter(pk__in=request_ids).only('id', 'status', 'awx_job_id'))
+        new_logs = list(AuditLog.objects.filter(related_request_id__in=request_ids, id__gt=min_log_id).order_by('id'))
+        return server_requests, new_logs
+    finally:
+        # No request_finished signal ever fires for the poller, so its connection is closed (per
+        # CONN_MAX_AGE) here instead of staying open for the life of the process.
+        close_old_connections()
+
+
+broadcaster = StatusBroadcaster()
+
+
+async def status_event_stream(server_request, audit_logs):
+    """
+    Async generator of SSE frames for one request: the current state and history first, then live
+    updates from the shared broadcaster until the request reaches a terminal status, or for at most
+    STATUS_STREAM_MAX_SECONDS. Django 4.2 doesn't notice a client that went away mid-stream, so the
+    cap is what frees a closed tab's subscription; an open one reconnects after `retry:` (the page
+    skips history entries it already shows).
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.STATUS_STREAM_MAX_SECONDS
+    last_log_id = audit_logs[-1].id if audit_logs else 0
+    queue = broadcaster.subscribe(server_request.id, (server_request.status, server_request.awx_job_id), last_log_id)
+    try:
+        yield f"retry: {settings.STATUS_STREAM_RETRY_MS}\n\n"
+        yield format_sse('status', _status_payload(server_request))
+        for log in audit_logs:
+            yield format_sse('log', _log_payload(log))
+        if server_request.status in TERMINAL_STATUSES:
+            yield format_sse('end', {})
+            return
+
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return # No 'end' event: the browser reconnects
+            try:
+                event, data = await asyncio.wait_for(queue.get(), timeout=min(settings.STATUS_STREAM_KEEPALIVE_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n" # Stops proxies from closing an idle stream
+                continue
+            yield format_sse(event, data)
+            if event == 'status' and data['status'] in TERMINAL_STATUSES:
+                yield format_sse('end', {})
+                return
+    finally:
+        broadcaster.unsubscribe(server_request.id, queue)
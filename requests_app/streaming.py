@@ -0,0 +1,25 @@
+# requests_app/streaming.py
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+
+def _next_chunk(iterator, size):
+    return ''.join(islice(iterator, size))
+
+
+async def aiter_chunks(lines, chunk_size):
+    """
+    Async iterator over a sync iterable of str `lines`, joined chunk_size at a time. Each chunk is
+    produced in the thread Django runs sync code in, so lazy database cursors keep working, and sent
+    before the next is read. Django 4.2's StreamingHttpResponse would otherwise turn a sync iterator
+    into a list under ASGI before sending the first byte.
+    """
+    iterator = await sync_to_async(iter)(lines)
+    while chunk := await sync_to_async(_next_chunk)(iterator, chunk_size):
+        yield chunk
+
+
+def streaming_content(request, lines, chunk_size):
+    """Content for a StreamingHttpResponse: async under ASGI, the plain iterable under WSGI."""
+    return aiter_chunks(lines, chunk_size) if isinstance(request, ASGIRequest) else lines
@@ -0,0 +1,25 @@
+# requests_app/templatetags/capacity_tags.py
+from django import template
+from django.db.models import Sum
+from django.utils import timezone
+from ..capacity import COMMITTED_STATUSES, SUMMED_FIELDS
+from ..models import CapacitySummary
+
+register = template.Library()
+
+
+@register.inclusion_tag('requests_app/admin/capacity_dashboard.html')
+def capacity_dashboard():
+    """
+    Committed resources for the current quarter, per location and per location/OS. Reads only
+    CapacitySummary, so its cost depends on the number of summary keys, not on request history.
+    """
+    today = timezone.localdate()
+    quarter_start = today.replace(month=(today.month - 1) // 3 * 3 + 1, day=1)
+    committed = CapacitySummary.objects.filter(month__gte=quarter_start, status__in=COMMITTED_STATUSES)
+    totals = {'request_count': Sum('request_count'), **{field: Sum(field) for field in SUMMED_FIELDS}}
+    return {
+        'quarter_label': f"Q{(quarter_start.month - 1) // 3 + 1} {quarter_start.year}",
+        'by_location': committed.values('location').annotate(**totals).order_by('location'),
+        'by_location_os': committed.values('location', 'os_type').annotate(**totals).order_by('location', 'os_type'),
+    }
@@ -0,0 +1,24 @@
+# requests_app/templatetags/wizard_tags.py
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def field_label(key):
+    """'os_disk_gb' -> 'Os Disk Gb', for the Step 1 summary on the Step 2 page."""
+    return str(key).replace('_', ' ').title()
+
+
+@register.filter
+def selected_choice(field):
+    """
+    The bound select's value if it's one of its choices, else None: the fragment cache key for the
+    Step 1 selects. Any other submitted value renders the same markup (nothing selected), so it
+    shares the None entry instead of adding a cache key per value a client cares to POST.
+    """
+    value = field.value()
+    if value is None:
+        return None
+    value = str(value)
+    return value if any(str(choice) == value for choice, _ in field.field.choices if choice != '') else None
@@ -1,3 +1,1268 @@
-from django.test import TestCase
+import io
+import os
+import smtplib
+import httpx
+import json
+import requests
+import tempfile
+from contextvars import ContextVar
+from datetime import timedelta
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from prometheus_client import REGISTRY
+from django.core import mail
+from django.core.handlers.asgi import ASGIHandler
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .models import ServerRequest, AuditLog, AuditLogArchiveSummary, AWXLaunch, CapacitySummary, LocationQuota, QueuedEmail, VlanSubnet
+from . import awx_circuit
+from .awx_circuit import AWXCircuitOpen
+from .awx_queue import _record_success, process_awx_queue
+from .awx_utils import atrigger_awx_job, fetch_awx_job_statuses, trigger_awx_job
+from .db import lock_for_write
+from .exports import iter_csv, iter_ndjson
+from .email_outbox import _claim_due_emails, queue_email, send_queued_emails
+from .awx_reconcile import apply_awx_job_status, reconcile_awx_jobs
+from . import approvals
+from .approvals import approve_requests, deny_requests
+from .audit_archive import ARCHIVE_FIELDS, _append_to_archive, archive_audit_logs
+from .capacity import adjust_capacity, rebuild_capacity_summary
+from .forms import ServerRequestStep1Form
+from .quotas import QuotaExceeded, recount_quota_usage
+from .paginators import EstimatedCountPaginator, estimate_table_rows, refresh_table_estimate
+from .search import text_matches
+from .status_events import StatusBroadcaster, broadcaster as status_broadcaster, status_event_stream
+from .ipam import AddressPoolExhausted, allocate_addresses, build_bitmap, release_addresses
 
-# Create your tests here.
+# Admin templates reference static files; the manifest storage needs collectstatic, which tests don't run.
+TEST_STORAGES = {'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class HotPathQueryBudgetTests(TestCase):
+    """
+    Query-count and index-usage budgets for the status page, admin changelists and approval path,
+    measured against a large table (QUERY_BUDGET_ROWS, default 100k) so regressions that scale
+    with history size show up here rather than in production.
+    """
+    ROWS = int(os.getenv('QUERY_BUDGET_ROWS', '100000'))
+    STATUSES = ['PENDING', 'APPROVED', 'DENIED', 'PROVISIONING', 'COMPLETED', 'FAILED']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser('budget-admin', 'admin@example.com', 'budget-password')
+        ServerRequest.objects.bulk_create([
+            ServerRequest(
+                fqdn=f"SRV{i:06d}.EXAMPLE.COM", vlan='1441', location=['COS', 'SRS', 'DFW'][i % 3],
+                primary_contact='owner@example.com', os_type='rhel9', cpu_cores=2, memory_gb=8,
+                patching_group='automatic', status=cls.STATUSES[i % len(cls.STATUSES)],
+                awx_job_id=i if cls.STATUSES[i % len(cls.STATUSES)] == 'PROVISIONING' else None,
+            )
+            for i in range(cls.ROWS)
+        ], batch_size=5000)
+        request_ids = list(ServerRequest.objects.values_list('id', flat=True))
+        AuditLog.objects.bulk_create([
+            AuditLog(action='Request Submitted', message=f"Request {request_id} submitted.", related_request_id=request_id, user=cls.admin_user)
+            for request_id in request_ids
+        ], batch_size=5000)
+        rebuild_capacity_summary()
+        cls.pending = ServerRequest.objects.filter(status='PENDING').order_by('pk').last()
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f"Expected {index_name} in query plan:\n{plan}")
+
+    # --- Status page ---
+
+    def test_status_page_query_budget(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('request_status', args=[self.pending.pk]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_status_page_not_modified_is_single_query(self):
+        etag = self.client.get(reverse('request_status', args=[self.pending.pk]))['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('request_status', args=[self.pending.pk]), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_status_json_query_budget(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('request_status_json', args=[self.pending.pk]))
+        self.assertEqual(response.json()['status'], 'PENDING')
+
+    def test_status_history_uses_request_timestamp_index(self):
+        self.assertUsesIndex(self.pending.audit_logs.order_by('timestamp'), 'auditlog_request_ts_idx')
+
+    # --- Admin changelists ---
+
+    def test_serverrequest_changelist_query_budget(self):
+        self.client.force_login(self.admin_user)
+        url = reverse('admin:requests_app_serverrequest_changelist')
+        with self.assertNumQueries(9):
+            response = self.client.get(url, {'status__exact': 'PENDING'})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=1000)
+    def test_auditlog_changelist_query_budget(self):
+        self.client.force_login(self.admin_user)
+        url = reverse('admin:requests_app_auditlog_changelist')
+        refresh_table_estimate(AuditLog) # The total comes from ANALYZE statistics, not COUNT(*)
+        with self.assertNumQueries(10):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['cl'].result_list), 50)
+
+    def test_auditlog_str_does_not_query(self):
+        log = AuditLog.objects.first()
+        with self.assertNumQueries(0):
+            self.assertIn(f"by user #{self.admin_user.pk}", str(log))
+        log = AuditLog.objects.select_related('user').first()
+        with self.assertNumQueries(0):
+            self.assertIn("by budget-admin", str(log))
+
+    def test_status_filter_uses_status_requested_index(self):
+        self.assertUsesIndex(ServerRequest.objects.filter(status='PENDING').order_by('-requested_at')[:100], 'srvreq_status_requested_idx')
+
+    def test_location_filter_uses_location_requested_index(self):
+        self.assertUsesIndex(ServerRequest.objects.filter(location='DFW').order_by('-requested_at')[:100], 'srvreq_location_requested_idx')
+
+    def test_awx_job_lookup_uses_index(self):
+        plan = ServerRequest.objects.filter(awx_job_id=3).explain()
+        self.assertRegex(plan, r'USING (COVERING )?INDEX \S*awx_job_id')
+
+    # --- Approval path ---
+
+    def test_approval_query_budget(self):
+        self.client.force_login(self.admin_user)
+        url = reverse('admin:requests_app_serverrequest_change', args=[self.pending.pk])
+        form_data = {
+            field: getattr(self.pending, field) for field in (
+                'fqdn', 'vlan', 'location', 'primary_contact', 'secondary_contact', 'group_contact', 'ticket_number',
+                'notes', 'user_ids', 'os_type', 'cpu_cores', 'memory_gb', 'os_disk_gb', 'patching_group', 'hypervisor_type',
+            )
+        }
+        form_data.update({'data_disk_gb': '', 'status': 'APPROVED', 'admin_notes': ''})
+        ContentType.objects.get_for_model(ServerRequest) # Warm the cache the admin log uses, as in a running process
+        # Includes the quota and address pool checks and reservations, and the capacity summary: one UPDATE
+        # per key, plus a savepoint'd INSERT because the fixture has no APPROVED row for this location/month yet.
+        with self.assertNumQueries(20):
+            response = self.client.post(url, form_data)
+        self.assertEqual(response.status_code, 302)
+        self.pending.refresh_from_db()
+        self.assertEqual(self.pending.status, 'APPROVED')
+        self.assertTrue(AWXLaunch.objects.filter(server_request=self.pending, state='QUEUED').exists())
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class CapacitySummaryTests(TestCase):
+    """The incrementally maintained summary must always equal a full rebuild."""
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('capacity-admin', 'admin@example.com', 'capacity-password')
+        created = ServerRequest.objects.bulk_create([
+            ServerRequest(
+                fqdn=f"CAP{i:03d}.EXAMPLE.COM", vlan='1441', location=['COS', 'DFW'][i % 2],
+                primary_contact='owner@example.com', os_type='rhel9', cpu_cores=4, memory_gb=16, data_disk_gb=100 if i % 3 else None,
+                patching_group='automatic',
+            )
+            for i in range(6)
+        ])
+        adjust_capacity(added=created)
+
+    def summary_rows(self):
+        return sorted(CapacitySummary.objects.values_list(
+            'location', 'vlan', 'os_type', 'status', 'month', 'request_count', 'cpu_cores', 'memory_gb', 'os_disk_gb', 'data_disk_gb'
+        ).exclude(request_count=0))
+
+    def assertSummaryMatchesRebuild(self):
+        incremental = self.summary_rows()
+        rebuild_capacity_summary()
+        self.assertEqual(incremental, self.summary_rows())
+
+    def test_transitions_keep_summary_in_sync(self):
+        self.client.force_login(self.admin_user)
+        changelist = reverse('admin:requests_app_serverrequest_changelist')
+        ids = list(ServerRequest.objects.order_by('pk').values_list('pk', flat=True))
+        self.client.post(changelist, {'action': 'approve_selected', '_selected_action': ids[:4]})
+        self.client.post(changelist, {'action': 'deny_selected', '_selected_action': ids[3:5]})
+        for launch in AWXLaunch.objects.select_related('server_request').filter(server_request_id__in=ids[:2]):
+            _record_success(launch, job_id=launch.server_request_id + 1000)
+        apply_awx_job_status(ids[0] + 1000, 'successful')
+        apply_awx_job_status(ids[1] + 1000, 'failed')
+        self.assertSummaryMatchesRebuild()
+        self.assertEqual(CapacitySummary.objects.get(status='COMPLETED').cpu_cores, 4)
+
+    def test_delete_removes_from_summary(self):
+        self.client.force_login(self.admin_user)
+        ids = list(ServerRequest.objects.values_list('pk', flat=True)[:3])
+        self.client.post(reverse('admin:requests_app_serverrequest_changelist'), {'action': 'delete_selected', '_selected_action': ids, 'post': 'yes'})
+        self.assertSummaryMatchesRebuild()
+
+    def test_admin_index_reads_only_summary(self):
+        self.client.force_login(self.admin_user)
+        ServerRequest.objects.update(status='APPROVED')
+        rebuild_capacity_summary()
+        response = self.client.get(reverse('admin:index'))
+        self.assertContains(response, 'Committed Capacity')
+        self.assertContains(response, '<td class="text-right">12</td>', html=False)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('admin:index'))
+        dashboard_queries = [q['sql'] for q in queries.captured_queries if 'requests_app_' in q['sql']]
+        self.assertTrue(dashboard_queries)
+        self.assertTrue(all('requests_app_capacitysummary' in sql for sql in dashboard_queries), dashboard_queries)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class LocationQuotaTests(TestCase):
+    """Quotas are checked at submission and reserved atomically at approval."""
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('quota-admin', 'admin@example.com', 'quota-password')
+        LocationQuota.objects.create(location='DFW', cpu_cores_limit=10)
+        LocationQuota.objects.create(location='DFW', vlan='1443', memory_gb_limit=24)
+        self.requests = ServerRequest.objects.bulk_create([
+            ServerRequest(
+                fqdn=f"QUOTA{i}.EXAMPLE.COM", vlan='1441', location='DFW', primary_contact='owner@example.com',
+                os_type='rhel9', cpu_cores=4, memory_gb=8, patching_group='automatic',
+            )
+            for i in range(3)
+        ])
+
+    def step1_data(self, **overrides):
+        data = {
+            'fqdn': 'NEW.EXAMPLE.COM', 'vlan': '1441', 'location': 'DFW', 'os_type': 'rhel9', 'cpu_cores': 4,
+            'memory_gb': 8, 'os_disk_gb': 100, 'patching_group': 'automatic',
+        }
+        data.update(overrides)
+        return data
+
+    def test_step1_form_rejects_request_over_quota(self):
+        self.assertTrue(ServerRequestStep1Form(self.step1_data(cpu_cores=8)).is_valid())
+        LocationQuota.objects.filter(vlan='').update(cpu_cores_used=4)
+        form = ServerRequestStep1Form(self.step1_data(cpu_cores=8))
+        self.assertFalse(form.is_valid())
+        self.assertIn('8 CPU cores requested, 6 of 10 free', str(form.non_field_errors()))
+
+    def test_vlan_quota_applies_only_to_its_vlan(self):
+        self.assertFalse(ServerRequestStep1Form(self.step1_data(vlan='1443', memory_gb=32)).is_valid())
+        self.assertTrue(ServerRequestStep1Form(self.step1_data(vlan='1441', memory_gb=32)).is_valid())
+
+    def test_bulk_approval_stops_at_quota(self):
+        self.client.force_login(self.admin_user)
+        self.client.post(reverse('admin:requests_app_serverrequest_changelist'), {
+            'action': 'approve_selected', '_selected_action': [r.pk for r in self.requests],
+        })
+        self.assertEqual(ServerRequest.objects.filter(status='APPROVED').count(), 2)
+        self.assertEqual(LocationQuota.objects.get(vlan='').cpu_cores_used, 8)
+
+    def test_deny_and_failure_release_quota(self):
+        self.client.force_login(self.admin_user)
+        changelist = reverse('admin:requests_app_serverrequest_changelist')
+        ids = [r.pk for r in self.requests]
+        self.client.post(changelist, {'action': 'approve_selected', '_selected_action': ids[:2]})
+        self.client.post(changelist, {'action': 'deny_selected', '_selected_action': ids[:1]})
+        self.assertEqual(LocationQuota.objects.get(vlan='').cpu_cores_used, 4)
+        ServerRequest.objects.filter(pk=ids[1]).update(status='PROVISIONING', awx_job_id=77)
+        apply_awx_job_status(77, 'failed')
+        self.assertEqual(LocationQuota.objects.get(vlan='').cpu_cores_used, 0)
+
+    def test_recount_matches_incremental_usage(self):
+        self.client.force_login(self.admin_user)
+        self.client.post(reverse('admin:requests_app_serverrequest_changelist'), {
+            'action': 'approve_selected', '_selected_action': [r.pk for r in self.requests[:2]],
+        })
+        rebuild_capacity_summary()
+        recount_quota_usage()
+        self.assertEqual(LocationQuota.objects.get(vlan='').cpu_cores_used, 8)
+
+    def change_form_data(self, server_request, **overrides):
+        data = {
+            field: getattr(server_request, field) for field in (
+                'fqdn', 'vlan', 'location', 'primary_contact', 'secondary_contact', 'group_contact', 'ticket_number',
+                'notes', 'user_ids', 'os_type', 'cpu_cores', 'memory_gb', 'os_disk_gb', 'patching_group', 'hypervisor_type',
+            )
+        }
+        data.update({'data_disk_gb': '', 'status': 'APPROVED', 'admin_notes': ''})
+        data.update(overrides)
+        return data
+
+    def test_change_form_rejects_approval_from_an_exhausted_pool(self):
+        self.client.force_login(self.admin_user)
+        build_bitmap(VlanSubnet(vlan='1441', network='10.14.41.0/30', reserved_addresses='10.14.41.1,10.14.41.2'))
+        server_request = self.requests[0]
+        response = self.client.post(reverse('admin:requests_app_serverrequest_change', args=[server_request.pk]), self.change_form_data(server_request))
+        self.assertEqual(response.status_code, 200) # The form again, with the error
+        self.assertIn('has no free addresses', str(response.context['adminform'].form.non_field_errors()))
+        self.assertEqual(ServerRequest.objects.get(pk=server_request.pk).status, 'PENDING')
+
+    def test_change_form_reservation_failure_saves_and_logs_nothing(self):
+        # The form's check passed, then another approval took the quota before save_model reserved it
+        self.client.force_login(self.admin_user)
+        server_request = self.requests[0]
+        url = reverse('admin:requests_app_serverrequest_change', args=[server_request.pk])
+        with mock.patch('requests_app.admin.apply_quota', side_effect=QuotaExceeded('4 CPU cores requested, 0 of 10 free')):
+            response = self.client.post(url, self.change_form_data(server_request, admin_notes='Approving.'), follow=True)
+        self.assertRedirects(response, url)
+        self.assertEqual([str(message) for message in response.context['messages']], ['The request was not saved: 4 CPU cores requested, 0 of 10 free'])
+        server_request.refresh_from_db()
+        self.assertEqual((server_request.status, server_request.admin_notes), ('PENDING', ''))
+        self.assertFalse(LogEntry.objects.exists())
+        self.assertFalse(AWXLaunch.objects.exists())
+
+
+class FqdnCheckTests(TestCase):
+    """The live FQDN check answers from cache after the first lookup and forgets names once requested."""
+
+    def setUp(self):
+        cache.clear()
+        ServerRequest.objects.create(
+            fqdn='TAKEN.EXAMPLE.COM', vlan='1441', location='COS', primary_contact='owner@example.com',
+            os_type='rhel9', cpu_cores=2, memory_gb=8, patching_group='automatic',
+        )
+
+    def check(self, fqdn):
+        return self.client.get(reverse('fqdn_check'), {'fqdn': fqdn}).json()
+
+    def test_taken_name_is_reported_and_cached(self):
+        self.assertFalse(self.check('taken.example.com')['available'])
+        with self.assertNumQueries(0):
+            self.assertFalse(self.check('TAKEN.EXAMPLE.COM')['available'])
+
+    def test_available_name_is_negatively_cached_until_requested(self):
+        self.assertTrue(self.check('FREE.EXAMPLE.COM')['available'])
+        with self.assertNumQueries(0):
+            self.assertTrue(self.check('FREE.EXAMPLE.COM')['available'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('request_server_step1'), {
+                'fqdn': 'FREE.EXAMPLE.COM', 'vlan': '1441', 'location': 'COS', 'os_type': 'rhel9', 'cpu_cores': 2,
+                'memory_gb': 8, 'os_disk_gb': 100, 'patching_group': 'automatic',
+            })
+            self.client.post(reverse('request_server_step2'), {'primary_contact': 'owner@example.com', 'terms_accepted': 'on'})
+        self.assertTrue(ServerRequest.objects.filter(fqdn='FREE.EXAMPLE.COM').exists())
+        self.assertFalse(self.check('FREE.EXAMPLE.COM')['available'])
+
+    @override_settings(FQDN_CHECK_DNS=True)
+    def test_dns_resolution_marks_name_taken(self):
+        with mock.patch('requests_app.fqdn_check.socket.getaddrinfo', return_value=[()]):
+            result = self.check('EXISTING-HOST.EXAMPLE.COM')
+        self.assertFalse(result['available'])
+        self.assertIn('DNS', result['reason'])
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class AddressPoolTests(TestCase):
+    """VLAN address pools hand out each address once, and get them back on deny/failure."""
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('ipam-admin', 'admin@example.com', 'ipam-password')
+        self.subnet = VlanSubnet(vlan='1441', network='10.14.41.0/29', reserved_addresses='10.14.41.1')
+        build_bitmap(self.subnet)
+
+    def test_small_pool_allocates_each_address_once(self):
+        self.assertEqual(self.subnet.free_count, 5) # 8 minus network, broadcast and gateway
+        addresses = allocate_addresses('1441', 5)
+        self.assertEqual(addresses, [f"10.14.41.{i}" for i in range(2, 7)])
+        with self.assertRaises(AddressPoolExhausted):
+            allocate_addresses('1441')
+        release_addresses('1441', ['10.14.41.4'])
+        self.assertEqual(allocate_addresses('1441'), ['10.14.41.4'])
+
+    def test_slash_16_pool_fills_completely_without_duplicates(self):
+        subnet = VlanSubnet(vlan='1443', network='10.20.0.0/16')
+        build_bitmap(subnet)
+        addresses = []
+        for _ in range(64):
+            addresses += allocate_addresses('1443', 1023)
+        addresses += allocate_addresses('1443', subnet.free_count - len(addresses))
+        self.assertEqual(len(addresses), 65534)
+        self.assertEqual(len(set(addresses)), 65534)
+        self.assertEqual(VlanSubnet.objects.get(vlan='1443').free_count, 0)
+
+    def test_unconfigured_vlan_allocates_nothing(self):
+        self.assertEqual(allocate_addresses('1443'), [])
+
+    def test_approval_assigns_and_denial_releases(self):
+        requests = ServerRequest.objects.bulk_create([
+            ServerRequest(
+                fqdn=f"IPAM{i}.EXAMPLE.COM", vlan='1441', location='COS', primary_contact='owner@example.com',
+                os_type='rhel9', cpu_cores=2, memory_gb=8, patching_group='automatic',
+            )
+            for i in range(6)
+        ])
+        self.client.force_login(self.admin_user)
+        changelist = reverse('admin:requests_app_serverrequest_changelist')
+        self.client.post(changelist, {'action': 'approve_selected', '_selected_action': [r.pk for r in requests]})
+        approved = ServerRequest.objects.filter(status='APPROVED')
+        self.assertEqual(approved.count(), 5) # The sixth finds the pool empty and stays PENDING
+        self.assertEqual(len(set(approved.values_list('ip_address', flat=True))), 5)
+
+        denied = approved.first()
+        self.client.post(changelist, {'action': 'deny_selected', '_selected_action': [denied.pk]})
+        denied.refresh_from_db()
+        self.assertIsNone(denied.ip_address)
+        self.assertEqual(VlanSubnet.objects.get(vlan='1441').free_count, 1)
+
+
+class RequestWizardStateTests(TestCase):
+    """Step 1 data travels in a signed cookie, so a submission never touches the session table."""
+    STEP1 = {
+        'fqdn': 'WIZARD.EXAMPLE.COM', 'vlan': '1441', 'location': 'COS', 'os_type': 'rhel9', 'cpu_cores': 2,
+        'memory_gb': 8, 'os_disk_gb': 100, 'patching_group': 'automatic',
+    }
+
+    def test_submission_does_no_session_io(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('request_server_step1'), self.STEP1)
+            self.assertEqual(self.client.get(reverse('request_server_step2')).status_code, 200)
+            response = self.client.post(reverse('request_server_step2'), {'primary_contact': 'owner@example.com', 'terms_accepted': 'on'})
+        self.assertRedirects(response, reverse('request_success'))
+        self.assertTrue(ServerRequest.objects.filter(fqdn='WIZARD.EXAMPLE.COM').exists())
+        self.assertFalse([q['sql'] for q in queries.captured_queries if 'django_session' in q['sql']])
+        self.assertEqual(response.cookies['asap_step1'].value, '') # Cleared once submitted
+
+    def test_tampered_cookie_is_rejected(self):
+        self.client.post(reverse('request_server_step1'), self.STEP1)
+        self.client.cookies['asap_step1'] = self.client.cookies['asap_step1'].value.replace('W', 'X', 1) + 'x'
+        self.assertRedirects(self.client.get(reverse('request_server_step2')), reverse('request_server_step1'))
+
+    def test_purge_expired_sessions(self):
+        for expiry in (-60, -60, 3600):
+            session = SessionStore()
+            session.set_expiry(expiry)
+            session.save()
+        call_command('purge_expired_sessions', batch_size=1, stdout=io.StringIO())
+        self.assertEqual(Session.objects.count(), 1)
+
+
+@override_settings(STORAGES=TEST_STORAGES, AWX_URL='https://awx.example.com', AWX_TOKEN='token', AWX_JOB_TEMPLATE_ID='7', AWX_WEBHOOK_SECRET='hook-secret')
+class AsyncEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_superuser('async-admin', 'admin@example.com', 'password')
+        cls.server_request = ServerRequest.objects.create(
+            fqdn='ASYNC01.EXAMPLE.COM', vlan='1441', location='COS', primary_contact='owner@example.com',
+            os_type='rhel9', cpu_cores=2, memory_gb=8, patching_group='automatic',
+        )
+
+    def setUp(self):
+        cache.clear() # AWX circuit breaker state
+
+    def test_status_json_conditional_get(self):
+        url = reverse('request_status_json', args=[self.server_request.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['status'], 'PENDING')
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(reverse('request_status_json', args=[0])).status_code, 404)
+
+    def test_webhook_applies_status(self):
+        ServerRequest.objects.filter(pk=self.server_request.pk).update(status='PROVISIONING', awx_job_id=55)
+        response = self.client.post(
+            reverse('awx_webhook'), json.dumps({'id': 55, 'status': 'successful'}),
+            content_type='application/json', HTTP_X_ASAP_WEBHOOK_TOKEN='hook-secret',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ServerRequest.objects.get(pk=self.server_request.pk).status, 'COMPLETED')
+        self.assertEqual(self.client.get(reverse('awx_webhook')).status_code, 405)
+
+    def test_approve_launches_job(self):
+        self.client.force_login(self.staff)
+        with mock.patch('requests_app.awx_queue.atrigger_awx_job', new=mock.AsyncMock(return_value=321)):
+            response = self.client.post(reverse('request_approve', args=[self.server_request.pk]))
+        self.assertEqual(response.json()['status'], 'PROVISIONING')
+        self.assertEqual(response.json()['awx_job_id'], 321)
+        self.assertEqual(AWXLaunch.objects.get(server_request=self.server_request).state, 'SUCCEEDED')
+        self.assertEqual(self.client.post(reverse('request_approve', args=[self.server_request.pk])).status_code, 409)
+
+    def test_approve_leaves_failed_launch_queued(self):
+        self.client.force_login(self.staff)
+        with mock.patch('requests_app.awx_queue.atrigger_awx_job', new=mock.AsyncMock(return_value=None)):
+            response = self.client.post(reverse('request_approve', args=[self.server_request.pk]))
+        self.assertEqual(response.json()['status'], 'APPROVED')
+        self.assertTrue(response.json()['launch_queued'])
+        self.assertEqual(AWXLaunch.objects.get(server_request=self.server_request).state, 'QUEUED')
+
+    def test_approve_requires_staff(self):
+        self.client.force_login(User.objects.create_user('someone', password='password'))
+        response = self.client.post(reverse('request_approve', args=[self.server_request.pk]))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(ServerRequest.objects.get(pk=self.server_request.pk).status, 'PENDING')
+
+    def test_async_client_posts_launch(self):
+        def handler(request):
+            self.assertEqual(request.url.path, '/api/v2/job_templates/7/launch/')
+            self.assertEqual(json.loads(json.loads(request.content)['extra_vars'])['target_fqdn'], 'ASYNC01.EXAMPLE.COM')
+            return httpx.Response(201, json={'job': 99})
+
+        async def launch():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                return await atrigger_awx_job(self.server_request, client=client)
+        self.assertEqual(async_to_sync(launch)(), 99)
+
+
+@override_settings(
+    STORAGES=TEST_STORAGES, AWX_URL='https://awx.example.com', AWX_TOKEN='token', AWX_JOB_TEMPLATE_ID='7',
+    AWX_CIRCUIT_FAILURE_THRESHOLD=2, AWX_CONNECT_TIMEOUT_SECONDS=2, AWX_READ_TIMEOUT_SECONDS=20,
+)
+class AWXCircuitBreakerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.server_request = ServerRequest.objects.create(
+            fqdn='CIRCUIT01.EXAMPLE.COM', vlan='1441', location='COS', primary_contact='owner@example.com',
+            os_type='rhel9', cpu_cores=2, memory_gb=8, patching_group='automatic', status='APPROVED',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_opens_after_failures_and_fails_fast(self):
+        with mock.patch('requests_app.awx_utils.requests.post', side_effect=requests.exceptions.ConnectTimeout) as post:
+            self.assertIsNone(trigger_awx_job(self.server_request))
+            self.assertIsNone(trigger_awx_job(self.server_request))
+            self.assertEqual(awx_circuit.circuit_state(), 'open')
+            with self.assertRaises(AWXCircuitOpen):
+                trigger_awx_job(self.server_request)
+        self.assertEqual(post.call_count, 2)
+        self.assertEqual(post.call_args.kwargs['timeout'], (2, 20))
+
+    def test_half_open_allows_one_probe(self):
+        for _ in range(2):
+            awx_circuit.record_failure('test')
+        cache.set(awx_circuit.OPEN_UNTIL_KEY, 0, None) # Reset period over
+        self.assertEqual(awx_circuit.circuit_state(), 'half-open')
+        self.assertTrue(awx_circuit.acquire())
+        self.assertFalse(awx_circuit.acquire())
+        awx_circuit.record_failure('probe failed')
+        self.assertEqual(awx_circuit.circuit_state(), 'open')
+
+        cache.set(awx_circuit.OPEN_UNTIL_KEY, 0, None)
+        self.assertTrue(awx_circuit.acquire())
+        awx_circuit.record_success(0.1)
+        self.assertEqual(awx_circuit.circuit_state(), 'closed')
+
+    @override_settings(AWX_CIRCUIT_SLOW_CALL_SECONDS=5)
+    def test_slow_calls_count_as_failures(self):
+        awx_circuit.record_success(6)
+        awx_circuit.record_response(200, 7)
+        self.assertEqual(awx_circuit.circuit_state(), 'open')
+
+    def test_queue_leaves_launches_alone_while_open(self):
+        launch = AWXLaunch.objects.create(server_request=self.server_request)
+        for _ in range(2):
+            awx_circuit.record_failure('test')
+        with mock.patch('requests_app.awx_queue.trigger_awx_job') as trigger:
+            self.assertEqual(process_awx_queue(), {'succeeded': 0, 'retried': 0, 'failed': 0, 'deferred': 0})
+        trigger.assert_not_called()
+        launch.refresh_from_db()
+        self.assertEqual((launch.state, launch.attempts), ('QUEUED', 0))
+
+    def test_queue_defers_launch_when_circuit_opens_mid_batch(self):
+        launch = AWXLaunch.objects.create(server_request=self.server_request)
+        with mock.patch('requests_app.awx_queue.trigger_awx_job', side_effect=AWXCircuitOpen):
+            self.assertEqual(process_awx_queue()['deferred'], 1)
+        launch.refresh_from_db()
+        self.assertEqual((launch.state, launch.attempts), ('QUEUED', 0))
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        ServerRequest.objects.create(
+            fqdn='METRICS01.EXAMPLE.COM', vlan='1441', location='COS', primary_contact='owner@example.com',
+            os_type='rhel9', cpu_cores=2, memory_gb=8, patching_group='automatic',
+        )
+        rebuild_capacity_summary()
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('terms_conditions'))
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('asap_server_requests{status="PENDING"} 1.0', body)
+        self.assertIn('asap_http_request_duration_seconds_bucket{le="0.005",method="GET",status="200",view="terms_conditions"}', body)
+
+    def test_records_query_count_per_view(self):
+        url = reverse('request_status_json', args=[ServerRequest.objects.get().pk])
+        before = self.sample('asap_http_request_db_queries_sum', view='request_status_json')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(self.sample('asap_http_request_db_queries_sum', view='request_status_json') - before, len(queries))
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret', REMOTE_ADDR='203.0.113.5').status_code, 200)
+
+    def test_metrics_without_token_only_for_allowed_networks(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.5').status_code, 403)
+        with self.settings(METRICS_ALLOWED_NETWORKS=['10.0.0.0/8']):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code, 200)
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    @override_settings(AWX_URL='https://awx.example.com', AWX_TOKEN='token', AWX_JOB_TEMPLATE_ID='7')
+    def test_records_awx_call_outcome(self):
+        cache.clear()
+        before = self.sample('asap_awx_call_duration_seconds_count', operation='launch', outcome='failure')
+        with mock.patch('requests_app.awx_utils.requests.post', side_effect=requests.exceptions.ConnectionError):
+            trigger_awx_job(ServerRequest.objects.get())
+        self.assertEqual(self.sample('asap_awx_call_duration_seconds_count', operation='launch', outcome='failure') - before, 1)
+
+
+@override_settings(STORAGES=TEST_STORAGES, PROFILING_HEADER_TOKEN='profile-me', SLOW_REQUEST_THRESHOLD_MS=0)
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.server_request = ServerRequest.objects.create(
+            fqdn='PROFILE01.EXAMPLE.COM', vlan='1441', location='COS', primary_contact='owner@example.com',
+            os_type='rhel9', cpu_cores=2, memory_gb=8, patching_group='automatic',
+        )
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=60000)
+    def test_only_profiles_requests_with_token(self):
+        url = reverse('request_status', args=[self.server_request.pk])
+        self.assertNotIn('Server-Timing', self.client.get(url))
+        self.assertNotIn('Server-Timing', self.client.get(url, HTTP_X_ASAP_PROFILE='wrong'))
+        self.assertIn('template;dur=', self.client.get(url, HTTP_X_ASAP_PROFILE='profile-me')['Server-Timing'])
+
+    def test_slow_request_log(self):
+        with self.assertLogs('requests_app.slow_requests', 'WARNING') as logs:
+            self.client.get(reverse('request_status', args=[self.server_request.pk]), HTTP_X_ASAP_PROFILE='profile-me')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'request_status')
+        self.assertEqual(record['sql_count'], 3)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertIsNone(record['profile'])
+
+    def test_cprofile_dump(self):
+        with tempfile.TemporaryDirectory() as dump_dir, override_settings(PROFILING_DUMP_DIR=dump_dir):
+            with self.assertLogs('requests_app.slow_requests', 'WARNING') as logs:
+                self.client.get(reverse('terms_conditions'), HTTP_X_ASAP_PROFILE='profile-me')
+            record = json.loads(logs.records[0].getMessage())
+            self.assertTrue(os.path.exists(record['profile']))
+
+    @override_settings(PROFILING_HEADER_TOKEN='', PROFILING_SAMPLE_RATE=0)
+    def test_not_loaded_when_unconfigured(self):
+        response = self.client.get(reverse('terms_conditions'), HTTP_X_ASAP_PROFILE='profile-me')
+        self.assertNotIn('Server-Timing', response)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class CacheLayerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_terms_page_is_served_from_the_page_cache(self):
+        first = self.client.get(reverse('terms_conditions'))
+        second = self.client.get(reverse('terms_conditions'))
+        self.assertEqual(second.status_code, 200)
+        self.assertTrue(first.templates)
+        self.assertFalse(second.templates) # Not rendered again
+        self.assertEqual(first.content, second.content)
+        self.assertNotIn('Cookie', first.get('Vary', '')) # Cached once for everyone, not per session
+
+    def test_terms_page_leaves_flash_messages_for_the_next_page(self):
+        session = self.client.session
+        session.save()
+        self.client.cookies['sessionid'] = session.session_key
+        with self.settings(MESSAGE_STORAGE='django.contrib.messages.storage.session.SessionStorage'):
+            session['_messages'] = '[["__json_message",0,20,"Your server request has been submitted"]]'
+            session.save()
+            self.assertNotContains(self.client.get(reverse('terms_conditions')), 'has been submitted')
+            self.assertIn('_messages', self.client.session)
+
+    def test_step1_select_markup_is_fragment_cached_until_cleared(self):
+        self.client.get(reverse('request_server_step1'))
+        key = make_template_fragment_key('step1_select', ['vlan', None, 0])
+        self.assertIn('<select name="vlan"', cache.get(key))
+
+        stderr = io.StringIO()
+        call_command('clear_cache', stdout=io.StringIO(), stderr=stderr)
+        self.assertIsNone(cache.get(key))
+        self.assertIn('this process only', stderr.getvalue())
+
+    def test_step1_fragment_key_ignores_values_that_are_not_choices(self):
+        self.client.post(reverse('request_server_step1'), {'vlan': 'not-a-vlan'})
+        keys = set(cache._cache) # LocMemCache's own store
+        self.assertIn(cache.make_key(make_template_fragment_key('step1_select', ['vlan', None, 1])), keys) # Invalid: one error
+        for value in ('other-1', 'other-2', 'x' * 500):
+            self.client.post(reverse('request_server_step1'), {'vlan': value})
+        self.assertEqual(set(cache._cache), keys)
+
+    def test_step1_fragment_keeps_submitted_choice_and_errors(self):
+        response = self.client.post(reverse('request_server_step1'), {'vlan': '1443'})
+        self.assertContains(response, '<option value="1443" selected>')
+        self.assertContains(response, 'name="location" id="id_location" class="form-select is-invalid"')
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('search-admin', 'admin@example.com', 'search-password')
+        self.client.force_login(self.admin_user)
+        self.web = ServerRequest.objects.create(
+            fqdn='WEB01.EXAMPLE.COM', vlan='1441', location='COS', primary_contact='alice@example.com',
+            os_type='rhel9', cpu_cores=2, memory_gb=8, os_disk_gb=100, patching_group='automatic', ticket_number='CHG0042',
+        )
+        self.db = ServerRequest.objects.create(
+            fqdn='DB01.EXAMPLE.COM', vlan='1443', location='DFW', primary_contact='bob@example.com',
+            os_type='rhel9', cpu_cores=2, memory_gb=8, os_disk_gb=100, patching_group='automatic',
+        )
+        AuditLog.objects.bulk_create([
+            AuditLog(action='Request Approved', message='Approved via bulk action.', related_request=self.web, user=self.admin_user),
+            AuditLog(action='AWX Launch Failed', message='Job template 7 returned HTTP 500.', related_request=self.db),
+        ])
+
+    def search(self, model_name, term):
+        response = self.client.get(reverse(f'admin:requests_app_{model_name}_changelist'), {'q': term})
+        return list(response.context['cl'].result_list)
+
+    def test_search_uses_fts_index(self):
+        plan = ServerRequest.objects.filter(text_matches(ServerRequest, 'WEB01')).explain()
+        self.assertIn('requests_app_serverrequest_fts', plan)
+
+    def test_serverrequest_search_matches_substrings_case_insensitively(self):
+        self.assertEqual(self.search('serverrequest', 'eb01.exa'), [self.web])
+        self.assertEqual(self.search('serverrequest', 'chg0042'), [self.web])
+        self.assertEqual(self.search('serverrequest', 'example.com bob'), [self.db]) # Every term must match
+        self.assertEqual(self.search('serverrequest', '"DB01.EXAMPLE'), []) # Stray quote is literal
+        self.assertEqual(self.search('serverrequest', 'DB'), [self.db]) # Too short for trigrams: icontains
+
+    def test_index_follows_saves_updates_and_deletes(self):
+        self.web.admin_notes = 'Moved to rack 12'
+        self.web.save()
+        self.assertEqual(self.search('serverrequest', '"rack 12"'), [self.web])
+        ServerRequest.objects.filter(pk=self.db.pk).update(fqdn='DB02.EXAMPLE.COM')
+        self.assertEqual(self.search('serverrequest', 'DB01'), [])
+        self.assertEqual(self.search('serverrequest', 'DB02'), [self.db])
+        self.db.delete()
+        self.assertEqual(self.search('serverrequest', 'DB02'), [])
+
+    def test_auditlog_search_covers_message_fqdn_and_username(self):
+        self.assertEqual([log.action for log in self.search('auditlog', 'http 500')], ['AWX Launch Failed'])
+        self.assertEqual([log.action for log in self.search('auditlog', 'web01')], ['Request Approved'])
+        self.assertEqual([log.action for log in self.search('auditlog', 'search-admin')], ['Request Approved'])
+
+    def test_rebuild_command_restores_a_stale_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER requests_app_serverrequest_fts_insert")
+        fresh = ServerRequest.objects.create(
+            fqdn='APP01.EXAMPLE.COM', vlan='1441', location='COS', primary_contact='carol@example.com',
+            os_type='rhel9', cpu_cores=2, memory_gb=8, os_disk_gb=100, patching_group='automatic',
+        )
+        self.assertEqual(self.search('serverrequest', 'APP01'), [])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.search('serverrequest', 'APP01'), [fresh])
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class SQLiteConnectionTests(TestCase):
+    def test_pragmas_applied_on_connect(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("SQLite only")
+        with connection.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone()[0], 1) # NORMAL
+            self.assertEqual(cursor.execute('PRAGMA busy_timeout').fetchone()[0], 20000)
+
+    def test_lock_for_write_takes_write_lock(self):
+        with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+            lock_for_write()
+        self.assertEqual(len(queries), 1 if connection.vendor == 'sqlite' else 0)
+
+
+@override_settings(STORAGES=TEST_STORAGES, AWX_URL='https://awx.example.com', AWX_TOKEN='token', AWX_JOB_TEMPLATE_ID='7')
+class AWXReconcileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.requests = ServerRequest.objects.bulk_create([
+            ServerRequest(
+                fqdn=f"RECON{i}.EXAMPLE.COM", vlan='1441', location='COS', primary_contact='owner@example.com',
+                os_type='rhel9', cpu_cores=2, memory_gb=8, patching_group='automatic', status='PROVISIONING', awx_job_id=11 + i,
+            )
+            for i in range(3)
+        ])
+        rebuild_capacity_summary()
+        recount_quota_usage()
+
+    def test_records_finished_jobs(self):
+        statuses = {11: 'successful', 12: 'failed', 13: 'running'}
+        with mock.patch('requests_app.awx_reconcile.fetch_awx_job_statuses', return_value=statuses) as fetch:
+            self.assertEqual(reconcile_awx_jobs(batch_size=2), {'checked': 3, 'completed': 1, 'failed': 1})
+        self.assertEqual([call.args[0] for call in fetch.call_args_list], [[11, 12], [13]])
+        self.assertEqual(
+            list(ServerRequest.objects.order_by('awx_job_id').values_list('status', flat=True)),
+            ['COMPLETED', 'FAILED', 'PROVISIONING'],
+        )
+        self.assertEqual(AuditLog.objects.filter(related_awx_job_id=12, level='ERROR').count(), 1)
+        summary = sorted(CapacitySummary.objects.exclude(request_count=0).values_list('status', 'request_count'))
+        rebuild_capacity_summary()
+        self.assertEqual(summary, sorted(CapacitySummary.objects.exclude(request_count=0).values_list('status', 'request_count')))
+
+    def test_leaves_requests_changed_meanwhile(self):
+        def fetch(job_ids, session=None):
+            ServerRequest.objects.filter(awx_job_id=11).update(status='DENIED') # Denied while AWX was being asked
+            return {11: 'successful', 12: 'successful'}
+        with mock.patch('requests_app.awx_reconcile.fetch_awx_job_statuses', side_effect=fetch):
+            self.assertEqual(reconcile_awx_jobs()['completed'], 1)
+        self.assertEqual(ServerRequest.objects.get(awx_job_id=11).status, 'DENIED')
+        self.assertFalse(AuditLog.objects.filter(related_awx_job_id=11).exists())
+
+    def test_fetch_statuses_follows_pages(self):
+        pages = [
+            {'results': [{'id': 11, 'status': 'successful'}], 'next': '/api/v2/jobs/?id__in=11%2C12&page=2'},
+            {'results': [{'id': 12, 'status': 'running'}], 'next': None},
+        ]
+        session = mock.Mock()
+        session.get.side_effect = [mock.Mock(status_code=200, json=mock.Mock(return_value=page)) for page in pages]
+        self.assertEqual(fetch_awx_job_statuses([12, 11, 12], session=session), {11: 'successful', 12: 'running'})
+        first, second = session.get.call_args_list
+        self.assertEqual(first.kwargs['params'], {'id__in': '11,12', 'page_size': 2})
+        self.assertEqual(second.args[0], 'https://awx.example.com/api/v2/jobs/?id__in=11%2C12&page=2')
+        self.assertIsNone(second.kwargs['params'])
+
+
+@override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=3, EMAIL_OUTBOX_RETRY_BASE_SECONDS=60, EMAIL_OUTBOX_RETRY_MAX_SECONDS=90)
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.queued = queue_email('Request submitted', 'Body', ['owner@example.com', ' ', 'it@example.com'], html_content='<p>Body</p>')
+
+    def failing_connection(self):
+        connection = mock.Mock()
+        connection.send_messages.side_effect = smtplib.SMTPServerDisconnected('relay went away')
+        return mock.patch('requests_app.email_outbox.get_connection', return_value=connection)
+
+    def test_sends_due_email_once(self):
+        self.assertEqual(send_queued_emails(), {'sent': 1, 'retried': 0, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['owner@example.com', 'it@example.com'])
+        self.assertEqual(mail.outbox[0].alternatives, [('<p>Body</p>', 'text/html')])
+        self.assertEqual(send_queued_emails(), {'sent': 0, 'retried': 0, 'failed': 0})
+        self.queued.refresh_from_db()
+        self.assertEqual((self.queued.state, self.queued.attempts), ('SENT', 1))
+
+    def test_retries_with_backoff_then_gives_up(self):
+        delays = []
+        with self.failing_connection():
+            for _ in range(3):
+                before = timezone.now()
+                results = send_queued_emails()
+                self.queued.refresh_from_db()
+                if self.queued.state == 'QUEUED':
+                    delays.append(round((self.queued.next_attempt_at - before).total_seconds()))
+                    QueuedEmail.objects.filter(pk=self.queued.pk).update(next_attempt_at=timezone.now()) # Due again
+        self.assertEqual(delays, [60, 90]) # 60s, then 120s capped at the 90s maximum
+        self.assertEqual(results, {'sent': 0, 'retried': 0, 'failed': 1})
+        self.assertEqual((self.queued.state, self.queued.attempts), ('FAILED', 3))
+        self.assertIn('relay went away', self.queued.last_error)
+
+    def test_waits_until_next_attempt(self):
+        QueuedEmail.objects.filter(pk=self.queued.pk).update(next_attempt_at=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(send_queued_emails()['sent'], 0)
+
+    def test_claimed_email_is_not_claimed_again(self):
+        first = _claim_due_emails(10)
+        self.assertEqual([email.pk for email in first], [self.queued.pk])
+        self.assertEqual(_claim_due_emails(10), []) # A second worker finds nothing to send
+        self.assertEqual(send_queued_emails()['sent'], 0)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_claim_loses_race_to_other_worker(self):
+        real_filter = QueuedEmail.objects.filter
+
+        def filter_then_race(*args, **kwargs):
+            queryset = real_filter(*args, **kwargs)
+            if 'pk' in kwargs: # The conditional claim UPDATE: another worker got there between SELECT and UPDATE
+                real_filter(pk=kwargs['pk']).update(state='SENDING', claimed_at=timezone.now())
+            return queryset
+        with mock.patch.object(QueuedEmail.objects, 'filter', side_effect=filter_then_race):
+            self.assertEqual(_claim_due_emails(10), [])
+
+    @override_settings(EMAIL_OUTBOX_CLAIM_TIMEOUT_SECONDS=300)
+    def test_stale_claim_is_picked_up(self):
+        QueuedEmail.objects.filter(pk=self.queued.pk).update(state='SENDING', claimed_at=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(send_queued_emails()['sent'], 1)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class AWXLaunchQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin_user = User.objects.create_superuser('queue-admin', 'admin@example.com', 'queue-password')
+        LocationQuota.objects.create(location='COS', cpu_cores_limit=10)
+        self.server_request = ServerRequest.objects.create(
+            fqdn='RACE01.EXAMPLE.COM', vlan='1441', location='COS', primary_contact='owner@example.com',
+            os_type='rhel9', cpu_cores=4, memory_gb=8, patching_group='automatic',
+        )
+        rebuild_capacity_summary()
+        approve_requests(self.admin_user, ServerRequest.objects.filter(pk=self.server_request.pk))
+
+    def test_deny_during_launch_orphans_job(self):
+        def denied_meanwhile(launch, job_id):
+            # Denied after the worker claimed the launch, while AWX was starting the job
+            deny_requests(self.admin_user, ServerRequest.objects.filter(pk=launch.server_request_id))
+            return _record_success(launch, job_id)
+        with mock.patch('requests_app.awx_queue.trigger_awx_job', return_value=555), \
+                mock.patch('requests_app.awx_queue._record_success', side_effect=denied_meanwhile):
+            self.assertEqual(process_awx_queue(), {'succeeded': 0, 'retried': 0, 'failed': 1, 'deferred': 0})
+
+        self.server_request.refresh_from_db()
+        self.assertEqual((self.server_request.status, self.server_request.awx_job_id), ('DENIED', None))
+        self.assertEqual(AWXLaunch.objects.get().awx_job_id, 555)
+        orphan = AuditLog.objects.get(action='AWX Job Orphaned')
+        self.assertEqual((orphan.level, orphan.related_awx_job_id), ('ERROR', 555))
+        self.assertEqual(LocationQuota.objects.get().cpu_cores_used, 0)
+        summary = sorted(CapacitySummary.objects.exclude(request_count=0).values_list('status', 'request_count'))
+        rebuild_capacity_summary()
+        self.assertEqual(summary, sorted(CapacitySummary.objects.exclude(request_count=0).values_list('status', 'request_count')))
+
+    def test_launch_moves_approved_request_to_provisioning(self):
+        with mock.patch('requests_app.awx_queue.trigger_awx_job', return_value=556):
+            self.assertEqual(process_awx_queue()['succeeded'], 1)
+        self.server_request.refresh_from_db()
+        self.assertEqual((self.server_request.status, self.server_request.awx_job_id), ('PROVISIONING', 556))
+        self.assertEqual(LocationQuota.objects.get().cpu_cores_used, 4)
+
+
+@override_settings(STORAGES=TEST_STORAGES, IT_EMAIL_DISTRO_LIST='it@example.com')
+class BulkImportTests(TestCase):
+    HEADER = 'fqdn,vlan,location,os_type,cpu_cores,memory_gb,os_disk_gb,patching_group,primary_contact,backup_required\n'
+
+    def upload(self, body, name='servers.csv'):
+        return self.client.post(reverse('request_bulk_import'), {
+            'import_file': SimpleUploadedFile(name, body.encode(), content_type='text/csv'), 'terms_accepted': 'on',
+        })
+
+    def test_valid_csv_creates_requests_and_one_email_per_audience(self):
+        response = self.upload(
+            self.HEADER
+            + 'bulk01.example.com,1441,COS,rhel9,2,8,100,automatic,alice@example.com,yes\n'
+            + 'bulk02.example.com,1443,DFW,rhel9,4,16,100,manual,ALICE@example.com,no\n'
+        )
+        self.assertRedirects(response, reverse('request_success'), fetch_redirect_response=False)
+        self.assertEqual(
+            list(ServerRequest.objects.order_by('fqdn').values_list('fqdn', 'backup_required', 'status')),
+            [('BULK01.EXAMPLE.COM', True, 'PENDING'), ('BULK02.EXAMPLE.COM', False, 'PENDING')],
+        )
+        self.assertEqual(QueuedEmail.objects.count(), 2)
+        self.assertEqual(CapacitySummary.objects.get(location='DFW').cpu_cores, 4)
+
+    def test_row_errors_reject_whole_file(self):
+        response = self.upload(
+            self.HEADER
+            + 'bulk01.example.com,1441,COS,rhel9,2,8,100,automatic,alice@example.com,\n'
+            + 'bulk02.example.com,9999,COS,rhel9,3,8,100,automatic,not-an-email,\n'
+        )
+        self.assertEqual(response.status_code, 200)
+        row_errors = dict(response.context['row_errors'])
+        self.assertEqual(list(row_errors), [2])
+        self.assertTrue(any(error.startswith('vlan:') for error in row_errors[2]))
+        self.assertTrue(any(error.startswith('cpu_cores:') for error in row_errors[2]))
+        self.assertFalse(ServerRequest.objects.exists())
+
+    def test_duplicate_fqdns_in_file_and_database(self):
+        ServerRequest.objects.create(
+            fqdn='TAKEN.EXAMPLE.COM', vlan='1441', location='COS', primary_contact='owner@example.com',
+            os_type='rhel9', cpu_cores=2, memory_gb=8, patching_group='automatic',
+        )
+        response = self.upload(
+            self.HEADER
+            + 'dup.example.com,1441,COS,rhel9,2,8,100,automatic,alice@example.com,\n'
+            + 'DUP.example.com,1441,COS,rhel9,2,8,100,automatic,alice@example.com,\n'
+            + 'taken.example.com,1441,COS,rhel9,2,8,100,automatic,alice@example.com,\n'
+        )
+        row_errors = dict(response.context['row_errors'])
+        self.assertEqual(row_errors[2], ['fqdn: DUP.EXAMPLE.COM is already used by row 1.'])
+        self.assertEqual(row_errors[3], ['fqdn: A request for TAKEN.EXAMPLE.COM already exists.'])
+        self.assertEqual(ServerRequest.objects.count(), 1)
+
+    @override_settings(FQDN_CHECK_DNS=True)
+    def test_dns_is_checked_once_per_upload(self):
+        ServerRequest.objects.create(
+            fqdn='TAKEN.EXAMPLE.COM', vlan='1441', location='COS', primary_contact='owner@example.com',
+            os_type='rhel9', cpu_cores=2, memory_gb=8, patching_group='automatic',
+        )
+        with mock.patch('requests_app.fqdn_check._resolves', side_effect=lambda fqdn: fqdn == 'LIVE.EXAMPLE.COM') as resolves, \
+                mock.patch('requests_app.forms.check_fqdn_availability') as per_row_check:
+            response = self.upload(
+                self.HEADER
+                + 'new.example.com,1441,COS,rhel9,2,8,100,automatic,alice@example.com,\n'
+                + 'live.example.com,1441,COS,rhel9,2,8,100,automatic,alice@example.com,\n'
+                + 'taken.example.com,1441,COS,rhel9,2,8,100,automatic,alice@example.com,\n'
+            )
+        per_row_check.assert_not_called()
+        self.assertEqual(sorted(call.args[0] for call in resolves.call_args_list), ['LIVE.EXAMPLE.COM', 'NEW.EXAMPLE.COM'])
+        self.assertEqual(response.context['row_errors'], [
+            (2, ['fqdn: LIVE.EXAMPLE.COM already resolves in DNS.']),
+            (3, ['fqdn: A request for TAKEN.EXAMPLE.COM already exists.']),
+        ])
+
+    def test_quota_rejection(self):
+        LocationQuota.objects.create(location='DFW', cpu_cores_limit=4)
+        response = self.upload(self.HEADER + 'big.example.com,1441,DFW,rhel9,8,8,100,automatic,alice@example.com,\n')
+        [(row_number, errors)] = response.context['row_errors']
+        self.assertEqual(row_number, 1)
+        self.assertIn('cannot be accommodated at DFW', errors[0])
+        self.assertFalse(ServerRequest.objects.exists())
+
+    def test_json_upload_and_unreadable_file(self):
+        rows = [{'fqdn': 'json01.example.com', 'vlan': '1441', 'location': 'COS', 'os_type': 'rhel9', 'cpu_cores': 2,
+                 'memory_gb': 8, 'os_disk_gb': 100, 'patching_group': 'automatic', 'primary_contact': 'alice@example.com'}]
+        self.assertEqual(self.upload(json.dumps(rows), name='servers.json').status_code, 302)
+        response = self.upload('{"not": "a list"}', name='servers.json')
+        self.assertIn('JSON file must contain a list of objects.', response.context['form'].errors['import_file'])
+
+
+@override_settings(STATUS_STREAM_MAX_SECONDS=0.2, STATUS_STREAM_KEEPALIVE_SECONDS=0.05, STATUS_STREAM_POLL_SECONDS=60)
+class StatusStreamTests(TestCase):
+    def collect(self, server_request):
+        async def frames():
+            return [frame async for frame in status_event_stream(server_request, [])]
+        return async_to_sync(frames)()
+
+    def test_stream_ends_after_max_lifetime(self):
+        server_request = ServerRequest.objects.create(
+            fqdn='STREAM01.EXAMPLE.COM', vlan='1441', location='COS', primary_contact='owner@example.com',
+            os_type='rhel9', cpu_cores=2, memory_gb=8, patching_group='automatic',
+        )
+        frames = self.collect(server_request)
+        self.assertTrue(frames[0].startswith('retry: '))
+        self.assertIn(': keepalive\n\n', frames)
+        self.assertFalse(any(frame.startswith('event: end') for frame in frames)) # Browser reconnects
+        self.assertEqual(dict(status_broadcaster._queues), {}) # Subscription released
+
+    def test_terminal_request_ends_at_once(self):
+        server_request = ServerRequest(pk=1, status='DENIED')
+        self.assertEqual(self.collect(server_request)[-1], 'event: end\ndata: {}\n\n')
+
+    def test_each_subscriber_gets_what_its_snapshot_lacks(self):
+        server_request = ServerRequest.objects.create(
+            fqdn='STREAM02.EXAMPLE.COM', vlan='1441', location='COS', primary_contact='owner@example.com',
+            os_type='rhel9', cpu_cores=2, memory_gb=8, patching_group='automatic', status='APPROVED',
+        )
+        log = AuditLog.objects.create(action='Request Approved', message='Approved.', related_request=server_request)
+        broadcaster = StatusBroadcaster()
+
+        async def poll():
+            current = broadcaster.subscribe(server_request.pk, ('APPROVED', None), log.id)
+            stale = broadcaster.subscribe(server_request.pk, ('PENDING', None), 0) # Page rendered before the approval
+            with mock.patch('requests_app.status_events.close_old_connections') as close_old_connections:
+                await broadcaster._poll()
+            broadcaster._task.cancel()
+            close_old_connections.assert_called_once()
+            return [current.get_nowait() for _ in range(current.qsize())], [stale.get_nowait() for _ in range(stale.qsize())]
+
+        current_events, stale_events = async_to_sync(poll)()
+        self.assertEqual(current_events, [])
+        self.assertEqual([event for event, data in stale_events], ['status', 'log'])
+        self.assertEqual(stale_events[0][1]['status'], 'APPROVED')
+
+    def test_poller_does_not_run_in_the_first_subscribers_context(self):
+        request_context = ContextVar('request_context', default=None)
+        seen = []
+        broadcaster = StatusBroadcaster()
+
+        async def run():
+            seen.append(request_context.get())
+
+        async def subscribe():
+            request_context.set('first request')
+            with mock.patch.object(broadcaster, '_run', run):
+                broadcaster.subscribe(1, ('PENDING', None), 0)
+                await broadcaster._task
+
+        async_to_sync(subscribe)()
+        self.assertEqual(seen, [None])
+
+
+@override_settings(STORAGES=TEST_STORAGES, AUDIT_LOG_RETENTION_DAYS=30)
+class AuditLogArchiveTests(TestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archive_dir.cleanup)
+        archive_settings = override_settings(AUDIT_LOG_ARCHIVE_DIR=self.archive_dir.name)
+        archive_settings.enable()
+        self.addCleanup(archive_settings.disable)
+        self.staff = User.objects.create_superuser('archive-admin', 'admin@example.com', 'password')
+        self.server_request = ServerRequest.objects.create(
+            fqdn='ARCHIVE01.EXAMPLE.COM', vlan='1441', location='COS', primary_contact='owner@example.com',
+            os_type='rhel9', cpu_cores=2, memory_gb=8, patching_group='automatic',
+        )
+        now = timezone.now()
+        for days_ago, action in ((100, 'Request Submitted'), (70, 'Request Approved'), (40, 'Provisioning Completed'), (1, 'Note Added')):
+            log = AuditLog.objects.create(action=action, message=f"{action}.", user=self.staff, related_request=self.server_request)
+            AuditLog.objects.filter(pk=log.pk).update(timestamp=now - timedelta(days=days_ago)) # auto_now_add ignores a given value
+
+    def read_back(self, response):
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_command_moves_old_entries_and_summarizes(self):
+        call_command('archive_audit_logs', batch_size=2, stdout=io.StringIO())
+        self.assertEqual(list(self.server_request.audit_logs.values_list('action', flat=True)), ['Note Added'])
+        summary = AuditLogArchiveSummary.objects.get(related_request=self.server_request)
+        self.assertEqual((summary.archived_count, summary.last_action), (3, 'Provisioning Completed'))
+        self.assertLess(summary.first_timestamp, summary.last_timestamp)
+        self.assertEqual(len(os.listdir(self.archive_dir.name)), 3) # One file per month
+
+    def test_read_back_is_oldest_first_without_staff_identity(self):
+        call_command('archive_audit_logs', batch_size=2, stdout=io.StringIO())
+        response = self.client.get(reverse('request_status_archive', args=[self.server_request.pk]))
+        records = self.read_back(response)
+        self.assertEqual([record['action'] for record in records], ['Request Submitted', 'Request Approved', 'Provisioning Completed'])
+        self.assertEqual(set(records[0]), {'id', 'timestamp', 'level', 'action', 'message'})
+        self.assertNotIn(b'archive-admin', b''.join(self.client.get(reverse('request_status_archive', args=[self.server_request.pk])).streaming_content))
+
+    def test_read_back_drops_entries_archived_twice(self):
+        rows = list(AuditLog.objects.filter(action='Request Submitted').values(*ARCHIVE_FIELDS))
+        _append_to_archive(f"{rows[0]['timestamp']:%Y-%m}", rows) # An earlier run died after writing, before deleting
+        archive_audit_logs()
+        response = self.client.get(reverse('request_status_archive', args=[self.server_request.pk]))
+        self.assertEqual([record['action'] for record in self.read_back(response)].count('Request Submitted'), 1)
+
+    async def test_read_back_streams_asynchronously_under_asgi(self):
+        await sync_to_async(archive_audit_logs)()
+        response = await self.async_client.get(reverse('request_status_archive', args=[self.server_request.pk]))
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(b''.join(chunks).splitlines()), 3)
+
+
+@override_settings(STORAGES=TEST_STORAGES, EXPORT_CHUNK_SIZE=2)
+class StreamingExportTests(TestCase):
+    FIELDS = ('id', 'fqdn', 'cpu_cores', 'requested_at')
+
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('export-admin', 'admin@example.com', 'export-password')
+        for number in range(5):
+            ServerRequest.objects.create(
+                fqdn=f'EXPORT{number:02}.EXAMPLE.COM', vlan='1441', location='COS', primary_contact='owner@example.com',
+                os_type='rhel9', cpu_cores=number + 1, memory_gb=8, patching_group='automatic',
+            )
+        self.queryset = ServerRequest.objects.order_by('id')
+
+    def test_csv_has_header_and_one_row_per_request(self):
+        lines = ''.join(iter_csv(self.queryset, self.FIELDS)).splitlines()
+        self.assertEqual(lines[0], 'id,fqdn,cpu_cores,requested_at')
+        self.assertEqual([line.split(',')[1] for line in lines[1:]], [f'EXPORT{number:02}.EXAMPLE.COM' for number in range(5)])
+        self.assertEqual(lines[1].split(',')[3], self.queryset.first().requested_at.isoformat())
+
+    def test_ndjson_uses_flattened_column_names(self):
+        records = [json.loads(line) for line in iter_ndjson(self.queryset, ('fqdn', 'approved_denied_by__username'))]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0], {'fqdn': 'EXPORT00.EXAMPLE.COM', 'approved_denied_by_username': None})
+
+    def test_export_is_one_query_however_many_chunks(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(list(iter_ndjson(self.queryset, self.FIELDS))), 5)
+        self.assertEqual(len(queries), 1) # A chunked cursor, not a query per chunk
+
+    def test_admin_export_view(self):
+        self.client.force_login(self.admin_user)
+        response = self.client.get(reverse('admin:requests_app_serverrequest_export'), {'format': 'ndjson'})
+        self.assertFalse(response.is_async)
+        self.assertIn('attachment; filename="serverrequest-', response['Content-Disposition'])
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 5)
+
+    async def test_export_streams_in_chunks_under_asgi(self):
+        await sync_to_async(self.async_client.force_login)(self.admin_user)
+        response = await self.async_client.get(reverse('admin:requests_app_serverrequest_export'), {'format': 'csv'})
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 3) # Header and 5 rows, EXPORT_CHUNK_SIZE lines at a time
+        self.assertEqual(len(b''.join(chunks).splitlines()), 6)
+
+
+@override_settings(STORAGES=TEST_STORAGES, PROFILING_HEADER_TOKEN='profile-me', WHITENOISE_AUTOREFRESH=True, WHITENOISE_USE_FINDERS=True)
+class StaticFilesMiddlewareTests(TestCase):
+    @override_settings(DEBUG=True)
+    def test_asgi_middleware_chain_is_not_adapted(self):
+        # With DEBUG on, BaseHandler logs "Asynchronous handler adapted for middleware ..." for each sync-only one
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+    async def test_serves_static_files_asynchronously(self):
+        response = await self.async_client.get('/static/admin/css/base.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertIn(b'body', b''.join([block async for block in response.streaming_content]))
+
+    def test_serves_static_files_under_wsgi(self):
+        response = self.client.get('/static/admin/css/base.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.is_async)
+        self.assertEqual(int(response['Content-Length']), len(b''.join(response.streaming_content)))
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class ApprovalRaceTests(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser('race-admin', 'admin@example.com', 'race-password')
+        LocationQuota.objects.create(location='COS', cpu_cores_limit=10)
+        self.server_request = ServerRequest.objects.create(
+            fqdn='TWICE01.EXAMPLE.COM', vlan='1441', location='COS', primary_contact='owner@example.com',
+            os_type='rhel9', cpu_cores=4, memory_gb=8, patching_group='automatic',
+        )
+        rebuild_capacity_summary()
+
+    def test_row_changed_after_read_applies_nothing(self):
+        real_reserve = approvals._reserve_resources
+        def approved_meanwhile(rows, new_status):
+            result = real_reserve(rows, new_status)
+            # Another approval got to the row between this one's read and its UPDATE
+            ServerRequest.objects.filter(pk=self.server_request.pk).update(status='APPROVED')
+            return result
+        with mock.patch('requests_app.approvals._reserve_resources', side_effect=approved_meanwhile), \
+                self.assertLogs('requests_app.approvals', 'ERROR'):
+            approved, skipped, rejected = approve_requests(self.admin_user, ServerRequest.objects.filter(pk=self.server_request.pk))
+
+        self.assertEqual((approved, rejected), ([], []))
+        self.assertEqual([row['id'] for row in skipped], [self.server_request.pk])
+        self.assertFalse(AWXLaunch.objects.exists())
+        self.assertFalse(AuditLog.objects.filter(action='Request Approved').exists())
+        self.assertEqual(LocationQuota.objects.get().cpu_cores_used, 0) # The reservation was rolled back
+
+    def test_second_approval_of_the_same_row_is_skipped(self):
+        queryset = ServerRequest.objects.filter(pk=self.server_request.pk)
+        self.assertEqual(len(approve_requests(self.admin_user, queryset)[0]), 1)
+        approved, skipped, rejected = approve_requests(self.admin_user, queryset)
+        self.assertEqual((approved, [row['status'] for row in skipped]), ([], ['APPROVED']))
+        self.assertEqual(AWXLaunch.objects.count(), 1)
+        self.assertEqual(LocationQuota.objects.get().cpu_cores_used, 4)
+
+
+@override_settings(STORAGES=TEST_STORAGES, ADMIN_ESTIMATED_COUNT_THRESHOLD=3)
+class EstimatedCountPaginatorTests(TestCase):
+    def setUp(self):
+        AuditLog.objects.bulk_create([AuditLog(action='Note Added', message=f"Note {number}.") for number in range(6)])
+
+    def count(self):
+        return EstimatedCountPaginator(AuditLog.objects.order_by('-id'), 2).count
+
+    def test_counts_exactly_until_the_table_is_analyzed(self):
+        self.assertIsNone(estimate_table_rows(AuditLog))
+        self.assertEqual(self.count(), 6)
+
+    def test_estimate_follows_archived_rows(self):
+        refresh_table_estimate(AuditLog)
+        self.assertEqual(estimate_table_rows(AuditLog), 6)
+        AuditLog.objects.filter(pk__in=AuditLog.objects.order_by('id').values('pk')[:2]).update(timestamp=timezone.now() - timedelta(days=400))
+        with tempfile.TemporaryDirectory() as archive_dir, self.settings(AUDIT_LOG_ARCHIVE_DIR=archive_dir):
+            self.assertEqual(archive_audit_logs(older_than_days=30), 2)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.count(), 4) # Not the old high-water mark of 6
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
@@ -1,19 +1,30 @@
 # requests_app/urls.py
+from django.conf import settings
 from django.urls import path
+from django.views.decorators.cache import cache_page
 from django.views.generic import TemplateView
 from .views import (
-    ServerRequestStep1View, ServerRequestStep2View, RequestSuccessView,
-    request_status_view # Import status view
+    ServerRequestStep1View, ServerRequestStep2View, RequestSuccessView, BulkImportView,
+    request_status_view, request_status_json_view, request_status_stream_view, request_status_archive_view, # Import status views
+    awx_webhook_view, fqdn_check_view, request_approve_view, metrics_view,
 )
 
 urlpatterns = [
     path('', ServerRequestStep1View.as_view(), name='request_server_step1'), # Step 1 at root
     path('step2/', ServerRequestStep2View.as_view(), name='request_server_step2'),
+    path('import/', BulkImportView.as_view(), name='request_bulk_import'),
+    path('check-fqdn/', fqdn_check_view, name='fqdn_check'),
     path('success/', RequestSuccessView.as_view(), name='request_success'),
     path('status/<int:pk>/', request_status_view, name='request_status'),
+    path('status/<int:pk>/json/', request_status_json_view, name='request_status_json'),
+    path('status/<int:pk>/stream/', request_status_stream_view, name='request_status_stream'),
+    path('status/<int:pk>/archive/', request_status_archive_view, name='request_status_archive'),
+    path('status/<int:pk>/approve/', request_approve_view, name='request_approve'),
+    path('awx/webhook/', awx_webhook_view, name='awx_webhook'),
+    path('metrics', metrics_view, name='metrics'), # No trailing slash, where Prometheus scrapes by default
     path(
         'terms/',
-        TemplateView.as_view(template_name="requests_app/terms.html"),
+        cache_page(settings.PAGE_CACHE_SECONDS)(TemplateView.as_view(template_name="requests_app/terms.html")),
         name='terms_conditions'
     ),
 ]
@@ -3,18 +3,82 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse, reverse_lazy
 from django.views import View
 from django.views.generic import TemplateView
-from .forms import ServerRequestStep1Form, ServerRequestStep2Form # Import new forms
+from .forms import ServerRequestStep1Form, ServerRequestStep2Form, BulkImportForm # Import new forms
 from .models import ServerRequest, AuditLog # Import models
 from django.contrib import messages
 import logging
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
+from django.http import JsonResponse, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse, Http404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.contrib.auth import get_user
+from asgiref.sync import sync_to_async
+from calendar import timegm
+from django.core.handlers.asgi import ASGIRequest
+from django.core import signing
+from django.views.decorators.http import condition
+from django.views.decorators.cache import cache_control
+from django.db.models import Max
+from .awx_reconcile import apply_awx_job_status
+from .awx_queue import alaunch_now
+from .approvals import approve_requests
+from .metrics import render_metrics
+from prometheus_client import CONTENT_TYPE_LATEST
+from .capacity import adjust_capacity
+from .fqdn_check import check_fqdn_availability, forget_fqdns
+from django.views.decorators.http import require_GET
+from .email_outbox import queue_email
+from .bulk_import import ImportFileError, parse_import_file, validate_import_rows, create_imported_requests
+from django.db import IntegrityError
+from .status_events import status_event_stream
+from .audit_archive import PUBLIC_ARCHIVE_FIELDS, iter_archived_logs_for_request
+from .streaming import streaming_content
+from django.core.serializers.json import DjangoJSONEncoder
+import hmac
+import ipaddress
+import json
 
 logger = logging.getLogger(__name__)
 
 SESSION_KEY_STEP1 = 'server_request_step1_data'
+STEP1_COOKIE_SALT = 'requests_app.step1'
+
+
+def load_step1_data(request):
+    """Step 1 data saved by store_step1_data, or None if missing, expired or tampered with."""
+    if settings.WIZARD_STATE_STORAGE == 'session':
+        return request.session.get(SESSION_KEY_STEP1)
+    try:
+        return signing.loads(
+            request.COOKIES.get(settings.WIZARD_STATE_COOKIE_NAME, ''), salt=STEP1_COOKIE_SALT,
+            max_age=settings.WIZARD_STATE_MAX_AGE_SECONDS,
+        )
+    except signing.BadSignature: # Includes SignatureExpired
+        return None
+
+
+def store_step1_data(request, response, data):
+    """
+    Keeps Step 1 data until Step 2 is submitted. The default signed cookie costs no session-table
+    I/O; the data is small and the signature stops users editing validated values.
+    """
+    if settings.WIZARD_STATE_STORAGE == 'session':
+        request.session[SESSION_KEY_STEP1] = data
+        return
+    response.set_cookie(
+        settings.WIZARD_STATE_COOKIE_NAME, signing.dumps(data, salt=STEP1_COOKIE_SALT, compress=True),
+        max_age=settings.WIZARD_STATE_MAX_AGE_SECONDS, httponly=True, samesite='Lax', secure=request.is_secure(),
+    )
+
+
+def clear_step1_data(request, response):
+    if settings.WIZARD_STATE_STORAGE == 'session':
+        request.session.pop(SESSION_KEY_STEP1, None)
+    else:
+        response.delete_cookie(settings.WIZARD_STATE_COOKIE_NAME, samesite='Lax')
 
 # --- Step 1 View ---
 class ServerRequestStep1View(View):
@@ -22,16 +86,17 @@ class ServerRequestStep1View(View):
     template_name = 'requests_app/request_form_step1.html'
 
     def get(self, request, *args, **kwargs):
-        initial_data = request.session.get(SESSION_KEY_STEP1, {})
+        initial_data = load_step1_data(request) or {}
         form = self.form_class(initial=initial_data)
         return render(request, self.template_name, {'form': form})
 
     def post(self, request, *args, **kwargs):
         form = self.form_class(request.POST)
         if form.is_valid():
-            request.session[SESSION_KEY_STEP1] = form.cleaned_data
-            logger.info(f"Step 1 data stored in session: {form.cleaned_data}")
-            return redirect('request_server_step2')
+            response = redirect('request_server_step2')
+            store_step1_data(request, response, form.cleaned_data)
+            logger.info(f"Step 1 data stored ({settings.WIZARD_STATE_STORAGE}): {form.cleaned_data}")
+            return response
         else:
             logger.warning(f"Step 1 form invalid: {form.errors}")
             messages.error(request, "Please correct the errors in Step 1.")
@@ -43,7 +108,7 @@ class ServerRequestStep2View(View):
     template_name = 'requests_app/request_form_step2.html'
 
     def get(self, request, *args, **kwargs):
-        step1_data = request.session.get(SESSION_KEY_STEP1)
+        step1_data = load_step1_data(request)
         if not step1_data:
             messages.warning(request, "Please complete Step 1 first.")
             return redirect('request_server_step1')
@@ -51,7 +116,7 @@ class ServerRequestStep2View(View):
         return render(request, self.template_name, {'form': form, 'step1_data': step1_data})
 
     def post(self, request, *args, **kwargs):
-        step1_data = request.session.get(SESSION_KEY_STEP1)
+        step1_data = load_step1_data(request)
         if not step1_data:
             messages.error(request, "Session data missing. Please start from Step 1.")
             return redirect('request_server_step1')
@@ -72,51 +137,20 @@ class ServerRequestStep2View(View):
                 # Populate with step 1 data
                 for key, value in step1_data.items():
                      setattr(server_request, key, value)
-                # Save the complete object
-                server_request.save()
-                logger.info(f"Server request {server_request.id} ({server_request.fqdn}) created and saved.")
-
-                # --- Send Emails ---
-                try:
-                    admin_path = reverse('admin:requests_app_serverrequest_change', args=[server_request.id])
-                    admin_url = self.request.build_absolute_uri(admin_path)
-                    status_path = reverse('request_status', kwargs={'pk': server_request.id})
-                    status_url = self.request.build_absolute_uri(status_path)
-                    context = {'request': server_request, 'admin_url': admin_url, 'status_url': status_url}
-
-                    # IT Notification
-                    it_subject = f"New ASAP Server Request Submitted: {server_request.fqdn} (ID: {server_request.id})"
-                    it_html_content = render_to_string('requests_app/email/it_notification.html', context)
-                    it_text_content = strip_tags(it_html_content)
-                    it_recipients = [mail.strip() for mail in settings.IT_EMAIL_DISTRO_LIST.split(',') if mail.strip()]
-                    msg_it = EmailMultiAlternatives(it_subject, it_text_content, settings.DEFAULT_FROM_EMAIL, it_recipients)
-                    msg_it.attach_alternative(it_html_content, "text/html")
-                    msg_it.send(fail_silently=False)
-                    logger.info(f"IT notification sent for request {server_request.id}")
-
-                    # User Confirmation
-                    user_subject = f"ASAP Server Request Submitted (ID: {server_request.id})"
-                    user_html_content = render_to_string('requests_app/email/user_confirmation.html', context)
-                    user_text_content = strip_tags(user_html_content)
-                    user_recipients = [server_request.primary_contact]
-                    if server_request.secondary_contact and server_request.secondary_contact.lower() != server_request.primary_contact.lower():
-                        user_recipients.append(server_request.secondary_contact)
-                    msg_user = EmailMultiAlternatives(user_subject, user_text_content, settings.DEFAULT_FROM_EMAIL, user_recipients)
-                    msg_user.attach_alternative(user_html_content, "text/html")
-                    msg_user.send(fail_silently=False)
-                    logger.info(f"User confirmation sent for request {server_request.id}")
-
-                    messages.success(self.request, "Your server request has been submitted successfully! Confirmation emails have been sent.")
-
-                except Exception as e:
-                    logger.error(f"Failed to send email for request {server_request.id}: {e}", exc_info=True)
-                    messages.warning(self.request, "Request submitted, but failed to send confirmation emails.")
-                # --- End Send Emails ---
-
-                if SESSION_KEY_STEP1 in request.session:
-                    del request.session[SESSION_KEY_STEP1] # Clear session
-
-                return redirect('request_success')
+                # Save the complete object together with its notification emails, so a request
+                # is never stored without them. Delivery happens in the send_queued_emails worker.
+                with transaction.atomic():
+                    server_request.save()
+                    logger.info(f"Server request {server_request.id} ({server_request.fqdn}) created and saved.")
+                    adjust_capacity(added=[server_request])
+                    transaction.on_commit(lambda: forget_fqdns([server_request.fqdn]))
+                    self._queue_notification_emails(server_request)
+
+                messages.success(self.request, "Your server request has been submitted successfully! Confirmation emails will follow shortly.")
+
+                response = redirect('request_success')
+                clear_step1_data(request, response)
+                return response
 
             except Exception as e:
                  logger.error(f"Error saving combined server request form data: {e}", exc_info=True)
@@ -127,13 +161,303 @@ class ServerRequestStep2View(View):
             messages.error(request, "Please correct the errors in Step 2.")
             return render(request, self.template_name, {'form': form, 'step1_data': step1_data})
 
+    def _queue_notification_emails(self, server_request):
+        admin_path = reverse('admin:requests_app_serverrequest_change', args=[server_request.id])
+        admin_url = self.request.build_absolute_uri(admin_path)
+        status_path = reverse('request_status', kwargs={'pk': server_request.id})
+        status_url = self.request.build_absolute_uri(status_path)
+        context = {'request': server_request, 'admin_url': admin_url, 'status_url': status_url}
+
+        # IT Notification
+        it_subject = f"New ASAP Server Request Submitted: {server_request.fqdn} (ID: {server_request.id})"
+        it_html_content = render_to_string('requests_app/email/it_notification.html', context)
+        it_recipients = settings.IT_EMAIL_DISTRO_LIST.split(',')
+        queue_email(it_subject, strip_tags(it_html_content), it_recipients, html_content=it_html_content, related_request=server_request)
+
+        # User Confirmation
+        user_subject = f"ASAP Server Request Submitted (ID: {server_request.id})"
+        user_html_content = render_to_string('requests_app/email/user_confirmation.html', context)
+        user_recipients = [server_request.primary_contact]
+        if server_request.secondary_contact and server_request.secondary_contact.lower() != server_request.primary_contact.lower():
+            user_recipients.append(server_request.secondary_contact)
+        queue_email(user_subject, strip_tags(user_html_content), user_recipients, html_content=user_html_content, related_request=server_request)
+        logger.info(f"Notification emails queued for request {server_request.id}")
+
+# --- Bulk Import View ---
+class BulkImportView(View):
+    form_class = BulkImportForm
+    template_name = 'requests_app/bulk_import.html'
+
+    def get(self, request, *args, **kwargs):
+        return render(request, self.template_name, {'form': self.form_class()})
+
+    def post(self, request, *args, **kwargs):
+        form = self.form_class(request.POST, request.FILES)
+        if not form.is_valid():
+            messages.error(request, "Please correct the errors below.")
+            return render(request, self.template_name, {'form': form})
+
+        try:
+            rows = parse_import_file(form.cleaned_data['import_file'])
+        except ImportFileError as e:
+            form.add_error('import_file', str(e))
+            return render(request, self.template_name, {'form': form})
+
+        instances, row_errors = validate_import_rows(rows)
+        if row_errors:
+            logger.warning(f"Bulk import rejected: {len(row_errors)} of {len(rows)} row(s) invalid.")
+            messages.error(request, f"{len(row_errors)} of {len(rows)} row(s) have errors. Nothing was imported.")
+            return render(request, self.template_name, {'form': form, 'row_errors': row_errors})
+
+        try:
+            with transaction.atomic():
+                created = create_imported_requests(instances)
+                adjust_capacity(added=created)
+                transaction.on_commit(lambda: forget_fqdns([r.fqdn for r in created]))
+                self._queue_notification_emails(created)
+        except IntegrityError as e:
+            # Another submission took one of the FQDNs between validation and insert.
+            logger.warning(f"Bulk import failed on insert: {e}")
+            messages.error(request, "One or more FQDNs were requested by someone else while importing. Please re-upload the file.")
+            return render(request, self.template_name, {'form': form})
+
+        messages.success(request, f"{len(created)} server requests have been submitted successfully! A summary email will follow shortly.")
+        return redirect('request_success')
+
+    def _queue_notification_emails(self, created):
+        """Queues one summary email to IT and one to all contacts, instead of two emails per request."""
+        admin_url = self.request.build_absolute_uri(reverse('admin:requests_app_serverrequest_changelist'))
+        rows = [
+            {'request': server_request, 'status_url': self.request.build_absolute_uri(reverse('request_status', kwargs={'pk': server_request.id}))}
+            for server_request in created
+        ]
+        context = {'rows': rows, 'admin_url': admin_url, 'for_it': True}
+
+        it_subject = f"New ASAP Bulk Server Request Submitted: {len(created)} servers"
+        it_html_content = render_to_string('requests_app/email/bulk_import_notification.html', context)
+        queue_email(it_subject, strip_tags(it_html_content), settings.IT_EMAIL_DISTRO_LIST.split(','), html_content=it_html_content)
+
+        contacts = {}
+        for server_request in created:
+            for contact in (server_request.primary_contact, server_request.secondary_contact):
+                if contact:
+                    contacts.setdefault(contact.lower(), contact)
+        user_subject = f"ASAP Bulk Server Request Submitted ({len(created)} servers)"
+        user_html_content = render_to_string('requests_app/email/bulk_import_notification.html', {**context, 'for_it': False})
+        queue_email(user_subject, strip_tags(user_html_content), list(contacts.values()), html_content=user_html_content)
+        logger.info(f"Bulk import notification emails queued for {len(created)} request(s)")
+
 # --- Success View ---
 class RequestSuccessView(TemplateView):
     template_name = 'requests_app/request_success.html'
 
 # --- Status View ---
+def _status_fingerprint(request, pk):
+    """
+    Returns (etag, last_modified) for a request's status page from ServerRequest.updated_at and the
+    latest AuditLog timestamp, or (None, None) if it doesn't exist. One query, memoized per HTTP request
+    so the ETag and Last-Modified checks share it.
+    """
+    cache_attr = '_status_fingerprint'
+    if not hasattr(request, cache_attr):
+        row = (
+            ServerRequest.objects.filter(pk=pk)
+            .annotate(last_log_at=Max('audit_logs__timestamp'))
+            .values_list('updated_at', 'last_log_at').first()
+        )
+        if row is None:
+            fingerprint = (None, None)
+        else:
+            updated_at, last_log_at = row
+            last_modified = max(updated_at, last_log_at) if last_log_at else updated_at
+            etag = f"{pk}-{updated_at.timestamp()}-{last_log_at.timestamp() if last_log_at else 0}"
+            fingerprint = (etag, last_modified)
+        setattr(request, cache_attr, fingerprint)
+    return getattr(request, cache_attr)
+
+def _status_etag(request, pk):
+    return _status_fingerprint(request, pk)[0]
+
+def _status_last_modified(request, pk):
+    return _status_fingerprint(request, pk)[1]
+
+@cache_control(private=True, no_cache=True) # Always revalidate; a 304 is cheap
+@condition(etag_func=_status_etag, last_modified_func=_status_last_modified)
 def request_status_view(request, pk):
-    server_request = get_object_or_404(ServerRequest, pk=pk)
+    server_request = get_object_or_404(ServerRequest.objects.select_related('audit_archive_summary'), pk=pk)
     audit_logs = server_request.audit_logs.all().order_by('timestamp')
-    context = {'request': server_request, 'audit_logs': audit_logs}
+    archive_summary = getattr(server_request, 'audit_archive_summary', None)
+    context = {'request': server_request, 'audit_logs': audit_logs, 'archive_summary': archive_summary}
     return render(request, 'requests_app/status.html', context)
+
+ARCHIVE_STREAM_CHUNK_LINES = 500 # Archive lines read and sent at a time under ASGI
+
+def request_status_archive_view(request, pk):
+    """
+    Streams a request's archived (cold) history entries as NDJSON, oldest first. Public like the
+    status page, so only the columns that page shows: no user ids or usernames.
+    """
+    server_request = get_object_or_404(ServerRequest.objects.select_related('audit_archive_summary'), pk=pk)
+    archive_summary = getattr(server_request, 'audit_archive_summary', None)
+    records = iter_archived_logs_for_request(archive_summary) if archive_summary else iter(())
+    lines = (
+        json.dumps({field: record[field] for field in PUBLIC_ARCHIVE_FIELDS}, cls=DjangoJSONEncoder) + '\n'
+        for record in records
+    )
+    return StreamingHttpResponse(streaming_content(request, lines, ARCHIVE_STREAM_CHUNK_LINES), content_type='application/x-ndjson')
+
+async def request_status_json_view(request, pk):
+    """
+    Compact JSON form of the status page for scripts; supports the same conditional GET.
+    Async so polling clients don't each hold a worker thread under ASGI.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    etag, last_modified = await sync_to_async(_status_fingerprint)(request, pk)
+    if etag is None:
+        raise Http404("No ServerRequest matches the given query.")
+    etag = quote_etag(etag)
+    last_modified = timegm(last_modified.utctimetuple())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        try:
+            server_request = await (
+                ServerRequest.objects.select_related('audit_archive_summary')
+                .only('id', 'fqdn', 'status', 'awx_job_id', 'requested_at', 'updated_at', 'audit_archive_summary__archived_count')
+                .aget(pk=pk)
+            )
+        except ServerRequest.DoesNotExist:
+            raise Http404("No ServerRequest matches the given query.")
+        history = [row async for row in server_request.audit_logs.order_by('timestamp').values('timestamp', 'level', 'action', 'message')]
+        archive_summary = getattr(server_request, 'audit_archive_summary', None)
+        response = JsonResponse({
+            'id': server_request.id,
+            'fqdn': server_request.fqdn,
+            'status': server_request.status,
+            'status_display': server_request.get_status_display(),
+            'awx_job_id': server_request.awx_job_id,
+            'requested_at': server_request.requested_at,
+            'updated_at': server_request.updated_at,
+            'history': history,
+            'archived_history_count': archive_summary.archived_count if archive_summary else 0,
+        })
+        response.headers.setdefault('ETag', etag)
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+    patch_cache_control(response, private=True, no_cache=True) # Always revalidate; a 304 is cheap
+    return response
+
+
+@require_GET
+@cache_control(private=True, max_age=10)
+def fqdn_check_view(request):
+    """Live FQDN availability check for the Step 1 form (called as the user types)."""
+    return JsonResponse(check_fqdn_availability(request.GET.get('fqdn')))
+
+
+async def request_status_stream_view(request, pk):
+    """
+    Server-Sent Events stream of status changes and new history entries for one request.
+    Only served under ASGI, where each open stream is a coroutine rather than a worker; under
+    WSGI it answers 204 so the browser's EventSource stops and the page falls back to reloading.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    try:
+        server_request = await ServerRequest.objects.only('id', 'status', 'awx_job_id').aget(pk=pk)
+    except ServerRequest.DoesNotExist:
+        raise Http404("No ServerRequest matches the given query.")
+    audit_logs = [log async for log in server_request.audit_logs.order_by('id')]
+
+    response = StreamingHttpResponse(status_event_stream(server_request, audit_logs), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # Don't let nginx buffer the stream
+    return response
+
+
+# --- AWX Notification Webhook ---
+AWX_WEBHOOK_TOKEN_HEADER = 'HTTP_X_ASAP_WEBHOOK_TOKEN' # Sent by AWX as "X-ASAP-Webhook-Token"
+
+async def awx_webhook_view(request):
+    """
+    Receives AWX webhook notifications (job started/succeeded/failed) and applies the job status.
+    Configure the AWX notification template with the custom header X-ASAP-Webhook-Token.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    secret = settings.AWX_WEBHOOK_SECRET
+    if not secret:
+        logger.error("AWX webhook received but AWX_WEBHOOK_SECRET is not configured; rejecting.")
+        return JsonResponse({'error': 'Webhook not configured.'}, status=403)
+    token = request.META.get(AWX_WEBHOOK_TOKEN_HEADER, '')
+    if not hmac.compare_digest(token.encode(), secret.encode()):
+        logger.warning(f"AWX webhook rejected: invalid token from {request.META.get('REMOTE_ADDR')}")
+        return JsonResponse({'error': 'Invalid token.'}, status=403)
+
+    try:
+        payload = json.loads(request.body)
+        job_id = int(payload['id'])
+        awx_status = str(payload['status'])
+    except (ValueError, KeyError, TypeError):
+        logger.warning(f"AWX webhook rejected: malformed payload ({request.body[:200]!r})")
+        return JsonResponse({'error': 'Payload must be JSON with job "id" and "status".'}, status=400)
+
+    updated = await sync_to_async(apply_awx_job_status)(job_id, awx_status)
+    logger.info(f"AWX webhook for job {job_id} with status '{awx_status}' (request updated: {updated})")
+    return JsonResponse({'job': job_id, 'status': awx_status, 'updated': updated})
+
+awx_webhook_view.csrf_exempt = True # Django 4.2's @csrf_exempt wraps async views as sync
+
+
+# --- Approval API ---
+async def request_approve_view(request, pk):
+    """
+    Approves a PENDING request for a logged-in staff user (same checks and bookkeeping as the admin
+    action) and launches its AWX job right away on the shared async client. If AWX is slow or down
+    the launch stays on the queue for process_awx_queue, so the approval itself never fails on it.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    user = await sync_to_async(get_user)(request)
+    if not (user.is_active and user.is_staff and await sync_to_async(user.has_perm)('requests_app.change_serverrequest')):
+        return JsonResponse({'error': 'Permission denied.'}, status=403)
+
+    approved, skipped, rejected = await sync_to_async(approve_requests)(user, ServerRequest.objects.filter(pk=pk), via='API')
+    if skipped:
+        return JsonResponse({'error': f"Request is {skipped[0]['status']}, only PENDING requests can be approved."}, status=409)
+    if rejected:
+        return JsonResponse({'error': rejected[0][1]}, status=409)
+    if not approved:
+        raise Http404("No ServerRequest matches the given query.")
+
+    job_id = await alaunch_now(pk)
+    server_request = await ServerRequest.objects.only('id', 'status', 'awx_job_id', 'ip_address').aget(pk=pk)
+    return JsonResponse({
+        'id': server_request.id,
+        'status': server_request.status,
+        'awx_job_id': server_request.awx_job_id,
+        'ip_address': server_request.ip_address,
+        'launch_queued': job_id is None, # Left for the queue worker to retry
+    })
+
+
+# --- Prometheus Metrics ---
+def _metrics_client_allowed(request):
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network) for network in settings.METRICS_ALLOWED_NETWORKS)
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. When METRICS_TOKEN is set, requires "Authorization: Bearer <token>";
+    otherwise only clients in METRICS_ALLOWED_NETWORKS (loopback by default) may scrape.
+    """
+    token = settings.METRICS_TOKEN
+    if token and not hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', '').encode(), f"Bearer {token}".encode()):
+        return HttpResponse('Invalid metrics token.', status=403, content_type='text/plain')
+    if not token and not _metrics_client_allowed(request):
+        return HttpResponse('Metrics are only served to METRICS_ALLOWED_NETWORKS without a METRICS_TOKEN.', status=403, content_type='text/plain')
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
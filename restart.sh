@@ -4,4 +4,7 @@ cd /Users/lucas/ownCloud/Documents/code/asap/ # cd to project
 source venv/bin/activate # activate python virtual env
 python manage.py migrate # ensure migrations are done for local DB
 python manage.py makemigrations requests_app
+./worker.sh & # background workers: AWX launches, emails, AWX job status (see README.md)
+WORKER_PID=$!
+trap 'kill $WORKER_PID' EXIT # stop them with the app
 python manage.py runserver # run app
\ No newline at end of file
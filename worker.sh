@@ -0,0 +1,16 @@
+#!/bin/bash
+# worker.sh
+# Background workers for the portal. Run the image a second time with this as its command, pointed at the
+# same database as the web container:
+#     podman run -d --name provisioning-portal-worker --env-file .env asap ./worker.sh
+# Each worker loops on its own. If one of them exits, the others are stopped and so is the container, so the
+# container's restart policy brings all of them back together.
+
+trap 'exit 0' TERM INT
+trap 'kill $(jobs -p) 2>/dev/null' EXIT
+
+python manage.py process_awx_queue & # Launches approved requests in AWX (AWXLaunch outbox)
+python manage.py send_queued_emails & # Delivers notification emails (QueuedEmail outbox)
+python manage.py reconcile_awx_jobs & # Moves PROVISIONING requests to COMPLETED or FAILED as their AWX jobs finish
+
+wait -n